@@ -1,4 +1,4 @@
-from typing import Callable, Sequence
+from typing import Awaitable, Callable, Sequence, Union
 
 from langchain_core.messages import BaseMessage
 from langgraph.graph import add_messages
@@ -15,8 +15,10 @@ class AgentState(TypedDict):
 
     messages: Annotated[Sequence[BaseMessage], add_messages]
     need_clear: bool
+    # Rolling summary of the messages removed by the summarizing memory manager
+    summary: str
     is_last_step: IsLastStep
     remaining_steps: RemainingSteps
 
 
-MemoryManager = Callable[[AgentState], AgentState]
+MemoryManager = Callable[[AgentState], Union[AgentState, Awaitable[AgentState]]]
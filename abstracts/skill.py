@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
 from typing import Any, Dict, Optional
 
 from models.agent import Agent, AgentData, AgentQuota
@@ -78,7 +79,11 @@ class SkillStoreABC(ABC):
     @staticmethod
     @abstractmethod
     async def save_agent_skill_data(
-        agent_id: str, skill: str, key: str, data: Dict[str, Any]
+        agent_id: str,
+        skill: str,
+        key: str,
+        data: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
     ) -> None:
         """Save or update skill data for an agent.
 
@@ -87,6 +92,25 @@ class SkillStoreABC(ABC):
             skill: Name of the skill
             key: Data key
             data: JSON data to store
+            expires_at: When the data expires, never if not set
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def save_agent_skill_data_many(
+        agent_id: str,
+        skill: str,
+        data: Dict[str, Dict[str, Any]],
+        expires_at: Optional[datetime] = None,
+    ) -> None:
+        """Save or update several keys of skill data for an agent at once.
+
+        Args:
+            agent_id: ID of the agent
+            skill: Name of the skill
+            data: JSON data to store by data key
+            expires_at: When the data expires, never if not set
         """
         pass
 
@@ -115,6 +139,7 @@ class SkillStoreABC(ABC):
         skill: str,
         key: str,
         data: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
     ) -> None:
         """Save or update skill data for a thread.
 
@@ -124,5 +149,26 @@ class SkillStoreABC(ABC):
             skill: Name of the skill
             key: Data key
             data: JSON data to store
+            expires_at: When the data expires, never if not set
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def save_thread_skill_data_many(
+        thread_id: str,
+        agent_id: str,
+        skill: str,
+        data: Dict[str, Dict[str, Any]],
+        expires_at: Optional[datetime] = None,
+    ) -> None:
+        """Save or update several keys of skill data for a thread at once.
+
+        Args:
+            thread_id: ID of the thread
+            agent_id: ID of the agent that owns this thread
+            skill: Name of the skill
+            data: JSON data to store by data key
+            expires_at: When the data expires, never if not set
         """
         pass
@@ -28,7 +28,8 @@ from sqlalchemy.orm.exc import NoResultFound
 from yaml import safe_load
 
 from app.config.config import config
-from app.core.engine import clean_agent_memory
+from app.core.engine import agent_cache_stats, clean_agent_memory
+from app.core.llm import llm_client_stats
 from clients.twitter import unlink_twitter
 from models.agent import (
     Agent,
@@ -41,6 +42,7 @@ from models.agent import (
 )
 from models.db import get_db
 from skills import __all__ as skill_categories
+from utils.http import http_client_stats
 from utils.middleware import create_jwt_middleware
 from utils.slack_alert import send_slack_message
 
@@ -614,6 +616,52 @@ async def get_agent(
     )
 
 
+@admin_router_readonly.get(
+    "/stats/agent-cache",
+    tags=["Agent"],
+    dependencies=[Depends(verify_jwt)],
+    operation_id="get_agent_cache_stats",
+)
+async def get_agent_cache_stats() -> dict:
+    """Get the agent executor cache statistics of the serving worker.
+
+    **Returns:**
+    * `dict` - Hits, misses, evictions, expirations and resident size of the public
+      and private executor caches, and the agent initialization counters
+    """
+    return agent_cache_stats()
+
+
+@admin_router_readonly.get(
+    "/stats/llm-clients",
+    tags=["Agent"],
+    dependencies=[Depends(verify_jwt)],
+    operation_id="get_llm_client_stats",
+)
+async def get_llm_client_stats() -> list[dict]:
+    """Get the connection reuse statistics of the shared LLM clients of the serving worker.
+
+    **Returns:**
+    * `list[dict]` - Chat models, requests, new and reused connections per provider endpoint
+    """
+    return llm_client_stats()
+
+
+@admin_router_readonly.get(
+    "/stats/http-clients",
+    tags=["Agent"],
+    dependencies=[Depends(verify_jwt)],
+    operation_id="get_http_client_stats",
+)
+async def get_http_client_stats() -> list[dict]:
+    """Get the connection reuse statistics of the shared skill HTTP clients.
+
+    **Returns:**
+    * `list[dict]` - Requests, new and reused connections and retries per upstream host
+    """
+    return http_client_stats()
+
+
 class MemCleanRequest(BaseModel):
     """Request model for agent memory cleanup endpoint.
 
@@ -12,6 +12,7 @@ from abstracts.api import ResponseHeadersPagination
 from app.config.config import config
 from app.core.credit import (
     fetch_credit_event_by_upstream_tx_id,
+    get_platform_account,
     list_credit_events_by_user,
     list_fee_events_by_agent,
     recharge,
@@ -25,7 +26,7 @@ from models.credit import (
     EventType,
     OwnerType,
 )
-from models.db import get_db
+from models.db import get_db, get_session
 from utils.middleware import create_jwt_middleware
 
 logger = logging.getLogger(__name__)
@@ -122,6 +123,8 @@ class UpdateDailyQuotaRequest(BaseModel):
 async def get_account(owner_type: OwnerType, owner_id: str) -> CreditAccount:
     """Get a credit account by owner type and ID. It will create a new account if it does not exist.
 
+    Platform accounts include the balances of their shards.
+
     Args:
         owner_type: Type of the owner (user, agent, company)
         owner_id: ID of the owner
@@ -129,6 +132,9 @@ async def get_account(owner_type: OwnerType, owner_id: str) -> CreditAccount:
     Returns:
         The credit account
     """
+    if owner_type == OwnerType.PLATFORM:
+        async with get_session() as session:
+            return await get_platform_account(session, owner_id)
     return await CreditAccount.get_or_create(owner_type, owner_id)
 
 
@@ -1,8 +1,25 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 
 health_router = APIRouter()
 
+# Whether the server is ready to take traffic, cleared during startup warm-up
+_ready = True
+
+
+def set_ready(ready: bool) -> None:
+    """Set the readiness reported by the /health/ready endpoint."""
+    global _ready
+    _ready = ready
+
 
 @health_router.get("/health", include_in_schema=False)
 async def health_check():
     return {"status": "healthy"}
+
+
+@health_router.get("/health/ready", include_in_schema=False)
+async def readiness_check():
+    if not _ready:
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
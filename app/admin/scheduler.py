@@ -6,39 +6,48 @@ import logging
 from apscheduler.jobstores.redis import RedisJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import update
 
 from app.config.config import config
-from app.core.credit import refill_all_free_credits
+from app.core.credit import (
+    refill_all_free_credits,
+    release_expired_holds,
+    rollup_platform_account_shards,
+)
 from app.services.twitter.oauth2_refresh import refresh_expiring_tokens
-from models.agent import AgentQuotaTable
-from models.db import get_session, init_db
+from models.agent import AgentQuota
+from models.db import init_db
+from models.skill import AgentSkillData, ThreadSkillData
 
 logger = logging.getLogger(__name__)
 
 
-async def reset_daily_quotas():
-    """Reset daily quotas for all agents at UTC 00:00.
-    Resets message_count_daily and twitter_count_daily to 0.
-    """
-    async with get_session() as session:
-        stmt = update(AgentQuotaTable).values(
-            message_count_daily=0, twitter_count_daily=0
+async def flush_agent_quotas():
+    """Add the agent quota counts in Redis to the database."""
+    flushed = await AgentQuota.flush_counters()
+    if flushed:
+        logger.info(f"Flushed quota counts of {flushed} agents")
+
+
+# Set once the rate limit counters of the skills are expired, they are kept in
+# Redis now and the rows are never read again
+_legacy_rate_limits_expired = False
+
+
+async def delete_expired_skill_data():
+    """Delete the expired skill data of agents and threads."""
+    global _legacy_rate_limits_expired
+    if not _legacy_rate_limits_expired:
+        expired = await AgentSkillData.expire_key("rate_limit")
+        _legacy_rate_limits_expired = True
+        if expired:
+            logger.info(f"Expired {expired} legacy rate limit skill data rows")
+    agent_rows = await AgentSkillData.delete_expired()
+    thread_rows = await ThreadSkillData.delete_expired()
+    if agent_rows or thread_rows:
+        logger.info(
+            f"Deleted {agent_rows} expired agent and {thread_rows} expired thread "
+            "skill data rows"
         )
-        await session.execute(stmt)
-        await session.commit()
-
-
-async def reset_monthly_quotas():
-    """Reset monthly quotas for all agents at the start of each month.
-    Resets message_count_monthly and autonomous_count_monthly to 0.
-    """
-    async with get_session() as session:
-        stmt = update(AgentQuotaTable).values(
-            message_count_monthly=0, autonomous_count_monthly=0
-        )
-        await session.execute(stmt)
-        await session.commit()
 
 
 def create_scheduler():
@@ -56,21 +65,12 @@ def create_scheduler():
 
     scheduler = AsyncIOScheduler(jobstores=jobstores)
 
-    # Reset daily quotas at UTC 00:00
-    scheduler.add_job(
-        reset_daily_quotas,
-        trigger=CronTrigger(hour=0, minute=0, timezone="UTC"),
-        id="reset_daily_quotas",
-        name="Reset daily quotas",
-        replace_existing=True,
-    )
-
-    # Reset monthly quotas at UTC 00:00 on the first day of each month
+    # Flush agent quota counts every minute
     scheduler.add_job(
-        reset_monthly_quotas,
-        trigger=CronTrigger(day=1, hour=0, minute=0, timezone="UTC"),
-        id="reset_monthly_quotas",
-        name="Reset monthly quotas",
+        flush_agent_quotas,
+        trigger=CronTrigger(minute="*", timezone="UTC"),
+        id="flush_agent_quotas",
+        name="Flush agent quota counts",
         replace_existing=True,
     )
 
@@ -92,6 +92,33 @@ def create_scheduler():
         replace_existing=True,
     )
 
+    # Release credit holds of executions that never settled every 10 minutes
+    scheduler.add_job(
+        release_expired_holds,
+        trigger=CronTrigger(minute="*/10", timezone="UTC"),
+        id="release_expired_holds",
+        name="Release expired credit holds",
+        replace_existing=True,
+    )
+
+    # Roll up the platform account shards every hour
+    scheduler.add_job(
+        rollup_platform_account_shards,
+        trigger=CronTrigger(minute="40", timezone="UTC"),
+        id="rollup_platform_account_shards",
+        name="Roll up platform account shards",
+        replace_existing=True,
+    )
+
+    # Delete expired skill data every hour
+    scheduler.add_job(
+        delete_expired_skill_data,
+        trigger=CronTrigger(minute="50", timezone="UTC"),
+        id="delete_expired_skill_data",
+        name="Delete expired skill data",
+        replace_existing=True,
+    )
+
     return scheduler
 
 
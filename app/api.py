@@ -6,7 +6,9 @@ including routers, middleware, and startup/shutdown events.
 The API server provides endpoints for agent execution and management.
 """
 
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 
 import sentry_sdk
@@ -23,13 +25,16 @@ from app.admin import (
     health_router,
     schema_router_readonly,
 )
+from app.admin.health import set_ready
 from app.config.config import config
 from app.core.api import core_router
+from app.core.engine import most_active_agents, warm_up_agents, watch_agent_updates
 from app.entrypoints.web import chat_router, chat_router_readonly
 from app.services.twitter.oauth2 import router as twitter_oauth2_router
 from app.services.twitter.oauth2_callback import router as twitter_callback_router
 from models.db import init_db
 from models.redis import init_redis
+from utils.http import close_http_clients
 
 # init logger
 logger = logging.getLogger(__name__)
@@ -46,6 +51,36 @@ if config.sentry_dsn:
     )
 
 
+async def warm_up() -> None:
+    """Build the executors of the configured and the most active agents.
+
+    Marks the server ready when done, whether the warm-up succeeded or not.
+    """
+    try:
+        executors = []
+        for item in config.agent_warmup_agents:
+            agent_id, _, mode = item.partition(":")
+            executors.append((agent_id, mode == "private"))
+        if config.agent_warmup_count > 0:
+            executors.extend(
+                await most_active_agents(
+                    config.agent_warmup_count, config.agent_warmup_hours
+                )
+            )
+        # keep the order, the most important ones first
+        executors = list(dict.fromkeys(executors))
+        start = time.perf_counter()
+        warmed = await warm_up_agents(executors, config.agent_warmup_concurrency)
+        logger.info(
+            f"warmed up {warmed}/{len(executors)} agent executors "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+    except Exception as e:
+        logger.error(f"failed to warm up agents: {e}")
+    finally:
+        set_ready(True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle.
@@ -62,16 +97,33 @@ async def lifespan(app: FastAPI):
     await init_db(**config.db)
 
     # Initialize Redis if configured
+    watcher = None
     if config.redis_host:
         await init_redis(
             host=config.redis_host,
             port=config.redis_port,
         )
+        # Keep cached agent executors fresh
+        watcher = asyncio.create_task(watch_agent_updates())
+
+    # Warm up agent executors, /health/ready reports 503 until done
+    warmup = None
+    if config.agent_warmup_count > 0 or config.agent_warmup_agents:
+        set_ready(False)
+        if config.agent_warmup_wait:
+            await warm_up()
+        else:
+            warmup = asyncio.create_task(warm_up())
 
     logger.info("API server start")
     yield
     # Clean up will run after the API server shutdown
     logger.info("Cleaning up and shutdown...")
+    if warmup:
+        warmup.cancel()
+    if watcher:
+        watcher.cancel()
+    await close_http_clients()
 
 
 app = FastAPI(
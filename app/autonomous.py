@@ -12,6 +12,7 @@ from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy import select
 
 from app.config.config import config
+from app.core.engine import watch_agent_updates
 from app.entrypoints.autonomous import run_autonomous_task
 from models.agent import Agent, AgentTable
 from models.db import get_session, init_db
@@ -153,6 +154,8 @@ if __name__ == "__main__":
                 host=config.redis_host,
                 port=config.redis_port,
             )
+            # Keep cached agent executors fresh
+            asyncio.create_task(watch_agent_updates())
 
         # Add job to schedule agent autonomous tasks every 5 minutes
         # Run it immediately on startup and then every 5 minutes
@@ -8,7 +8,9 @@ import botocore.session
 from aws_secretsmanager_caching import SecretCache, SecretCacheConfig
 from dotenv import load_dotenv
 
+from utils.blocking import init_blocking_pool
 from utils.chain import ChainProvider, QuicknodeChainProvider
+from utils.http import init_http_clients
 from utils.logging import setup_logging
 from utils.s3 import init_s3
 from utils.slack_alert import init_slack
@@ -99,6 +101,64 @@ class Config:
         self.eternal_api_key = self.load("ETERNAL_API_KEY")
         self.system_prompt = self.load("SYSTEM_PROMPT")
         self.input_token_limit = int(self.load("INPUT_TOKEN_LIMIT", "60000"))
+        # Threads for blocking SDK calls, like wallet providers in agent init
+        self.blocking_threads = int(self.load("BLOCKING_THREADS", "8"))
+        # LLM http clients, shared by all agents of a provider
+        self.llm_http2 = self.load("LLM_HTTP2", "true") == "true"
+        self.llm_max_connections = int(self.load("LLM_MAX_CONNECTIONS", "100"))
+        self.llm_max_keepalive_connections = int(
+            self.load("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")
+        )
+        self.llm_keepalive_expiry = float(
+            self.load("LLM_KEEPALIVE_EXPIRY", "60")
+        )  # in seconds
+        # Skill upstream http clients, one per host shared by all agents
+        self.skill_http2 = self.load("SKILL_HTTP2", "true") == "true"
+        self.skill_max_connections = int(self.load("SKILL_MAX_CONNECTIONS", "100"))
+        self.skill_max_keepalive_connections = int(
+            self.load("SKILL_MAX_KEEPALIVE_CONNECTIONS", "20")
+        )
+        self.skill_keepalive_expiry = float(
+            self.load("SKILL_KEEPALIVE_EXPIRY", "60")
+        )  # in seconds
+        self.skill_http_timeout = float(
+            self.load("SKILL_HTTP_TIMEOUT", "5")
+        )  # in seconds
+        # Timeouts of slow upstreams, as host=seconds,host=seconds
+        self.skill_http_host_timeouts = {
+            host.strip(): float(seconds)
+            for host, _, seconds in (
+                item.partition("=")
+                for item in self.load("SKILL_HTTP_HOST_TIMEOUTS", "").split(",")
+                if item.strip()
+            )
+        }
+        # Agent executor cache, per mode (public and private)
+        self.agent_cache_max_size = int(self.load("AGENT_CACHE_MAX_SIZE", "500"))
+        self.agent_cache_ttl = int(
+            self.load("AGENT_CACHE_TTL", "3600")
+        )  # idle seconds, 0 to disable
+        self.agent_cache_max_memory_mb = int(
+            self.load("AGENT_CACHE_MAX_MEMORY_MB", "0")
+        )  # approximate, 0 to disable
+        self.agent_cache_policy = self.load("AGENT_CACHE_POLICY", "lru")  # lru or lfu
+        self.agent_reconcile_interval = int(
+            self.load("AGENT_RECONCILE_INTERVAL", "300")
+        )  # in seconds, safety net for missed agent update events
+        # Agent executor warm-up on API server start
+        self.agent_warmup_count = int(
+            self.load("AGENT_WARMUP_COUNT", "0")
+        )  # most active agents to warm up, 0 to disable
+        self.agent_warmup_agents = [
+            a.strip()
+            for a in self.load("AGENT_WARMUP_AGENTS", "").split(",")
+            if a.strip()
+        ]  # agent ids to always warm up, "id:private" for the owner executor
+        self.agent_warmup_hours = int(self.load("AGENT_WARMUP_HOURS", "24"))
+        self.agent_warmup_concurrency = int(self.load("AGENT_WARMUP_CONCURRENCY", "4"))
+        self.agent_warmup_wait = (
+            self.load("AGENT_WARMUP_WAIT", "false") == "true"
+        )  # finish warm-up before taking traffic
         # Telegram server settings
         self.tg_base_url = self.load("TG_BASE_URL")
         self.tg_server_host = self.load("TG_SERVER_HOST", "127.0.0.1")
@@ -152,6 +212,8 @@ class Config:
         self.payment_fee_dev_percentage = Decimal(
             self.load("PAYMENT_FEE_DEV_PERCENTAGE", "0.1")
         )
+        # credits reserved at the start of an agent execution
+        self.payment_hold_amount = Decimal(self.load("PAYMENT_HOLD_AMOUNT", "20"))
 
         # backend api key
         self.nation_api_key = self.load("NATION_API_KEY")
@@ -166,6 +228,15 @@ class Config:
         # If the slack alert token exists, init it
         if self.slack_alert_token and self.slack_alert_channel:
             init_slack(self.slack_alert_token, self.slack_alert_channel)
+        init_blocking_pool(self.blocking_threads)
+        init_http_clients(
+            self.skill_http2,
+            self.skill_max_connections,
+            self.skill_max_keepalive_connections,
+            self.skill_keepalive_expiry,
+            self.skill_http_timeout,
+            self.skill_http_host_timeouts,
+        )
         # If the AWS S3 bucket and CDN URL exist, init it
         if self.aws_s3_bucket and self.aws_s3_cdn_url:
             init_s3(self.aws_s3_bucket, self.aws_s3_cdn_url, self.env)
@@ -1,10 +1,12 @@
 import logging
+import time
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from typing import List, Optional, Tuple
 
 from epyxid import XID
 from fastapi import HTTPException
-from sqlalchemy import desc, select, update
+from sqlalchemy import desc, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config.config import config
@@ -15,23 +17,37 @@ from models.credit import (
     DEFAULT_PLATFORM_ACCOUNT_RECHARGE,
     DEFAULT_PLATFORM_ACCOUNT_REFILL,
     DEFAULT_PLATFORM_ACCOUNT_REWARD,
+    SHARDED_PLATFORM_ACCOUNTS,
     CreditAccount,
     CreditAccountTable,
     CreditDebit,
     CreditEvent,
+    CreditEventItem,
     CreditEventTable,
+    CreditHold,
+    CreditHoldTable,
     CreditTransactionTable,
     CreditType,
     Direction,
     EventType,
+    HoldStatus,
     OwnerType,
     TransactionType,
     UpstreamType,
+    platform_account_shard,
+    platform_account_shards,
 )
 from models.db import get_session
 
 logger = logging.getLogger(__name__)
 
+# Holds of executions that never settled are released after this
+HOLD_TTL = timedelta(hours=1)
+# Conditional updates tried when parallel holds change the balance
+HOLD_ATTEMPTS = 3
+# Accounts refilled in one transaction by refill_all_free_credits
+REFILL_CHUNK_SIZE = 1000
+
 
 async def recharge(
     session: AsyncSession,
@@ -53,11 +69,6 @@ async def recharge(
     Returns:
         Updated user credit account
     """
-    # Check for idempotency - prevent duplicate transactions
-    await CreditEvent.check_upstream_tx_id_exists(
-        session, UpstreamType.API, upstream_tx_id
-    )
-
     if amount <= Decimal("0"):
         raise ValueError("Recharge amount must be positive")
 
@@ -97,8 +108,8 @@ async def recharge(
         base_original_amount=amount,
         note=note,
     )
-    session.add(event)
-    await session.flush()
+    # duplicates of upstream_tx_id are rejected by the unique index
+    await CreditEvent.insert_in_session(session, event)
 
     # 4. Create credit transaction records
     # 4.1 User account transaction (credit)
@@ -151,11 +162,6 @@ async def reward(
     Returns:
         Updated user credit account
     """
-    # Check for idempotency - prevent duplicate transactions
-    await CreditEvent.check_upstream_tx_id_exists(
-        session, UpstreamType.API, upstream_tx_id
-    )
-
     if amount <= Decimal("0"):
         raise ValueError("Reward amount must be positive")
 
@@ -195,8 +201,8 @@ async def reward(
         base_original_amount=amount,
         note=note,
     )
-    session.add(event)
-    await session.flush()
+    # duplicates of upstream_tx_id are rejected by the unique index
+    await CreditEvent.insert_in_session(session, event)
 
     # 4. Create credit transaction records
     # 4.1 User account transaction (credit)
@@ -251,11 +257,6 @@ async def adjustment(
     Returns:
         Updated user credit account
     """
-    # Check for idempotency - prevent duplicate transactions
-    await CreditEvent.check_upstream_tx_id_exists(
-        session, UpstreamType.API, upstream_tx_id
-    )
-
     if amount == Decimal("0"):
         raise ValueError("Adjustment amount cannot be zero")
 
@@ -326,8 +327,8 @@ async def adjustment(
         base_original_amount=abs_amount,
         note=note,
     )
-    session.add(event)
-    await session.flush()
+    # duplicates of upstream_tx_id are rejected by the unique index
+    await CreditEvent.insert_in_session(session, event)
 
     # 4. Create credit transaction records
     # 4.1 User account transaction
@@ -626,11 +627,6 @@ async def expense_message(
     Returns:
         Updated user credit account
     """
-    # Check for idempotency - prevent duplicate transactions
-    await CreditEvent.check_upstream_tx_id_exists(
-        session, UpstreamType.EXECUTOR, message_id
-    )
-
     if base_llm_amount < Decimal("0"):
         raise ValueError("Base LLM amount must be non-negative")
 
@@ -659,7 +655,7 @@ async def expense_message(
     platform_account = await CreditAccount.income_in_session(
         session=session,
         owner_type=OwnerType.PLATFORM,
-        owner_id=DEFAULT_PLATFORM_ACCOUNT_FEE,
+        owner_id=platform_account_shard(DEFAULT_PLATFORM_ACCOUNT_FEE, user_id),
         credit_type=credit_type,
         amount=fee_platform_amount,
     )
@@ -696,8 +692,8 @@ async def expense_message(
         fee_agent_amount=fee_agent_amount,
         fee_agent_account=agent_account.id if fee_agent_amount > 0 else None,
     )
-    session.add(event)
-    await session.flush()
+    # duplicates of upstream_tx_id are rejected by the unique index
+    await CreditEvent.insert_in_session(session, event)
 
     # 4. Create credit transaction records
     # 4.1 User account transaction (debit)
@@ -770,16 +766,12 @@ async def expense_skill(
     Returns:
         Updated user credit account
     """
-    # Check for idempotency - prevent duplicate transactions
     upstream_tx_id = f"{message_id}_{skill_call_id}"
-    await CreditEvent.check_upstream_tx_id_exists(
-        session, UpstreamType.EXECUTOR, upstream_tx_id
-    )
 
     # Get amount, FIXME: hardcode now
     logger.info(f"skill payment {skill_name}")
     base_skill_amount = 1
-    fee_dev_user = DEFAULT_PLATFORM_ACCOUNT_DEV
+    fee_dev_user = platform_account_shard(DEFAULT_PLATFORM_ACCOUNT_DEV, user_id)
     fee_dev_user_type = OwnerType.PLATFORM
     fee_dev_percentage = Decimal("0.1")
 
@@ -812,7 +804,7 @@ async def expense_skill(
     platform_account = await CreditAccount.income_in_session(
         session=session,
         owner_type=OwnerType.PLATFORM,
-        owner_id=DEFAULT_PLATFORM_ACCOUNT_FEE,
+        owner_id=platform_account_shard(DEFAULT_PLATFORM_ACCOUNT_FEE, user_id),
         credit_type=credit_type,
         amount=fee_platform_amount,
     )
@@ -859,8 +851,8 @@ async def expense_skill(
         fee_dev_amount=fee_dev_amount,
         fee_dev_account=dev_account.id if fee_dev_amount > 0 else None,
     )
-    session.add(event)
-    await session.flush()
+    # duplicates of upstream_tx_id are rejected by the unique index
+    await CreditEvent.insert_in_session(session, event)
 
     # 4. Create credit transaction records
     # 4.1 User account transaction (debit)
@@ -919,6 +911,540 @@ async def expense_skill(
     return user_account
 
 
+def message_charge(
+    message_id: str,
+    base_llm_amount: Decimal,
+    user_id: str,
+    agent_fee_percentage: Decimal,
+    agent_owner_id: str,
+) -> CreditEventItem:
+    """
+    Calculate the charge of an agent message, to be settled with expense_execution.
+
+    Args:
+        message_id: ID of the message that incurred the expense
+        base_llm_amount: Amount of LLM costs
+        user_id: ID of the user paying
+        agent_fee_percentage: Fee percentage of the agent
+        agent_owner_id: ID of the agent owner, who pays no agent fee
+
+    Returns:
+        The charge, same amounts as expense_message
+    """
+    if base_llm_amount < Decimal("0"):
+        raise ValueError("Base LLM amount must be non-negative")
+
+    fee_platform_amount = base_llm_amount * Decimal(
+        str(config.payment_fee_platform_percentage)
+    )
+    fee_agent_amount = (
+        base_llm_amount * agent_fee_percentage
+        if user_id != agent_owner_id
+        else Decimal("0")
+    )
+    return CreditEventItem(
+        event_type=EventType.MESSAGE,
+        message_id=message_id,
+        base_llm_amount=base_llm_amount,
+        fee_platform_amount=fee_platform_amount,
+        fee_agent_amount=fee_agent_amount,
+        total_amount=base_llm_amount + fee_platform_amount + fee_agent_amount,
+    )
+
+
+def skill_charge(
+    message_id: str,
+    skill_call_id: str,
+    skill_name: str,
+    user_id: str,
+    agent_fee_percentage: Decimal,
+    agent_owner_id: str,
+) -> CreditEventItem:
+    """
+    Calculate the charge of a skill call, to be settled with expense_execution.
+
+    Args:
+        message_id: ID of the skill message that incurred the expense
+        skill_call_id: ID of the skill call
+        skill_name: Name of the skill
+        user_id: ID of the user paying
+        agent_fee_percentage: Fee percentage of the agent
+        agent_owner_id: ID of the agent owner, who pays no agent fee
+
+    Returns:
+        The charge, same amounts as expense_skill
+    """
+    # Get amount, FIXME: hardcode now, same as expense_skill
+    base_skill_amount = Decimal("1")
+    fee_dev_percentage = Decimal("0.1")
+
+    fee_platform_amount = base_skill_amount * Decimal(
+        str(config.payment_fee_platform_percentage)
+    )
+    fee_agent_amount = (
+        base_skill_amount * agent_fee_percentage
+        if user_id != agent_owner_id
+        else Decimal("0")
+    )
+    fee_dev_amount = base_skill_amount * fee_dev_percentage
+    return CreditEventItem(
+        event_type=EventType.SKILL_CALL,
+        message_id=message_id,
+        skill_call_id=skill_call_id,
+        skill_name=skill_name,
+        base_skill_amount=base_skill_amount,
+        fee_platform_amount=fee_platform_amount,
+        fee_dev_amount=fee_dev_amount,
+        fee_agent_amount=fee_agent_amount,
+        total_amount=base_skill_amount
+        + fee_platform_amount
+        + fee_dev_amount
+        + fee_agent_amount,
+    )
+
+
+async def expense_execution(
+    session: AsyncSession,
+    agent_id: str,
+    user_id: str,
+    start_message_id: str,
+    items: List[CreditEventItem],
+    hold_id: Optional[str] = None,
+) -> CreditAccount:
+    """
+    Deduct credits from a user account for all charges of one agent execution.
+
+    Compared to expense_message and expense_skill for every charge, every account
+    is updated once, in one transaction, and one event records the totals with
+    the charges in its items. With a hold, the user account is not locked, the
+    charges are deducted from the hold by one conditional update.
+
+    Args:
+        session: Async session to use for database operations
+        agent_id: ID of the agent that was executed
+        user_id: ID of the user to deduct credits from
+        start_message_id: ID of the input message of the execution, also the
+            idempotency key
+        items: Charges from message_charge and skill_charge
+        hold_id: ID of the hold placed by hold_credits for the execution, the
+            charges are deducted from it by settle_hold_in_session
+
+    Returns:
+        Updated user credit account
+    """
+    base_llm_amount = sum((i.base_llm_amount for i in items), Decimal("0"))
+    base_skill_amount = sum((i.base_skill_amount for i in items), Decimal("0"))
+    fee_platform_amount = sum((i.fee_platform_amount for i in items), Decimal("0"))
+    fee_dev_amount = sum((i.fee_dev_amount for i in items), Decimal("0"))
+    fee_agent_amount = sum((i.fee_agent_amount for i in items), Decimal("0"))
+    base_amount = base_llm_amount + base_skill_amount
+    total_amount = base_amount + fee_platform_amount + fee_dev_amount + fee_agent_amount
+
+    # 1. Update user account - deduct credits, settling the hold
+    if hold_id:
+        user_account, credit_type = await settle_hold_in_session(
+            session, hold_id, user_id, total_amount
+        )
+    else:
+        user_account, credit_type = await CreditAccount.expense_in_session(
+            session=session,
+            owner_type=OwnerType.USER,
+            owner_id=user_id,
+            amount=total_amount,
+        )
+
+    # 2. Update fee accounts - add credits
+    platform_account = await CreditAccount.income_in_session(
+        session=session,
+        owner_type=OwnerType.PLATFORM,
+        owner_id=platform_account_shard(DEFAULT_PLATFORM_ACCOUNT_FEE, user_id),
+        credit_type=credit_type,
+        amount=fee_platform_amount,
+    )
+    if fee_dev_amount > 0:
+        dev_account = await CreditAccount.income_in_session(
+            session=session,
+            owner_type=OwnerType.PLATFORM,
+            owner_id=platform_account_shard(DEFAULT_PLATFORM_ACCOUNT_DEV, user_id),
+            credit_type=credit_type,
+            amount=fee_dev_amount,
+        )
+    if fee_agent_amount > 0:
+        agent_account = await CreditAccount.income_in_session(
+            session=session,
+            owner_type=OwnerType.AGENT,
+            owner_id=agent_id,
+            credit_type=credit_type,
+            amount=fee_agent_amount,
+        )
+
+    # 3. Create credit event record
+    event_id = str(XID())
+    event = CreditEventTable(
+        id=event_id,
+        account_id=user_account.id,
+        event_type=EventType.EXECUTION,
+        upstream_type=UpstreamType.EXECUTOR,
+        upstream_tx_id=start_message_id,
+        direction=Direction.EXPENSE,
+        agent_id=agent_id,
+        message_id=items[-1].message_id if items else None,
+        start_message_id=start_message_id,
+        total_amount=total_amount,
+        credit_type=credit_type,
+        balance_after=user_account.credits
+        + user_account.free_credits
+        + user_account.reward_credits,
+        base_amount=base_amount,
+        base_original_amount=base_amount,
+        base_llm_amount=base_llm_amount,
+        base_skill_amount=base_skill_amount,
+        fee_platform_amount=fee_platform_amount,
+        fee_agent_amount=fee_agent_amount,
+        fee_agent_account=agent_account.id if fee_agent_amount > 0 else None,
+        fee_dev_amount=fee_dev_amount,
+        fee_dev_account=dev_account.id if fee_dev_amount > 0 else None,
+        items=[i.model_dump(mode="json") for i in items],
+    )
+    # duplicates of upstream_tx_id are rejected by the unique index
+    await CreditEvent.insert_in_session(session, event)
+
+    # 4. Create credit transaction records
+    # 4.1 User account transaction (debit)
+    session.add(
+        CreditTransactionTable(
+            id=str(XID()),
+            account_id=user_account.id,
+            event_id=event_id,
+            tx_type=TransactionType.PAY,
+            credit_debit=CreditDebit.DEBIT,
+            change_amount=total_amount,
+            credit_type=credit_type,
+        )
+    )
+
+    # 4.2 Platform fee account transaction (credit)
+    session.add(
+        CreditTransactionTable(
+            id=str(XID()),
+            account_id=platform_account.id,
+            event_id=event_id,
+            tx_type=TransactionType.RECEIVE_FEE_PLATFORM,
+            credit_debit=CreditDebit.CREDIT,
+            change_amount=fee_platform_amount,
+            credit_type=credit_type,
+        )
+    )
+
+    # 4.3 Dev account transaction (credit)
+    if fee_dev_amount > 0:
+        session.add(
+            CreditTransactionTable(
+                id=str(XID()),
+                account_id=dev_account.id,
+                event_id=event_id,
+                tx_type=TransactionType.RECEIVE_FEE_DEV,
+                credit_debit=CreditDebit.CREDIT,
+                change_amount=fee_dev_amount,
+                credit_type=credit_type,
+            )
+        )
+
+    # 4.4 Agent fee account transaction (credit)
+    if fee_agent_amount > 0:
+        session.add(
+            CreditTransactionTable(
+                id=str(XID()),
+                account_id=agent_account.id,
+                event_id=event_id,
+                tx_type=TransactionType.RECEIVE_FEE_AGENT,
+                credit_debit=CreditDebit.CREDIT,
+                change_amount=fee_agent_amount,
+                credit_type=credit_type,
+            )
+        )
+
+    # Commit all changes
+    await session.commit()
+
+    return user_account
+
+
+async def hold_credits(
+    user_id: str,
+    agent_id: str,
+    start_message_id: str,
+    amount: Decimal,
+    minimum: Decimal = Decimal("1"),
+) -> Optional[CreditHold]:
+    """
+    Reserve credits of a user account for an agent execution.
+
+    Holds the estimated amount, or what is available if less, as long as at least
+    the minimum is available. The account row is not locked, the hold is added to
+    held_credits by one conditional update, so parallel executions can't reserve
+    the same credits. The charges of the execution are settled against the hold
+    by expense_execution with the hold_id, or the hold is released by
+    release_hold.
+
+    Args:
+        user_id: ID of the user paying for the execution
+        agent_id: ID of the agent being executed
+        start_message_id: ID of the input message of the execution
+        amount: Estimated cost of the execution
+        minimum: Minimum available credits to start the execution
+
+    Returns:
+        The hold, or None if the available credits are less than the minimum
+    """
+    async with get_session() as session:
+        for _ in range(HOLD_ATTEMPTS):
+            account = await CreditAccount.get_or_create_in_session(
+                session, OwnerType.USER, user_id
+            )
+            held = min(amount, account.available_credits)
+            if held < minimum:
+                return None
+            stmt = (
+                update(CreditAccountTable)
+                .where(
+                    CreditAccountTable.id == account.id,
+                    CreditAccountTable.free_credits
+                    + CreditAccountTable.reward_credits
+                    + CreditAccountTable.credits
+                    - CreditAccountTable.held_credits
+                    >= held,
+                )
+                .values(held_credits=CreditAccountTable.held_credits + held)
+                .returning(CreditAccountTable.id)
+            )
+            if await session.scalar(stmt):
+                break
+            # a parallel hold or expense changed the balance, try again
+            await session.rollback()
+        else:
+            return None
+
+        hold = CreditHoldTable(
+            id=str(XID()),
+            account_id=account.id,
+            agent_id=agent_id,
+            start_message_id=start_message_id,
+            amount=held,
+            status=HoldStatus.HELD,
+            expires_at=datetime.now(timezone.utc) + HOLD_TTL,
+        )
+        session.add(hold)
+        await session.commit()
+        await session.refresh(hold)
+        return CreditHold.model_validate(hold)
+
+
+async def extend_hold(
+    user_id: str,
+    hold: CreditHold,
+    amount: Decimal,
+    minimum: Decimal = Decimal("1"),
+) -> Optional[CreditHold]:
+    """
+    Reserve more credits for an agent execution whose charges reached its hold.
+
+    Adds the amount, or what is available if less, to the hold, as long as at
+    least the minimum is available, with the same conditional update of
+    held_credits as hold_credits.
+
+    Args:
+        user_id: ID of the user paying for the execution
+        hold: The hold of the execution
+        amount: Credits to add to the hold
+        minimum: Minimum available credits to go on with the execution
+
+    Returns:
+        The extended hold, or None if the available credits are less than the
+        minimum or the hold is no longer held
+    """
+    async with get_session() as session:
+        for _ in range(HOLD_ATTEMPTS):
+            account = await CreditAccount.get_or_create_in_session(
+                session, OwnerType.USER, user_id
+            )
+            extra = min(amount, account.available_credits)
+            if extra < minimum:
+                return None
+            stmt = (
+                update(CreditAccountTable)
+                .where(
+                    CreditAccountTable.id == account.id,
+                    CreditAccountTable.free_credits
+                    + CreditAccountTable.reward_credits
+                    + CreditAccountTable.credits
+                    - CreditAccountTable.held_credits
+                    >= extra,
+                )
+                .values(held_credits=CreditAccountTable.held_credits + extra)
+                .returning(CreditAccountTable.id)
+            )
+            if await session.scalar(stmt):
+                break
+            # a parallel hold or expense changed the balance, try again
+            await session.rollback()
+        else:
+            return None
+
+        stmt = (
+            update(CreditHoldTable)
+            .where(
+                CreditHoldTable.id == hold.id, CreditHoldTable.status == HoldStatus.HELD
+            )
+            .values(
+                amount=CreditHoldTable.amount + extra,
+                expires_at=datetime.now(timezone.utc) + HOLD_TTL,
+            )
+            .returning(CreditHoldTable)
+        )
+        extended = await session.scalar(stmt)
+        if not extended:
+            # released as expired meanwhile, nothing to add to
+            await session.rollback()
+            return None
+        await session.commit()
+        return CreditHold.model_validate(extended)
+
+
+async def release_hold_in_session(
+    session: AsyncSession,
+    hold_id: str,
+    status: HoldStatus = HoldStatus.RELEASED,
+) -> None:
+    """
+    Return the credits of a hold to the available balance of its account.
+
+    Does nothing if the hold is already settled or released.
+
+    Args:
+        session: Async session to use for database operations
+        hold_id: ID of the hold
+        status: SETTLED when the charges of the execution were deducted,
+            RELEASED otherwise
+    """
+    stmt = (
+        update(CreditHoldTable)
+        .where(CreditHoldTable.id == hold_id, CreditHoldTable.status == HoldStatus.HELD)
+        .values(status=status)
+        .returning(CreditHoldTable.account_id, CreditHoldTable.amount)
+    )
+    row = (await session.execute(stmt)).first()
+    if not row:
+        return
+    await session.execute(
+        update(CreditAccountTable)
+        .where(CreditAccountTable.id == row.account_id)
+        .values(held_credits=CreditAccountTable.held_credits - row.amount)
+    )
+
+
+async def settle_hold_in_session(
+    session: AsyncSession,
+    hold_id: str,
+    user_id: str,
+    amount: Decimal,
+) -> Tuple[CreditAccount, CreditType]:
+    """
+    Deduct the charges of an execution from the user account, using up its hold.
+
+    The account row is not locked again, one conditional update deducts the
+    amount and removes the hold from held_credits. The hold only counts if it is
+    still held, an expired and released hold is not removed twice. An amount
+    larger than the hold is still deducted, the cost is already spent, so the
+    account may be overdrawn, which is logged.
+
+    Args:
+        session: Async session to use for database operations
+        hold_id: ID of the hold placed by hold_credits
+        user_id: ID of the user paying for the execution
+        amount: Total amount of the charges of the execution
+
+    Returns:
+        Updated user credit account and the credit type deducted
+    """
+    stmt = (
+        update(CreditHoldTable)
+        .where(CreditHoldTable.id == hold_id, CreditHoldTable.status == HoldStatus.HELD)
+        .values(status=HoldStatus.SETTLED)
+        .returning(CreditHoldTable.amount)
+    )
+    held = await session.scalar(stmt) or Decimal("0")
+    account = await CreditAccount.get_or_create_in_session(
+        session, OwnerType.USER, user_id
+    )
+
+    credit_type = CreditType.PERMANENT
+    if amount <= account.free_credits:
+        credit_type = CreditType.FREE
+    elif amount <= account.reward_credits:
+        credit_type = CreditType.REWARD
+    while True:
+        column = getattr(CreditAccountTable, credit_type.value)
+        stmt = update(CreditAccountTable).where(CreditAccountTable.id == account.id)
+        if credit_type != CreditType.PERMANENT:
+            stmt = stmt.where(column >= amount)
+        stmt = stmt.values(
+            {
+                credit_type.value: column - amount,
+                "held_credits": CreditAccountTable.held_credits - held,
+                "expense_at": datetime.now(timezone.utc),
+            }
+        ).returning(CreditAccountTable)
+        res = await session.scalar(stmt)
+        if res or credit_type == CreditType.PERMANENT:
+            break
+        # a parallel expense spent the free or reward credits first
+        credit_type = CreditType.PERMANENT
+    if not res:
+        raise HTTPException(status_code=500, detail="Failed to expense credits")
+
+    account = CreditAccount.model_validate(res)
+    if amount > held:
+        logger.warning(
+            f"execution of hold {hold_id} cost {amount}, more than the hold of "
+            f"{held}, available credits of {user_id} are {account.available_credits}"
+        )
+    return account, credit_type
+
+
+async def release_hold(hold_id: str) -> None:
+    """
+    Release a hold of an execution that has nothing to settle.
+
+    Args:
+        hold_id: ID of the hold
+    """
+    async with get_session() as session:
+        await release_hold_in_session(session, hold_id)
+        await session.commit()
+
+
+async def release_expired_holds():
+    """
+    Release the holds of executions that never settled, e.g. the process died.
+    """
+    async with get_session() as session:
+        stmt = select(CreditHoldTable.id).where(
+            CreditHoldTable.status == HoldStatus.HELD,
+            CreditHoldTable.expires_at < datetime.now(timezone.utc),
+        )
+        hold_ids = (await session.scalars(stmt)).all()
+
+    released_count = 0
+    for hold_id in hold_ids:
+        try:
+            await release_hold(hold_id)
+            released_count += 1
+        except Exception as e:
+            logger.error(f"Error releasing hold {hold_id}: {str(e)}")
+    logger.info(f"Released {released_count} expired holds")
+
+
 async def refill_free_credits_for_account(
     session: AsyncSession,
     account: CreditAccount,
@@ -1017,32 +1543,290 @@ async def refill_free_credits_for_account(
     )
 
 
-async def refill_all_free_credits():
+async def refill_free_credits_chunk(
+    session: AsyncSession, after_id: str, limit: int
+) -> Tuple[int, Optional[str]]:
     """
-    Find all eligible accounts and refill their free credits.
-    Eligible accounts are those with refill_amount > 0 and free_credits < free_quota.
+    Refill free credits for the next chunk of eligible accounts, set-based.
+
+    Same as refill_free_credits_for_account for every account in the chunk, but
+    one UPDATE refills all accounts, the events and transactions are inserted in
+    bulk, and the platform refill account is deducted once with the chunk total.
+
+    Args:
+        session: Async session to use for database operations
+        after_id: Only accounts with a greater id are refilled, for keyset paging
+        limit: Maximum number of accounts to refill
+
+    Returns:
+        The number of refilled accounts, and the last refilled account id, None
+        if there are no more eligible accounts
     """
-    async with get_session() as session:
-        # Find all accounts that need refilling
-        stmt = select(CreditAccountTable).where(
+    # 1. Update user accounts - add free credits, up to free_quota
+    chunk = (
+        select(
+            CreditAccountTable.id,
+            func.least(
+                CreditAccountTable.refill_amount,
+                CreditAccountTable.free_quota - CreditAccountTable.free_credits,
+            ).label("amount"),
+        )
+        .where(
+            CreditAccountTable.id > after_id,
             CreditAccountTable.refill_amount > 0,
             CreditAccountTable.free_credits < CreditAccountTable.free_quota,
         )
-        result = await session.execute(stmt)
-        accounts_data = result.scalars().all()
+        .order_by(CreditAccountTable.id)
+        .limit(limit)
+        .with_for_update()
+        .subquery()
+    )
+    stmt = (
+        update(CreditAccountTable)
+        .where(CreditAccountTable.id == chunk.c.id)
+        .values(
+            free_credits=CreditAccountTable.free_credits + chunk.c.amount,
+            income_at=datetime.now(timezone.utc),
+        )
+        .returning(
+            CreditAccountTable.id,
+            chunk.c.amount,
+            CreditAccountTable.free_credits
+            + CreditAccountTable.reward_credits
+            + CreditAccountTable.credits,
+        )
+    )
+    refilled = (await session.execute(stmt)).all()
+    if not refilled:
+        return 0, None
+
+    # 2. Create credit event and transaction records
+    events = []
+    transactions = []
+    for account_id, amount, balance_after in refilled:
+        event_id = str(XID())
+        events.append(
+            {
+                "id": event_id,
+                "account_id": account_id,
+                "event_type": EventType.REFILL,
+                "upstream_type": UpstreamType.SCHEDULER,
+                "upstream_tx_id": str(XID()),
+                "direction": Direction.INCOME,
+                "credit_type": CreditType.FREE,
+                "total_amount": amount,
+                "balance_after": balance_after,
+                "base_amount": amount,
+                "base_original_amount": amount,
+                "note": f"Hourly free credits refill of {amount}",
+            }
+        )
+        # 2.1 User account transaction (credit)
+        transactions.append(
+            {
+                "id": str(XID()),
+                "account_id": account_id,
+                "event_id": event_id,
+                "tx_type": TransactionType.REFILL,
+                "credit_debit": CreditDebit.CREDIT,
+                "change_amount": amount,
+                "credit_type": CreditType.FREE,
+            }
+        )
+        # 2.2 Platform refill account transaction (debit)
+        transactions.append(
+            {
+                "id": str(XID()),
+                "account_id": DEFAULT_PLATFORM_ACCOUNT_REFILL,
+                "event_id": event_id,
+                "tx_type": TransactionType.REFILL,
+                "credit_debit": CreditDebit.DEBIT,
+                "change_amount": amount,
+                "credit_type": CreditType.FREE,
+            }
+        )
+    await session.execute(insert(CreditEventTable), events)
+    await session.execute(insert(CreditTransactionTable), transactions)
 
-        # Convert to Pydantic models
-        accounts = [CreditAccount.model_validate(account) for account in accounts_data]
+    # 3. Update platform refill account - deduct the chunk total
+    await CreditAccount.deduction_in_session(
+        session=session,
+        owner_type=OwnerType.PLATFORM,
+        owner_id=DEFAULT_PLATFORM_ACCOUNT_REFILL,
+        credit_type=CreditType.FREE,
+        amount=sum((amount for _, amount, _ in refilled), Decimal("0")),
+    )
 
-    # Process each account
+    # Commit changes
+    await session.commit()
+    return len(refilled), max(account_id for account_id, _, _ in refilled)
+
+
+async def refill_all_free_credits():
+    """
+    Find all eligible accounts and refill their free credits.
+    Eligible accounts are those with refill_amount > 0 and free_credits < free_quota.
+    """
+    start = time.perf_counter()
     refilled_count = 0
-    for account in accounts:
+    after_id = ""
+    while after_id is not None:
         async with get_session() as session:
             try:
-                await refill_free_credits_for_account(session, account)
-                refilled_count += 1
+                count, after_id = await refill_free_credits_chunk(
+                    session, after_id, REFILL_CHUNK_SIZE
+                )
             except Exception as e:
-                logger.error(f"Error refilling account {account.id}: {str(e)}")
-            # Continue with other accounts even if one fails
+                # the next run retries the chunk
+                logger.error(f"Error refilling accounts after {after_id}: {str(e)}")
+                break
+        refilled_count += count
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Refilled {refilled_count} accounts in {elapsed:.2f}s "
+        f"({refilled_count / elapsed if elapsed else 0:.0f} accounts/s)"
+    )
+
+
+async def get_platform_account(session: AsyncSession, owner_id: str) -> CreditAccount:
+    """
+    Get a platform account, with the balances of its shards not yet rolled up.
+
+    Args:
+        session: Async session to use for database operations
+        owner_id: Owner id of the canonical platform account
+
+    Returns:
+        The canonical account, with the balances summed over all shards
+    """
+    account = await CreditAccount.get_or_create_in_session(
+        session, OwnerType.PLATFORM, owner_id
+    )
+    shards = platform_account_shards(owner_id)
+    if not shards:
+        return account
+    stmt = select(
+        func.coalesce(func.sum(CreditAccountTable.free_credits), 0),
+        func.coalesce(func.sum(CreditAccountTable.reward_credits), 0),
+        func.coalesce(func.sum(CreditAccountTable.credits), 0),
+    ).where(CreditAccountTable.id.in_(shards))
+    free_credits, reward_credits, credits = (await session.execute(stmt)).one()
+    return account.model_copy(
+        update={
+            "free_credits": account.free_credits + free_credits,
+            "reward_credits": account.reward_credits + reward_credits,
+            "credits": account.credits + credits,
+        }
+    )
+
+
+async def rollup_platform_account_shard(
+    session: AsyncSession, owner_id: str, shard_id: str
+):
+    """
+    Move the balances of a platform account shard into the canonical account.
+
+    Args:
+        session: Async session to use for database operations
+        owner_id: Owner id of the canonical platform account
+        shard_id: Owner id of the shard, also its account id
+    """
+    stmt = (
+        select(CreditAccountTable)
+        .where(CreditAccountTable.id == shard_id)
+        .with_for_update()
+    )
+    shard = await session.scalar(stmt)
+    if not shard:
+        return
+    shard = CreditAccount.model_validate(shard)
+
+    for credit_type in CreditType:
+        amount = getattr(shard, credit_type.value)
+        if amount == Decimal("0"):
             continue
-    logger.info(f"Refilled {refilled_count} accounts")
+
+        # 1. Update shard account - deduct credits
+        await CreditAccount.deduction_in_session(
+            session=session,
+            owner_type=OwnerType.PLATFORM,
+            owner_id=shard_id,
+            credit_type=credit_type,
+            amount=amount,
+        )
+
+        # 2. Update canonical account - add credits
+        account = await CreditAccount.income_in_session(
+            session=session,
+            owner_type=OwnerType.PLATFORM,
+            owner_id=owner_id,
+            amount=amount,
+            credit_type=credit_type,
+        )
+
+        # 3. Create credit event record
+        event_id = str(XID())
+        event = CreditEventTable(
+            id=event_id,
+            account_id=account.id,
+            event_type=EventType.ROLLUP,
+            upstream_type=UpstreamType.SCHEDULER,
+            upstream_tx_id=str(XID()),
+            direction=Direction.INCOME,
+            credit_type=credit_type,
+            total_amount=amount,
+            balance_after=account.credits
+            + account.free_credits
+            + account.reward_credits,
+            base_amount=amount,
+            base_original_amount=amount,
+            note=f"Rollup of {shard_id}",
+        )
+        session.add(event)
+        await session.flush()
+
+        # 4. Create credit transaction records
+        # 4.1 Shard account transaction (debit)
+        session.add(
+            CreditTransactionTable(
+                id=str(XID()),
+                account_id=shard_id,
+                event_id=event_id,
+                tx_type=TransactionType.ROLLUP,
+                credit_debit=CreditDebit.DEBIT,
+                change_amount=amount,
+                credit_type=credit_type,
+            )
+        )
+
+        # 4.2 Canonical account transaction (credit)
+        session.add(
+            CreditTransactionTable(
+                id=str(XID()),
+                account_id=account.id,
+                event_id=event_id,
+                tx_type=TransactionType.ROLLUP,
+                credit_debit=CreditDebit.CREDIT,
+                change_amount=amount,
+                credit_type=credit_type,
+            )
+        )
+
+    # Commit changes
+    await session.commit()
+
+
+async def rollup_platform_account_shards():
+    """
+    Roll up the shards of all sharded platform accounts.
+    """
+    rolled_count = 0
+    for owner_id in SHARDED_PLATFORM_ACCOUNTS:
+        for shard_id in platform_account_shards(owner_id):
+            async with get_session() as session:
+                try:
+                    await rollup_platform_account_shard(session, owner_id, shard_id)
+                    rolled_count += 1
+                except Exception as e:
+                    logger.error(f"Error rolling up shard {shard_id}: {str(e)}")
+    logger.info(f"Rolled up {rolled_count} platform account shards")
@@ -10,12 +10,17 @@ This module provides functionality for initializing and executing AI agents. It
 The module uses a global cache to store initialized agents for better performance.
 """
 
+import asyncio
+import hashlib
 import importlib
+import json
 import logging
 import textwrap
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from importlib.metadata import version
+from typing import Any, AsyncIterator, Optional
 
 import sqlalchemy
 from coinbase_agentkit import (
@@ -43,26 +48,48 @@ from langchain_core.messages import (
     HumanMessage,
 )
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_core.tools import BaseTool
 from langchain_openai import ChatOpenAI
 from langchain_xai import ChatXAI
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
-from langgraph.graph.graph import CompiledGraph
-from sqlalchemy import func, update
+from sqlalchemy import desc, func, select, update
 from sqlalchemy.exc import SQLAlchemyError
 
 from abstracts.graph import AgentState
 from app.config.config import config
 from app.core.agent import AgentStore
-from app.core.credit import expense_message, expense_skill
-from app.core.graph import create_agent
+from app.core.credit import (
+    expense_execution,
+    extend_hold,
+    hold_credits,
+    message_charge,
+    release_hold,
+    skill_charge,
+)
+from app.core.graph import create_agent, summarizing_memory_manager
+from app.core.llm import llm_http_clients
 from app.core.prompt import agent_prompt
 from app.core.skill import skill_store
-from models.agent import Agent, AgentData, AgentQuota, AgentTable
-from models.chat import AuthorType, ChatMessage, ChatMessageCreate, ChatMessageSkillCall
-from models.credit import CreditAccount, OwnerType
+from models.agent import (
+    Agent,
+    AgentContext,
+    AgentData,
+    AgentQuota,
+    AgentTable,
+    evict_cached_agent,
+)
+from models.chat import (
+    AuthorType,
+    ChatMessage,
+    ChatMessageBuffer,
+    ChatMessageCreate,
+    ChatMessageSkillCall,
+    ChatMessageTable,
+)
+from models.credit import CreditEventItem, CreditHold
 from models.db import get_pool, get_session
+from models.redis import publish_agent_update, subscribe_agent_updates
 from models.skill import AgentSkillData, ThreadSkillData
 from skills.acolyt import get_acolyt_skill
 from skills.allora import get_allora_skill
@@ -74,21 +101,56 @@ from skills.goat import (
     get_goat_skill,
     init_smart_wallets,
 )
+from skills.lazy import lazy_tools
 from skills.twitter import get_twitter_skill
+from utils.blocking import run_blocking, with_backoff
+from utils.cache import BoundedCache, approximate_size
 
 logger = logging.getLogger(__name__)
 
 
-# Global variable to cache all agent executors
-_agents: dict[str, CompiledGraph] = {}
-_private_agents: dict[str, CompiledGraph] = {}
+def _new_agent_cache() -> BoundedCache[str, tuple[Runnable, datetime]]:
+    return BoundedCache(
+        max_size=config.agent_cache_max_size,
+        ttl=config.agent_cache_ttl,
+        max_memory=config.agent_cache_max_memory_mb * 1024 * 1024,
+        policy=config.agent_cache_policy,
+    )
+
+
+# Global caches of agent executors and the agent update times they were built from
+_agents = _new_agent_cache()
+_private_agents = _new_agent_cache()
 
-# Global dictionaries to cache agent update times
-_agents_updated: dict[str, datetime] = {}
-_private_agents_updated: dict[str, datetime] = {}
+# Conversation memory of all agents
+_checkpointer: AsyncPostgresSaver | None = None
 
+# Whether cached executors are kept fresh by agent update events,
+# if not, every request checks the agent updated_at in the database
+_agent_updates_subscribed = False
 
-async def initialize_agent(aid, is_private=False):
+# In-flight agent initializations, keyed by (agent_id, is_private)
+_agents_initializing: dict[tuple[str, bool], asyncio.Task] = {}
+
+# Counters of agent initializations, callers that awaited an in-flight one
+# instead of initializing again, and how long those callers waited
+_agents_init_stats: dict[str, float] = {
+    "initializations": 0,
+    "coalesced": 0,
+    "coalesced_wait_seconds": 0.0,
+    "coalesced_wait_max_seconds": 0.0,
+}
+
+
+def _get_checkpointer() -> AsyncPostgresSaver:
+    """Get the checkpointer shared by all agents, so they share the graph template."""
+    global _checkpointer
+    if _checkpointer is None:
+        _checkpointer = AsyncPostgresSaver(get_pool())
+    return _checkpointer
+
+
+async def initialize_agent(aid, is_private=False) -> Runnable:
     """Initialize an AI agent with specified configuration and tools.
 
     This function:
@@ -103,7 +165,7 @@ async def initialize_agent(aid, is_private=False):
         is_private (bool, optional): Flag indicating whether the agent is private. Defaults to False.
 
     Returns:
-        Agent: Initialized LangChain agent
+        Runnable: Initialized LangChain agent
 
     Raises:
         HTTPException: If agent not found (404) or database error (500)
@@ -130,6 +192,7 @@ async def initialize_agent(aid, is_private=False):
             presence_penalty=agent.presence_penalty,
             temperature=agent.temperature,
             timeout=300,
+            **llm_http_clients("https://api.deepseek.com", config.deepseek_api_key),
         )
         if input_token_limit > 60000:
             input_token_limit = 60000
@@ -141,6 +204,7 @@ async def initialize_agent(aid, is_private=False):
             presence_penalty=agent.presence_penalty,
             temperature=agent.temperature,
             timeout=180,
+            **llm_http_clients("https://api.x.ai/v1", config.xai_api_key),
         )
         if input_token_limit > 120000:
             input_token_limit = 120000
@@ -154,6 +218,7 @@ async def initialize_agent(aid, is_private=False):
             presence_penalty=agent.presence_penalty,
             temperature=agent.temperature,
             timeout=300,
+            **llm_http_clients("https://api.eternalai.org/v1", config.eternal_api_key),
         )
         if input_token_limit > 60000:
             input_token_limit = 60000
@@ -165,146 +230,29 @@ async def initialize_agent(aid, is_private=False):
             presence_penalty=agent.presence_penalty,
             temperature=agent.temperature,
             timeout=180,
+            **llm_http_clients("https://api.openai.com/v1", config.openai_api_key),
         )
         if input_token_limit > 120000:
             input_token_limit = 120000
 
     # ==== Store buffered conversation history in memory.
-    memory = AsyncPostgresSaver(get_pool())
+    memory = _get_checkpointer()
 
     # ==== Load skills
-    tools: list[BaseTool] = []
-
+    # Skill groups are independent, build them concurrently,
+    # the blocking wallet and SDK calls run in the blocking thread pool
+    skill_groups = []
     if agent.skills:
         for k, v in agent.skills.items():
             if not v.get("enabled", False):
                 continue
-            try:
-                skill_module = importlib.import_module(f"skills.{k}")
-                if hasattr(skill_module, "get_skills"):
-                    skill_tools = await skill_module.get_skills(
-                        v, is_private, skill_store, agent_id=aid
-                    )
-                    if skill_tools and len(skill_tools) > 0:
-                        tools.extend(skill_tools)
-                else:
-                    logger.error(f"Skill {k} does not have get_skills function")
-            except ImportError as e:
-                logger.error(f"Could not import skill module: {k} ({e})")
+            skill_groups.append(_load_skill_module(k, v, is_private, aid))
+    skill_groups.append(_load_cdp_tools(agent, agent_data, aid))
+    skill_groups.append(_load_goat_tools(agent, agent_data, agent_store, aid))
 
-    # Configure CDP Agentkit Langchain Extension.
-    # Deprecated
-    cdp_wallet_provider = None
-    if (
-        agent.cdp_enabled
-        and agent_data
-        and agent_data.cdp_wallet_data
-        and agent.cdp_skills
-        and ("cdp" not in agent.skills if agent.skills else True)
-    ):
-        cdp_wallet_provider_config = CdpWalletProviderConfig(
-            api_key_name=config.cdp_api_key_name,
-            api_key_private_key=config.cdp_api_key_private_key,
-            network_id=agent.cdp_network_id,
-            wallet_data=agent_data.cdp_wallet_data,
-        )
-        cdp_wallet_provider = CdpWalletProvider(cdp_wallet_provider_config)
-        agent_kit = AgentKit(
-            AgentKitConfig(
-                wallet_provider=cdp_wallet_provider,
-                action_providers=[
-                    wallet_action_provider(),
-                    cdp_api_action_provider(cdp_wallet_provider_config),
-                    cdp_wallet_action_provider(cdp_wallet_provider_config),
-                    pyth_action_provider(),
-                    basename_action_provider(),
-                    erc20_action_provider(),
-                    erc721_action_provider(),
-                    weth_action_provider(),
-                    morpho_action_provider(),
-                    superfluid_action_provider(),
-                    wow_action_provider(),
-                ],
-            )
-        )
-        cdp_tools = get_langchain_tools(agent_kit)
-        for skill in agent.cdp_skills:
-            if skill == "get_balance":
-                tools.append(
-                    GetBalance(
-                        wallet=cdp_wallet_provider._wallet,
-                        agent_id=aid,
-                        skill_store=skill_store,
-                    )
-                )
-                continue
-            for tool in cdp_tools:
-                if tool.name.endswith(skill):
-                    tools.append(tool)
-
-    if (
-        agent.goat_enabled
-        and agent.crossmint_config
-        and ("goat" not in agent.skills if agent.skills else True)
-    ):
-        if (
-            hasattr(config, "chain_provider")
-            and config.crossmint_api_key
-            and config.crossmint_api_base_url
-        ):
-            crossmint_networks = agent.crossmint_config.get("networks")
-            if crossmint_networks and len(crossmint_networks) > 0:
-                crossmint_wallet_data = (
-                    agent_data.crossmint_wallet_data
-                    if agent_data.crossmint_wallet_data
-                    else {}
-                )
-                try:
-                    smart_wallet_data = create_smart_wallets_if_not_exist(
-                        config.crossmint_api_base_url,
-                        config.crossmint_api_key,
-                        crossmint_wallet_data.get("smart"),
-                    )
-
-                    # save the wallet after first create
-                    if (
-                        not crossmint_wallet_data
-                        or not crossmint_wallet_data.get("smart")
-                        or not crossmint_wallet_data.get("smart").get("evm")
-                        or not crossmint_wallet_data.get("smart")
-                        .get("evm")
-                        .get("address")
-                    ):
-                        await agent_store.set_data(
-                            {
-                                "crossmint_wallet_data": {"smart": smart_wallet_data},
-                            }
-                        )
-
-                    # give rpc some time to prevent error #429
-                    time.sleep(1)
-
-                    evm_crossmint_wallets = init_smart_wallets(
-                        config.crossmint_api_key,
-                        config.chain_provider,
-                        crossmint_networks,
-                        smart_wallet_data["evm"],
-                    )
-
-                    for wallet in evm_crossmint_wallets:
-                        try:
-                            s = get_goat_skill(
-                                wallet,
-                                agent.goat_skills,
-                                skill_store,
-                                agent_store,
-                                aid,
-                            )
-                            tools.extend(s)
-                        except Exception as e:
-                            logger.warning(e)
-                except Exception as e:
-                    logger.warning(e)
+    tools: list[BaseTool] = []
+    for skill_tools in await asyncio.gather(*skill_groups):
+        tools.extend(skill_tools)
 
     # Enso skills
     if (
@@ -433,6 +381,10 @@ async def initialize_agent(aid, is_private=False):
         f"[{aid}{'-private' if is_private else ''}] init prompt: {escaped_prompt}"
     )
 
+    memory_manager = None
+    if agent.short_term_memory_strategy == "summarize":
+        memory_manager = summarizing_memory_manager(llm, input_token_limit)
+
     # Create ReAct Agent using the LLM and CDP Agentkit tools.
     executor = create_agent(
         aid,
@@ -442,41 +394,434 @@ async def initialize_agent(aid, is_private=False):
         state_modifier=formatted_prompt,
         debug=config.debug_checkpoint,
         input_token_limit=input_token_limit,
+        memory_manager=memory_manager,
     )
-    if is_private:
-        _private_agents[aid] = executor
-        _private_agents_updated[aid] = agent.updated_at
-    else:
-        _agents[aid] = executor
-        _agents_updated[aid] = agent.updated_at
+    agents = _private_agents if is_private else _agents
+    # the compiled graph shares the checkpointer and pools with other agents,
+    # so only the per-agent parts count towards the cache memory budget
+    size = approximate_size((tools, llm, prompt)) if agents.max_memory else 0
+    agents.set(aid, (executor, agent.updated_at), size=size)
+    return executor
+
+
+async def _load_skill_module(
+    name: str, skill_config: dict, is_private: bool, aid: str
+) -> list[BaseTool]:
+    """Load the tools of a skill category configured in agent.skills."""
+    try:
+        skill_module = importlib.import_module(f"skills.{name}")
+        if hasattr(skill_module, "get_skills"):
+            skill_tools = await skill_module.get_skills(
+                skill_config, is_private, skill_store, agent_id=aid
+            )
+            return skill_tools or []
+        else:
+            logger.error(f"Skill {name} does not have get_skills function")
+    except ImportError as e:
+        logger.error(f"Could not import skill module: {name} ({e})")
+    return []
 
 
-async def agent_executor(agent_id: str, is_private: bool) -> (CompiledGraph, float):
+async def _load_cdp_tools(
+    agent: Agent, agent_data: AgentData, aid: str
+) -> list[BaseTool]:
+    """Load the deprecated CDP Agentkit skills configured in agent.cdp_skills."""
+    if not (
+        agent.cdp_enabled
+        and agent_data
+        and agent_data.cdp_wallet_data
+        and agent.cdp_skills
+        and ("cdp" not in agent.skills if agent.skills else True)
+    ):
+        return []
+
+    def _build() -> list[BaseTool]:
+        # the wallet provider fetches the wallet from CDP, it blocks
+        cdp_wallet_provider_config = CdpWalletProviderConfig(
+            api_key_name=config.cdp_api_key_name,
+            api_key_private_key=config.cdp_api_key_private_key,
+            network_id=agent.cdp_network_id,
+            wallet_data=agent_data.cdp_wallet_data,
+        )
+        cdp_wallet_provider = CdpWalletProvider(cdp_wallet_provider_config)
+        agent_kit = AgentKit(
+            AgentKitConfig(
+                wallet_provider=cdp_wallet_provider,
+                action_providers=[
+                    wallet_action_provider(),
+                    cdp_api_action_provider(cdp_wallet_provider_config),
+                    cdp_wallet_action_provider(cdp_wallet_provider_config),
+                    pyth_action_provider(),
+                    basename_action_provider(),
+                    erc20_action_provider(),
+                    erc721_action_provider(),
+                    weth_action_provider(),
+                    morpho_action_provider(),
+                    superfluid_action_provider(),
+                    wow_action_provider(),
+                ],
+            )
+        )
+        return get_langchain_tools(agent_kit)
+
+    # the wallet is only fetched once a tool is called, when the specs are known
+    cdp_tools = await lazy_tools(
+        ("cdp-legacy", version("coinbase-agentkit"), agent.cdp_network_id),
+        lambda: run_blocking(_build),
+    )
+    tools: list[BaseTool] = []
+    for skill in agent.cdp_skills:
+        if skill == "get_balance":
+            tools.append(
+                GetBalance(
+                    agent_id=aid,
+                    skill_store=skill_store,
+                )
+            )
+            continue
+        for tool in cdp_tools:
+            if tool.name.endswith(skill):
+                tools.append(tool)
+    return tools
+
+
+async def _load_goat_tools(
+    agent: Agent, agent_data: AgentData, agent_store: AgentStore, aid: str
+) -> list[BaseTool]:
+    """Load the deprecated GOAT skills configured in agent.goat_skills."""
+    if not (
+        agent.goat_enabled
+        and agent.crossmint_config
+        and ("goat" not in agent.skills if agent.skills else True)
+    ):
+        return []
+    if not (
+        hasattr(config, "chain_provider")
+        and config.crossmint_api_key
+        and config.crossmint_api_base_url
+    ):
+        return []
+    crossmint_networks = agent.crossmint_config.get("networks")
+    if not crossmint_networks or len(crossmint_networks) == 0:
+        return []
+
+    async def build() -> list[BaseTool]:
+        tools: list[BaseTool] = []
+        crossmint_wallet_data = (
+            agent_data.crossmint_wallet_data if agent_data.crossmint_wallet_data else {}
+        )
+        smart_wallet_data = await with_backoff(
+            lambda: run_blocking(
+                create_smart_wallets_if_not_exist,
+                config.crossmint_api_base_url,
+                config.crossmint_api_key,
+                crossmint_wallet_data.get("smart"),
+            )
+        )
+
+        # save the wallet after first create
+        if (
+            not crossmint_wallet_data
+            or not crossmint_wallet_data.get("smart")
+            or not crossmint_wallet_data.get("smart").get("evm")
+            or not crossmint_wallet_data.get("smart").get("evm").get("address")
+        ):
+            await agent_store.set_data(
+                {
+                    "crossmint_wallet_data": {"smart": smart_wallet_data},
+                }
+            )
+
+        # retry on rpc error #429 instead of always waiting before the call
+        evm_crossmint_wallets = await with_backoff(
+            lambda: run_blocking(
+                init_smart_wallets,
+                config.crossmint_api_key,
+                config.chain_provider,
+                crossmint_networks,
+                smart_wallet_data["evm"],
+            )
+        )
+
+        for wallet in evm_crossmint_wallets:
+            try:
+                s = await run_blocking(
+                    get_goat_skill,
+                    wallet,
+                    agent.goat_skills,
+                    skill_store,
+                    agent_store,
+                    aid,
+                )
+                tools.extend(s)
+            except Exception as e:
+                logger.warning(e)
+        return tools
+
+    # the tools depend on the plugins and their options, which may hold secrets
+    plugins = hashlib.sha256(
+        json.dumps(agent.goat_skills, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    try:
+        return await lazy_tools(
+            ("goat", version("goat-sdk"), tuple(crossmint_networks), plugins), build
+        )
+    except Exception as e:
+        logger.warning(e)
+        return []
+
+
+async def agent_executor(
+    agent_id: str, is_private: bool, agent: Optional[Agent] = None
+) -> (Runnable, float):
     start = time.perf_counter()
-    agent = await Agent.get(agent_id)
+    agents = _private_agents if is_private else _agents
+
+    # Cached executors are evicted on agent update events, no need to check
+    if _agent_updates_subscribed:
+        cached = agents.get(agent_id)
+        if cached:
+            return cached[0], 0.0
+
+    # the caller may have loaded the agent already
+    if agent is None:
+        agent = await Agent.get(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
-    agents = _private_agents if is_private else _agents
-    agents_updated = _private_agents_updated if is_private else _agents_updated
 
     # Check if agent needs reinitialization due to updates
-    needs_reinit = False
-    if agent_id in agents:
-        if (
-            agent_id not in agents_updated
-            or agent.updated_at != agents_updated[agent_id]
-        ):
-            needs_reinit = True
-            logger.info(
-                f"Reinitializing agent {agent_id} due to updates, private mode: {is_private}"
-            )
+    cached = agents.get(agent_id)
+    if cached:
+        executor, updated_at = cached
+        # a cached agent may be a little older than the executor
+        if agent.updated_at <= updated_at:
+            return executor, 0.0
+        logger.info(
+            f"Reinitializing agent {agent_id} due to updates, private mode: {is_private}"
+        )
 
     # cold start or needs reinitialization
-    cold_start_cost = 0.0
-    if (agent_id not in agents) or needs_reinit:
-        await initialize_agent(agent_id, is_private)
-        cold_start_cost = time.perf_counter() - start
-    return agents[agent_id], cold_start_cost
+    executor = await _initialize_agent_once(agent_id, is_private)
+    cold_start_cost = time.perf_counter() - start
+    return executor, cold_start_cost
+
+
+async def _initialize_agent_once(agent_id: str, is_private: bool) -> Runnable:
+    """Initialize an agent, coalescing concurrent callers into one initialization.
+
+    The first caller for a given (agent_id, is_private) starts the initialization,
+    later callers await the same task instead of rebuilding the agent again.
+    The task is shielded, so a cancelled request does not abort the
+    initialization that other callers are waiting for.
+
+    Args:
+        agent_id (str): Agent ID to initialize
+        is_private (bool): Flag indicating whether the agent is private
+
+    Returns:
+        Runnable: Initialized LangChain agent
+    """
+    key = (agent_id, is_private)
+    task = _agents_initializing.get(key)
+    if task is None:
+        task = asyncio.create_task(initialize_agent(agent_id, is_private))
+        _agents_initializing[key] = task
+        _agents_init_stats["initializations"] += 1
+
+        def _done(t: asyncio.Task) -> None:
+            if _agents_initializing.get(key) is t:
+                del _agents_initializing[key]
+
+        task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    wait_start = time.perf_counter()
+    try:
+        return await asyncio.shield(task)
+    finally:
+        waited = time.perf_counter() - wait_start
+        _agents_init_stats["coalesced"] += 1
+        _agents_init_stats["coalesced_wait_seconds"] += waited
+        if waited > _agents_init_stats["coalesced_wait_max_seconds"]:
+            _agents_init_stats["coalesced_wait_max_seconds"] = waited
+        logger.info(
+            f"[{agent_id}{'-private' if is_private else ''}] "
+            f"waited {waited:.3f}s for in-flight initialization"
+        )
+
+
+def evict_agent(agent_id: str, updated_at: datetime | None = None) -> None:
+    """Evict the cached executors of an agent.
+
+    Args:
+        agent_id (str): Agent ID
+        updated_at (datetime | None): Current updated_at of the agent, executors
+            built from this version are kept. None evicts unconditionally.
+    """
+    evict_cached_agent(agent_id, updated_at)
+    for is_private, agents in ((False, _agents), (True, _private_agents)):
+        cached = agents.peek(agent_id)
+        if cached and (updated_at is None or cached[1] != updated_at):
+            agents.pop(agent_id)
+            logger.info(f"[{agent_id}] evicted cached executor")
+        # an in-flight initialization may have loaded the agent before the change
+        task = _agents_initializing.get((agent_id, is_private))
+        if task:
+            task.add_done_callback(lambda _: evict_agent(agent_id, updated_at))
+
+
+async def reconcile_agents() -> None:
+    """Evict cached executors whose agent changed or was deleted in the database.
+
+    This is the safety net for agent update events lost by the subscriber.
+    """
+    agent_ids = set(_agents.keys()) | set(_private_agents.keys())
+    if not agent_ids:
+        return
+    async with get_session() as db:
+        rows = await db.execute(
+            select(AgentTable.id, AgentTable.updated_at).where(
+                AgentTable.id.in_(agent_ids)
+            )
+        )
+        current = {row.id: row.updated_at for row in rows}
+    for agent_id in agent_ids:
+        if agent_id not in current:
+            evict_agent(agent_id)
+        else:
+            evict_agent(agent_id, current[agent_id])
+
+
+async def watch_agent_updates() -> None:
+    """Keep the cached executors fresh, runs until cancelled.
+
+    Subscribes to agent update events from Redis and evicts the executors of
+    changed agents, so the request hot path doesn't need to read the agent
+    from the database. Every config.agent_reconcile_interval seconds the cache is
+    also reconciled with the database. While the subscription is down, the hot
+    path falls back to checking the database on every request.
+    """
+    global _agent_updates_subscribed
+
+    async def _reconcile_periodically() -> None:
+        while True:
+            await asyncio.sleep(config.agent_reconcile_interval)
+            try:
+                await reconcile_agents()
+            except Exception as e:
+                logger.error(f"failed to reconcile cached agents: {e}")
+
+    reconcile_task = asyncio.create_task(_reconcile_periodically())
+    try:
+        while True:
+            try:
+                async with subscribe_agent_updates() as updates:
+                    # events are buffered from here, catch up on missed ones
+                    await reconcile_agents()
+                    _agent_updates_subscribed = True
+                    logger.info("subscribed to agent updates")
+                    async for agent_id, updated_at in updates:
+                        evict_agent(agent_id, updated_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"agent updates subscription lost: {e}")
+            finally:
+                _agent_updates_subscribed = False
+            await asyncio.sleep(5)
+    finally:
+        reconcile_task.cancel()
+
+
+async def most_active_agents(limit: int, hours: int) -> list[tuple[str, bool]]:
+    """Get the agents with the most web chat messages in the recent hours.
+
+    Args:
+        limit (int): Maximum number of executors to return
+        hours (int): How many hours of chat history to look at
+
+    Returns:
+        list[tuple[str, bool]]: (agent_id, is_private) of the most used executors,
+            most active first
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    is_private = func.coalesce(ChatMessageTable.user_id == AgentTable.owner, False)
+    count = func.count(ChatMessageTable.id)
+    async with get_session() as db:
+        rows = await db.execute(
+            select(ChatMessageTable.agent_id, is_private.label("is_private"))
+            .join(AgentTable, AgentTable.id == ChatMessageTable.agent_id)
+            .where(
+                ChatMessageTable.created_at >= since,
+                # the other entrypoints run their executors in their own processes
+                ChatMessageTable.author_type == AuthorType.WEB,
+            )
+            .group_by(ChatMessageTable.agent_id, is_private)
+            .order_by(desc(count))
+            .limit(limit)
+        )
+        return [(row.agent_id, row.is_private) for row in rows]
+
+
+async def warm_up_agents(
+    executors: list[tuple[str, bool]], concurrency: int = 4
+) -> int:
+    """Initialize agent executors ahead of their first request.
+
+    Failures are logged and skipped, a broken agent must not block the others.
+
+    Args:
+        executors (list[tuple[str, bool]]): (agent_id, is_private) to initialize
+        concurrency (int): Maximum number of agents initialized at the same time
+
+    Returns:
+        int: Number of executors initialized successfully
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def _warm_up(agent_id: str, is_private: bool) -> bool:
+        async with semaphore:
+            try:
+                _, cost = await agent_executor(agent_id, is_private)
+                logger.info(
+                    f"[{agent_id}{'-private' if is_private else ''}] "
+                    f"warmed up in {cost:.3f}s"
+                )
+                return True
+            except Exception as e:
+                logger.warning(
+                    f"[{agent_id}{'-private' if is_private else ''}] "
+                    f"failed to warm up: {e}"
+                )
+                return False
+
+    results = await asyncio.gather(*(_warm_up(a, p) for a, p in executors))
+    return sum(results)
+
+
+def agent_cache_stats() -> dict[str, dict]:
+    """Get statistics of the agent executor caches.
+
+    Returns:
+        dict[str, dict]: Stats of the public and private executor caches,
+            and of the agent initializations
+    """
+    return {
+        "public": _agents.stats(),
+        "private": _private_agents.stats(),
+        "init": agent_init_stats(),
+    }
+
+
+def agent_init_stats() -> dict[str, float]:
+    """Get agent initialization statistics.
+
+    Returns:
+        dict[str, float]: Number of initializations, number of coalesced callers,
+            total and max seconds the coalesced callers waited, and the number
+            of initializations currently in flight
+    """
+    return {**_agents_init_stats, "in_flight": len(_agents_initializing)}
 
 
 async def execute_agent(
@@ -498,17 +843,112 @@ async def execute_agent(
     Returns:
         list[ChatMessage]: Formatted response lines including timing information
     """
-    quota = await AgentQuota.get(message.agent_id)
-    if quota and not quota.has_message_quota():
+    return [
+        data
+        async for event, data in _run_agent(message, debug, stream=False)
+        if event == "message"
+    ]
+
+
+async def stream_agent(
+    message: ChatMessageCreate, debug: bool = False
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Execute an agent with the given prompt, yielding events as they happen.
+
+    Events are (name, data) tuples:
+    - token: {"content": str}, a piece of the agent reply generated by the LLM
+    - skill_start: {"id": str, "name": str, "parameters": dict}, a skill is called
+    - skill_end: {"id": str, "name": str, "success": bool}, a skill returned
+    - message: ChatMessage, a response line, the same as execute_agent returns,
+      yielded once saved, the response lines are saved together when the run ends
+
+    Args:
+        message (ChatMessageCreate): The chat message containing agent_id, chat_id, and message content
+        debug (bool): Enable debug mode, will save the skill results
+
+    Yields:
+        tuple[str, Any]: The event name and data
+
+    Raises:
+        HTTPException: Before the first event, if the agent quota is exceeded
+    """
+    async for event in _run_agent(message, debug, stream=True):
+        yield event
+
+
+async def _agent_updates(
+    executor: Runnable, input: dict, stream_config: dict, stream: bool
+) -> AsyncIterator[tuple[str, Any]]:
+    """Run the executor, yield its node updates and, if stream, its live events."""
+    if not stream:
+        async for chunk in executor.astream(input, stream_config):
+            yield "update", chunk
+        return
+
+    # skills that wrap other tools, like the lazy ones, report the outer call only
+    tool_runs = set()
+    async for event in executor.astream_events(input, stream_config, version="v2"):
+        kind = event["event"]
+        if kind == "on_chain_stream" and not event["parent_ids"]:
+            # node updates of the graph itself, the same as astream gives
+            yield "update", event["data"]["chunk"]
+        elif (
+            kind == "on_chat_model_stream"
+            and event["metadata"].get("langgraph_node") == "agent"
+        ):
+            content = event["data"]["chunk"].content
+            if content and isinstance(content, str):
+                yield "token", {"content": content}
+        elif kind == "on_tool_start":
+            if tool_runs.intersection(event["parent_ids"]):
+                continue
+            tool_runs.add(event["run_id"])
+            yield (
+                "skill_start",
+                {
+                    "id": event["run_id"],
+                    "name": event["name"],
+                    "parameters": event["data"].get("input"),
+                },
+            )
+        elif kind == "on_tool_end" and event["run_id"] in tool_runs:
+            tool_runs.discard(event["run_id"])
+            output = event["data"].get("output")
+            yield (
+                "skill_end",
+                {
+                    "id": event["run_id"],
+                    "name": event["name"],
+                    "success": getattr(output, "status", "success") != "error",
+                },
+            )
+        elif kind == "on_tool_error" and event["run_id"] in tool_runs:
+            tool_runs.discard(event["run_id"])
+            yield (
+                "skill_end",
+                {"id": event["run_id"], "name": event["name"], "success": False},
+            )
+
+
+async def _run_agent(
+    message: ChatMessageCreate, debug: bool, stream: bool
+) -> AsyncIterator[tuple[str, Any]]:
+    # reject an agent over its quota before saving the message, the quota is
+    # counted below, once the run can start
+    quota = await AgentQuota.get_cached(message.agent_id)
+    if not quota.has_message_quota():
         raise HTTPException(status_code=429, detail="Agent Daily Quota exceeded")
 
-    resp = []
     start = time.perf_counter()
     # make sure reply_to is set
     message.reply_to = message.id
     input = await message.save()
 
-    agent = await Agent.get(input.agent_id)
+    # the agent, its data and quota are loaded once per turn, from the hot path
+    # cache, and shared with the skills through the stream config
+    context = AgentContext(input.agent_id)
+    agent = await context.agent()
 
     # hack for temporary disable models
     if config.env == "testnet-prod" and agent.model in [
@@ -531,11 +971,12 @@ async def execute_agent(
             time_cost=time.perf_counter() - start,
         )
         error_message = await error_message_create.save()
-        resp.append(error_message)
-        return resp
+        yield "message", error_message
+        return
 
     # check user balance
     # FIXME: payer is agent owner when Telegram/Twitter entrypoints
+    hold = None
     if is_payment_required(input, agent):
         payer = input.user_id
         if (
@@ -543,8 +984,11 @@ async def execute_agent(
             or input.author_type == AuthorType.TWITTER
         ):
             payer = agent.owner
-        user_account = await CreditAccount.get_or_create(OwnerType.USER, payer)
-        if not user_account.has_sufficient_credits(1):
+        # reserve the estimated cost, so parallel runs can't overdraw the account
+        hold = await hold_credits(
+            payer, input.agent_id, input.id, config.payment_hold_amount
+        )
+        if not hold:
             error_message_create = ChatMessageCreate(
                 id=str(XID()),
                 agent_id=input.agent_id,
@@ -558,283 +1002,391 @@ async def execute_agent(
                 time_cost=time.perf_counter() - start,
             )
             error_message = await error_message_create.save()
-            resp.append(error_message)
-            return resp
+            yield "message", error_message
+            return
 
-    # once the input saved, reduce message quota
-    await quota.add_message()
+    # run
+    cached_tool_step = None
+    # messages are saved together at the end of the run, off the critical path
+    buffer = ChatMessageBuffer(after=input.created_at)
+    # charges are settled together at the end of the run, in one transaction
+    charges = []
+    # from here on the hold is settled or released on every exit
+    try:
+        # counted once the run can start, not for an unavailable model or a
+        # payer without credits
+        if not await AgentQuota.consume(input.agent_id, "message"):
+            raise HTTPException(status_code=429, detail="Agent Daily Quota exceeded")
 
-    is_private = False
-    if input.user_id == agent.owner:
-        is_private = True
+        is_private = False
+        if input.user_id == agent.owner:
+            is_private = True
 
-    executor, cold_start_cost = await agent_executor(input.agent_id, is_private)
-    last = start + cold_start_cost
+        executor, cold_start_cost = await agent_executor(
+            input.agent_id, is_private, agent
+        )
+        last = start + cold_start_cost
+
+        # Extract images from attachments
+        image_urls = []
+        if input.attachments:
+            image_urls = [
+                att["url"]
+                for att in input.attachments
+                if "type" in att and att["type"] == "image" and "url" in att
+            ]
 
-    # Extract images from attachments
-    image_urls = []
-    if input.attachments:
-        image_urls = [
-            att["url"]
-            for att in input.attachments
-            if "type" in att and att["type"] == "image" and "url" in att
+        # message
+        # if the model doesn't natively support image parsing, add the image URLs to the message
+        if agent.has_image_parser_skill() and image_urls:
+            input.message += f"\n\nImages:\n{'\n'.join(image_urls)}"
+        content = [
+            {"type": "text", "text": input.message},
+        ]
+        if not agent.has_image_parser_skill() and image_urls:
+            # anyway, pass it directly to LLM
+            content.extend(
+                [
+                    {"type": "image_url", "image_url": {"url": image_url}}
+                    for image_url in image_urls
+                ]
+            )
+        messages = [
+            HumanMessage(content=content),
         ]
 
-    # message
-    # if the model doesn't natively support image parsing, add the image URLs to the message
-    if agent.has_image_parser_skill() and image_urls:
-        input.message += f"\n\nImages:\n{'\n'.join(image_urls)}"
-    content = [
-        {"type": "text", "text": input.message},
-    ]
-    if not agent.has_image_parser_skill() and image_urls:
-        # anyway, pass it directly to LLM
-        content.extend(
-            [
-                {"type": "image_url", "image_url": {"url": image_url}}
-                for image_url in image_urls
-            ]
-        )
-    messages = [
-        HumanMessage(content=content),
-    ]
-
-    entrypoint_prompt = None
-    if (
-        agent.twitter_entrypoint_enabled
-        and agent.twitter_entrypoint_prompt
-        and input.author_type == AuthorType.TWITTER
-    ):
-        entrypoint_prompt = agent.twitter_entrypoint_prompt
-        logger.debug("twitter entrypoint prompt added")
-    elif (
-        agent.telegram_entrypoint_enabled
-        and agent.telegram_entrypoint_prompt
-        and input.author_type == AuthorType.TELEGRAM
-    ):
-        entrypoint_prompt = agent.telegram_entrypoint_prompt
-        logger.debug("telegram entrypoint prompt added")
-
-    # stream config
-    thread_id = f"{input.agent_id}-{input.chat_id}"
-    stream_config = {
-        "configurable": {
-            "agent": agent,
-            "thread_id": thread_id,
-            "user_id": input.user_id,
-            "entrypoint": input.author_type,
-            "entrypoint_prompt": entrypoint_prompt,
+        entrypoint_prompt = None
+        if (
+            agent.twitter_entrypoint_enabled
+            and agent.twitter_entrypoint_prompt
+            and input.author_type == AuthorType.TWITTER
+        ):
+            entrypoint_prompt = agent.twitter_entrypoint_prompt
+            logger.debug("twitter entrypoint prompt added")
+        elif (
+            agent.telegram_entrypoint_enabled
+            and agent.telegram_entrypoint_prompt
+            and input.author_type == AuthorType.TELEGRAM
+        ):
+            entrypoint_prompt = agent.telegram_entrypoint_prompt
+            logger.debug("telegram entrypoint prompt added")
+
+        # stream config
+        thread_id = f"{input.agent_id}-{input.chat_id}"
+        stream_config = {
+            "configurable": {
+                "agent": agent,
+                "context": context,
+                "thread_id": thread_id,
+                "user_id": input.user_id,
+                "entrypoint": input.author_type,
+                "entrypoint_prompt": entrypoint_prompt,
+            }
         }
-    }
 
-    # run
-    cached_tool_step = None
-    async for chunk in executor.astream({"messages": messages}, stream_config):
-        try:
-            this_time = time.perf_counter()
-            # logger.debug(f"stream chunk: {chunk}", extra={"thread_id": thread_id})
-            if "agent" in chunk and "messages" in chunk["agent"]:
-                if len(chunk["agent"]["messages"]) != 1:
-                    logger.error(
-                        "unexpected agent message: " + str(chunk["agent"]["messages"]),
-                        extra={"thread_id": thread_id},
-                    )
-                msg = chunk["agent"]["messages"][0]
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    # tool calls, save for later use
-                    cached_tool_step = msg
-                elif hasattr(msg, "content") and msg.content:
-                    # agent message
-                    chat_message_create = ChatMessageCreate(
-                        id=str(XID()),
+        async for event, chunk in _agent_updates(
+            executor, {"messages": messages}, stream_config, stream
+        ):
+            if event != "update":
+                yield event, chunk
+                continue
+            try:
+                this_time = time.perf_counter()
+                # logger.debug(f"stream chunk: {chunk}", extra={"thread_id": thread_id})
+                if "agent" in chunk and "messages" in chunk["agent"]:
+                    if len(chunk["agent"]["messages"]) != 1:
+                        logger.error(
+                            "unexpected agent message: "
+                            + str(chunk["agent"]["messages"]),
+                            extra={"thread_id": thread_id},
+                        )
+                    msg = chunk["agent"]["messages"][0]
+                    if hasattr(msg, "tool_calls") and msg.tool_calls:
+                        # tool calls, save for later use
+                        cached_tool_step = msg
+                    elif hasattr(msg, "content") and msg.content:
+                        # agent message
+                        chat_message_create = ChatMessageCreate(
+                            id=str(XID()),
+                            agent_id=input.agent_id,
+                            chat_id=input.chat_id,
+                            user_id=input.user_id,
+                            author_id=input.agent_id,
+                            author_type=AuthorType.AGENT,
+                            thread_type=input.author_type,
+                            reply_to=input.id,
+                            message=msg.content,
+                            input_tokens=(
+                                msg.usage_metadata.get("input_tokens", 0)
+                                if hasattr(msg, "usage_metadata") and msg.usage_metadata
+                                else 0
+                            ),
+                            output_tokens=(
+                                msg.usage_metadata.get("output_tokens", 0)
+                                if hasattr(msg, "usage_metadata") and msg.usage_metadata
+                                else 0
+                            ),
+                            time_cost=this_time - last,
+                        )
+                        last = this_time
+                        if cold_start_cost > 0:
+                            chat_message_create.cold_start_cost = cold_start_cost
+                            cold_start_cost = 0
+                        buffer.add(chat_message_create)
+                        # payment
+                        if is_payment_required(input, agent):
+                            amount = (
+                                Decimal("200")
+                                * (
+                                    Decimal(str(chat_message_create.input_tokens))
+                                    * Decimal("0.3")
+                                    + Decimal(str(chat_message_create.output_tokens))
+                                    * Decimal("1.2")
+                                )
+                                / Decimal("1000000")
+                            )
+                            charges.append(
+                                message_charge(
+                                    chat_message_create.id,
+                                    amount,
+                                    payer,
+                                    agent.fee_percentage
+                                    if agent.fee_percentage
+                                    else Decimal("0"),
+                                    agent.owner,
+                                )
+                            )
+                            logger.info(f"[{input.agent_id}] message charge: {amount}")
+                    else:
+                        logger.error(
+                            "unexpected agent message: " + str(msg),
+                            extra={"thread_id": thread_id},
+                        )
+                elif "tools" in chunk and "messages" in chunk["tools"]:
+                    if not cached_tool_step:
+                        logger.error(
+                            "unexpected tools message: " + str(chunk["tools"]),
+                            extra={"thread_id": thread_id},
+                        )
+                        continue
+                    skill_calls = []
+                    skill_message_id = str(XID())
+                    for msg in chunk["tools"]["messages"]:
+                        if not hasattr(msg, "tool_call_id"):
+                            logger.error(
+                                "unexpected tools message: " + str(chunk["tools"]),
+                                extra={"thread_id": thread_id},
+                            )
+                            continue
+                        for call in cached_tool_step.tool_calls:
+                            if call["id"] == msg.tool_call_id:
+                                skill_call: ChatMessageSkillCall = {
+                                    "name": call["name"],
+                                    "parameters": call["args"],
+                                    "success": True,
+                                }
+                                if msg.status == "error":
+                                    skill_call["success"] = False
+                                    skill_call["error_message"] = msg.content
+                                else:
+                                    if debug:
+                                        skill_call["response"] = msg.content
+                                    else:
+                                        skill_call["response"] = textwrap.shorten(
+                                            msg.content, width=100, placeholder="..."
+                                        )
+                                skill_calls.append(skill_call)
+                                # skill payment
+                                if is_payment_required(input, agent):
+                                    charges.append(
+                                        skill_charge(
+                                            skill_message_id,
+                                            call["id"],
+                                            call["name"],
+                                            payer,
+                                            agent.fee_percentage
+                                            if agent.fee_percentage
+                                            else Decimal("0"),
+                                            agent.owner,
+                                        )
+                                    )
+                                    logger.info(
+                                        f"[{input.agent_id}] skill charge: {skill_call}"
+                                    )
+                                break
+                    skill_message_create = ChatMessageCreate(
+                        id=skill_message_id,
                         agent_id=input.agent_id,
                         chat_id=input.chat_id,
                         user_id=input.user_id,
                         author_id=input.agent_id,
-                        author_type=AuthorType.AGENT,
+                        author_type=AuthorType.SKILL,
                         thread_type=input.author_type,
                         reply_to=input.id,
-                        message=msg.content,
+                        message="",
+                        skill_calls=skill_calls,
                         input_tokens=(
-                            msg.usage_metadata.get("input_tokens", 0)
-                            if hasattr(msg, "usage_metadata") and msg.usage_metadata
+                            cached_tool_step.usage_metadata.get("input_tokens", 0)
+                            if hasattr(cached_tool_step, "usage_metadata")
+                            and cached_tool_step.usage_metadata
                             else 0
                         ),
                         output_tokens=(
-                            msg.usage_metadata.get("output_tokens", 0)
-                            if hasattr(msg, "usage_metadata") and msg.usage_metadata
+                            cached_tool_step.usage_metadata.get("output_tokens", 0)
+                            if hasattr(cached_tool_step, "usage_metadata")
+                            and cached_tool_step.usage_metadata
                             else 0
                         ),
                         time_cost=this_time - last,
                     )
                     last = this_time
                     if cold_start_cost > 0:
-                        chat_message_create.cold_start_cost = cold_start_cost
+                        skill_message_create.cold_start_cost = cold_start_cost
                         cold_start_cost = 0
-                    chat_message = await chat_message_create.save()
-                    resp.append(chat_message)
-                    # payment
-                    if is_payment_required(input, agent):
-                        amount = (
-                            Decimal("200")
-                            * (
-                                Decimal(str(chat_message.input_tokens)) * Decimal("0.3")
-                                + Decimal(str(chat_message.output_tokens))
-                                * Decimal("1.2")
-                            )
-                            / Decimal("1000000")
-                        )
-                        async with get_session() as session:
-                            await expense_message(
-                                session,
-                                input.agent_id,
-                                payer,
-                                chat_message.id,
-                                input.id,
-                                amount,
-                                agent.fee_percentage
-                                if agent.fee_percentage
-                                else Decimal("0"),
-                                agent.owner,
-                            )
-                        logger.info(f"[{input.agent_id}] expense message: {amount}")
+                    cached_tool_step = None
+                    buffer.add(skill_message_create)
+                elif "memory_manager" in chunk:
+                    pass
                 else:
                     logger.error(
-                        "unexpected agent message: " + str(msg),
+                        "unexpected message type: " + str(chunk),
                         extra={"thread_id": thread_id},
                     )
-            elif "tools" in chunk and "messages" in chunk["tools"]:
-                if not cached_tool_step:
-                    logger.error(
-                        "unexpected tools message: " + str(chunk["tools"]),
-                        extra={"thread_id": thread_id},
-                    )
-                    continue
-                skill_calls = []
-                skill_message_id = str(XID())
-                for msg in chunk["tools"]["messages"]:
-                    if not hasattr(msg, "tool_call_id"):
-                        logger.error(
-                            "unexpected tools message: " + str(chunk["tools"]),
-                            extra={"thread_id": thread_id},
-                        )
-                        continue
-                    for call in cached_tool_step.tool_calls:
-                        if call["id"] == msg.tool_call_id:
-                            skill_call: ChatMessageSkillCall = {
-                                "name": call["name"],
-                                "parameters": call["args"],
-                                "success": True,
-                            }
-                            if msg.status == "error":
-                                skill_call["success"] = False
-                                skill_call["error_message"] = msg.content
-                            else:
-                                if debug:
-                                    skill_call["response"] = msg.content
-                                else:
-                                    skill_call["response"] = textwrap.shorten(
-                                        msg.content, width=100, placeholder="..."
-                                    )
-                            skill_calls.append(skill_call)
-                            # skill payment
-                            if is_payment_required(input, agent):
-                                async with get_session() as session:
-                                    await expense_skill(
-                                        session,
-                                        input.agent_id,
-                                        payer,
-                                        skill_message_id,
-                                        input.id,
-                                        call["id"],
-                                        call["name"],
-                                        agent.fee_percentage
-                                        if agent.fee_percentage
-                                        else Decimal("0"),
-                                        agent.owner,
-                                    )
-                                logger.info(
-                                    f"[{input.agent_id}] skill payment: {skill_call}"
-                                )
-                            break
-                skill_message_create = ChatMessageCreate(
-                    id=skill_message_id,
+            except SQLAlchemyError as e:
+                logger.error(
+                    f"db error when execute agent: {str(e)}",
+                    extra={"thread_id": thread_id},
+                )
+                error_message_create = ChatMessageCreate(
+                    id=str(XID()),
                     agent_id=input.agent_id,
                     chat_id=input.chat_id,
                     user_id=input.user_id,
                     author_id=input.agent_id,
-                    author_type=AuthorType.SKILL,
+                    author_type=AuthorType.SYSTEM,
                     thread_type=input.author_type,
                     reply_to=input.id,
-                    message="",
-                    skill_calls=skill_calls,
-                    input_tokens=(
-                        cached_tool_step.usage_metadata.get("input_tokens", 0)
-                        if hasattr(cached_tool_step, "usage_metadata")
-                        and cached_tool_step.usage_metadata
-                        else 0
-                    ),
-                    output_tokens=(
-                        cached_tool_step.usage_metadata.get("output_tokens", 0)
-                        if hasattr(cached_tool_step, "usage_metadata")
-                        and cached_tool_step.usage_metadata
-                        else 0
-                    ),
-                    time_cost=this_time - last,
+                    message="IntentKit internal error",
+                    time_cost=time.perf_counter() - start,
                 )
-                last = this_time
-                if cold_start_cost > 0:
-                    skill_message_create.cold_start_cost = cold_start_cost
-                    cold_start_cost = 0
-                cached_tool_step = None
-                skill_message = await skill_message_create.save()
-                resp.append(skill_message)
-            elif "memory_manager" in chunk:
-                pass
-            else:
+                buffer.add(error_message_create)
+                break
+            except Exception as e:
                 logger.error(
-                    "unexpected message type: " + str(chunk),
-                    extra={"thread_id": thread_id},
+                    f"failed to execute agent: {str(e)}", extra={"thread_id": thread_id}
                 )
-        except SQLAlchemyError as e:
-            logger.error(
-                f"db error when execute agent: {str(e)}", extra={"thread_id": thread_id}
-            )
-            error_message_create = ChatMessageCreate(
-                id=str(XID()),
-                agent_id=input.agent_id,
-                chat_id=input.chat_id,
-                user_id=input.user_id,
-                author_id=input.agent_id,
-                author_type=AuthorType.SYSTEM,
-                thread_type=input.author_type,
-                reply_to=input.id,
-                message="IntentKit internal error",
-                time_cost=time.perf_counter() - start,
-            )
-            error_message = await error_message_create.save()
-            resp.append(error_message)
-            return resp
-        except Exception as e:
-            logger.error(
-                f"failed to execute agent: {str(e)}", extra={"thread_id": thread_id}
+                error_message_create = ChatMessageCreate(
+                    id=str(XID()),
+                    agent_id=input.agent_id,
+                    chat_id=input.chat_id,
+                    user_id=input.user_id,
+                    author_id=input.agent_id,
+                    author_type=AuthorType.SYSTEM,
+                    thread_type=input.author_type,
+                    reply_to=input.id,
+                    message=f"Error in agent:\n  {str(e)}",
+                    time_cost=time.perf_counter() - start,
+                )
+                buffer.add(error_message_create)
+                break
+            # the charges reached the hold, reserve more to go on, and stop only
+            # if the balance can't cover it, so the run can't overdraw it
+            if (
+                hold
+                and sum((c.total_amount for c in charges), Decimal("0")) >= hold.amount
+            ):
+                extended = await extend_hold(payer, hold, config.payment_hold_amount)
+                if extended:
+                    hold = extended
+                    logger.info(
+                        f"[{input.agent_id}] extended the hold of run {input.id} "
+                        f"to {hold.amount}"
+                    )
+                else:
+                    logger.warning(
+                        f"[{input.agent_id}] run {input.id} used up the hold of "
+                        f"{hold.amount} and the balance, stopped"
+                    )
+                    buffer.add(
+                        ChatMessageCreate(
+                            id=str(XID()),
+                            agent_id=input.agent_id,
+                            chat_id=input.chat_id,
+                            user_id=input.user_id,
+                            author_id=input.agent_id,
+                            author_type=AuthorType.SYSTEM,
+                            thread_type=input.author_type,
+                            reply_to=input.id,
+                            message="Insufficient CAPs.",
+                            time_cost=time.perf_counter() - start,
+                        )
+                    )
+                    break
+    finally:
+        # also keep the messages and charges of a failed or abandoned run
+        try:
+            saved = await buffer.flush()
+        finally:
+            if charges:
+                await _settle_charges(input, payer, charges, hold)
+            elif hold:
+                await _release_hold(input, hold)
+    for chat_message in saved:
+        yield "message", chat_message
+
+
+async def _settle_charges(
+    input: ChatMessageCreate,
+    payer: str,
+    charges: list[CreditEventItem],
+    hold: Optional[CreditHold],
+) -> None:
+    """Settle the charges of one agent run, releasing its hold.
+
+    The run is already done, so a failure is logged instead of raised.
+
+    Args:
+        input: The input message of the run
+        payer: The user paying for the run
+        charges: The charges of the run, in order
+        hold: The hold placed at the start of the run
+    """
+    try:
+        async with get_session() as session:
+            await expense_execution(
+                session,
+                input.agent_id,
+                payer,
+                input.id,
+                charges,
+                hold_id=hold.id if hold else None,
             )
-            error_message_create = ChatMessageCreate(
-                id=str(XID()),
-                agent_id=input.agent_id,
-                chat_id=input.chat_id,
-                user_id=input.user_id,
-                author_id=input.agent_id,
-                author_type=AuthorType.SYSTEM,
-                thread_type=input.author_type,
-                reply_to=input.id,
-                message=f"Error in agent:\n  {str(e)}",
-                time_cost=time.perf_counter() - start,
+        logger.info(f"[{input.agent_id}] settled {len(charges)} charges of {input.id}")
+        total = sum((c.total_amount for c in charges), Decimal("0"))
+        if hold and total > hold.amount:
+            logger.warning(
+                f"[{input.agent_id}] run {input.id} cost {total}, "
+                f"more than the hold of {hold.amount}"
             )
-            error_message = await error_message_create.save()
-            resp.append(error_message)
-            return resp
-    return resp
+    except Exception as e:
+        logger.error(
+            f"[{input.agent_id}] failed to settle charges of {input.id}: {e}",
+            extra={"charges": [c.model_dump(mode="json") for c in charges]},
+        )
+
+
+async def _release_hold(input: ChatMessageCreate, hold: CreditHold) -> None:
+    """Release the hold of an agent run without charges, logging a failure.
+
+    Args:
+        input: The input message of the run
+        hold: The hold placed at the start of the run
+    """
+    try:
+        await release_hold(hold.id)
+    except Exception as e:
+        # released when it expires
+        logger.error(f"[{input.agent_id}] failed to release hold {hold.id}: {e}")
 
 
 async def clean_agent_memory(
@@ -908,6 +1460,7 @@ async def clean_agent_memory(
                 .values(updated_at=func.now())
             )
             await db.commit()
+        await publish_agent_update(agent_id)
 
         logger.info(f"Agent [{agent_id}] data cleaned up successfully.")
         return "Agent data cleaned up successfully."
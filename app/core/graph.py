@@ -1,7 +1,20 @@
 """This file is forked from langgraph/prebuilt/react_agent_executor.py"""
 
+import inspect
 import logging
-from typing import Callable, Literal, Optional, Sequence, Type, TypeVar, Union, cast
+from bisect import bisect_left
+from itertools import accumulate
+from typing import (
+    Callable,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import tiktoken
 from langchain_core.language_models import BaseChatModel, LanguageModelLike
@@ -12,6 +25,7 @@ from langchain_core.messages import (
     RemoveMessage,
     SystemMessage,
     ToolMessage,
+    get_buffer_string,
 )
 from langchain_core.runnables import (
     Runnable,
@@ -28,6 +42,7 @@ from langgraph.types import Checkpointer
 from langgraph.utils.runnable import RunnableCallable
 
 from abstracts.graph import AgentState, MemoryManager
+from utils.cache import BoundedCache
 
 logger = logging.getLogger(__name__)
 
@@ -157,35 +172,464 @@ def _get_encoder(model_name: str = "gpt-4"):
     return _TIKTOKEN_CACHE[model_name]
 
 
+def _message_tokens(message: BaseMessage, encoding) -> int:
+    """Count the number of tokens in one message."""
+    # Every message follows <im_start>{role/name}\n{content}<im_end>\n
+    num_tokens = 4
+
+    # Count tokens for basic message attributes
+    msg_dict = message.model_dump()
+    for key in ["content", "name", "function_call", "role"]:
+        value = msg_dict.get(key)
+        if value:
+            num_tokens += len(encoding.encode(str(value)))
+
+    # Count tokens for tool calls more efficiently
+    if hasattr(message, "tool_calls") and message.tool_calls:
+        for tool_call in message.tool_calls:
+            # Only encode essential parts of tool_call
+            if isinstance(tool_call, dict):
+                for key in ["name", "arguments"]:
+                    if key in tool_call:
+                        num_tokens += len(encoding.encode(str(tool_call[key])))
+            else:
+                # Handle tool_call object if it's not a dict
+                num_tokens += len(encoding.encode(str(tool_call)))
+
+    return num_tokens
+
+
+# Token counts by (model name, message id), messages are immutable once they
+# have an id, the content length guards against a message replaced in place
+_token_counts: BoundedCache[tuple[str, str], tuple[int, int]] = BoundedCache(
+    max_size=100_000
+)
+
+
+def _message_token_counts(
+    messages: Sequence[BaseMessage], model_name: str = "gpt-4"
+) -> list[int]:
+    """Count the number of tokens of each message, memoized by message id."""
+    encoding = None
+    counts = []
+    for message in messages:
+        key = (model_name, message.id) if message.id else None
+        content_len = len(message.content)
+        cached = _token_counts.get(key) if key else None
+        if cached and cached[0] == content_len:
+            counts.append(cached[1])
+            continue
+        if encoding is None:
+            encoding = _get_encoder(model_name)
+        num_tokens = _message_tokens(message, encoding)
+        if key:
+            _token_counts.set(key, (content_len, num_tokens), size=0)
+        counts.append(num_tokens)
+    return counts
+
+
 def _count_tokens(messages: Sequence[BaseMessage], model_name: str = "gpt-4") -> int:
     """Count the number of tokens in a list of messages."""
-    encoding = _get_encoder(model_name)
+    return sum(_message_token_counts(messages, model_name))
 
-    num_tokens = 0
-    for message in messages:
-        # Every message follows <im_start>{role/name}\n{content}<im_end>\n
-        num_tokens += 4
-
-        # Count tokens for basic message attributes
-        msg_dict = message.model_dump()
-        for key in ["content", "name", "function_call", "role"]:
-            value = msg_dict.get(key)
-            if value:
-                num_tokens += len(encoding.encode(str(value)))
-
-        # Count tokens for tool calls more efficiently
-        if hasattr(message, "tool_calls") and message.tool_calls:
-            for tool_call in message.tool_calls:
-                # Only encode essential parts of tool_call
-                if isinstance(tool_call, dict):
-                    for key in ["name", "arguments"]:
-                        if key in tool_call:
-                            num_tokens += len(encoding.encode(str(tool_call[key])))
-                else:
-                    # Handle tool_call object if it's not a dict
-                    num_tokens += len(encoding.encode(str(tool_call)))
 
-    return num_tokens
+def _reported_tokens(messages: Sequence[BaseMessage]) -> Optional[int]:
+    """Get the history size based on what the provider reported for the last call.
+
+    The input tokens of the last AI message cover every message before it, plus
+    the system prompt and the tools, so this is an upper bound of the history size.
+
+    Returns:
+        Optional[int]: The input and output tokens of the last AI message plus the
+            counted tokens of the messages after it, or None if the last AI message
+            has no usage metadata
+    """
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, AIMessage):
+            usage = message.usage_metadata
+            if not usage or not usage.get("input_tokens"):
+                return None
+            return (
+                usage["input_tokens"]
+                + usage.get("output_tokens", 0)
+                + _count_tokens(messages[index + 1 :])
+            )
+    return None
+
+
+class _GraphParams(NamedTuple):
+    """Agent specific parts of the graph, passed to the nodes at run time."""
+
+    aid: str
+    model_runnable: Runnable
+    tool_node: Optional[ToolNode]
+    should_return_direct: frozenset[str]
+    memory_manager: MemoryManager
+
+
+# Key of the graph params in the configurable of RunnableConfig
+GRAPH_PARAMS_KEY = "intentkit_graph_params"
+
+# Compiled graph templates, keyed by topology and graph options
+_graph_templates: dict[tuple, CompiledGraph] = {}
+
+
+def _graph_params(config: RunnableConfig) -> _GraphParams:
+    return config["configurable"][GRAPH_PARAMS_KEY]
+
+
+def _prefix_to_delete(
+    messages: Sequence[BaseMessage], counts: list[int], excess: int
+) -> int:
+    """Get how many of the oldest messages to delete to free `excess` tokens."""
+    # Delete the shortest prefix that frees enough tokens
+    prefix_sums = list(accumulate(counts))
+    must_delete = min(bisect_left(prefix_sums, excess) + 1, len(messages))
+
+    # Ensure first remaining message is HumanMessage
+    while must_delete < len(messages) and not isinstance(
+        messages[must_delete], HumanMessage
+    ):
+        must_delete += 1
+    return must_delete
+
+
+def _clear_messages(state: AgentState) -> AgentState:
+    """Mark all messages for removal."""
+    messages = state["messages"]
+    for index in range(len(messages)):
+        messages[index] = RemoveMessage(id=messages[index].id)
+    return state
+
+
+def _default_memory_manager(input_token_limit: int) -> MemoryManager:
+    def default_memory_manager(state: AgentState) -> AgentState:
+        messages = state["messages"]
+
+        # If need_clear is True, mark all messages for removal
+        if "need_clear" in state and state["need_clear"]:
+            return _clear_messages(state)
+
+        # Half of the input token limit will be reserved
+        token_limit = input_token_limit // 2
+
+        # The provider count of the last call is an upper bound, when it is under
+        # the limit the history doesn't need to be counted
+        reported = _reported_tokens(messages)
+        if reported is not None and reported <= token_limit:
+            return state
+
+        # Count total tokens
+        counts = _message_token_counts(messages)
+        total_tokens = sum(counts)
+
+        # If over token limit, remove messages from front
+        if total_tokens > token_limit:
+            must_delete = _prefix_to_delete(
+                messages, counts, total_tokens - token_limit
+            )
+
+            # Mark messages for removal
+            for index in range(must_delete):
+                messages[index] = RemoveMessage(id=messages[index].id)
+
+        return state
+
+    return default_memory_manager
+
+
+SUMMARY_PROMPT = (
+    "You maintain the memory of a conversation between a user and an AI agent. "
+    "Update the existing summary with the new messages, which are about to be "
+    "removed from the conversation. Keep facts, names, numbers, addresses, "
+    "decisions, open tasks and user preferences. Drop greetings, repetition and "
+    "tool call details that no longer matter. Write in the third person, in at "
+    "most 300 words, and reply with the updated summary only."
+)
+
+
+def summarizing_memory_manager(
+    model: BaseChatModel, input_token_limit: int
+) -> MemoryManager:
+    """Create a memory manager that folds old messages into a rolling summary.
+
+    Once the history passes a quarter of the input token limit, the oldest
+    messages are summarized together with the previous summary and removed,
+    keeping about an eighth of the limit of recent messages. The summary is
+    kept in the `summary` field of the thread state and given to the model
+    before the history. Compared to truncation at half of the limit, a long
+    thread carries a smaller prompt on every call without losing its context.
+
+    If the summary can't be created, it falls back to truncation.
+
+    Args:
+        model: The chat model used to write the summary
+        input_token_limit: The input token limit of the agent model
+
+    Returns:
+        MemoryManager: An async memory manager
+    """
+    token_limit = input_token_limit // 4
+    keep_tokens = input_token_limit // 8
+
+    async def summary_memory_manager(state: AgentState) -> AgentState:
+        messages = state["messages"]
+
+        if "need_clear" in state and state["need_clear"]:
+            state["summary"] = ""
+            return _clear_messages(state)
+
+        reported = _reported_tokens(messages)
+        if reported is not None and reported <= token_limit:
+            return state
+
+        counts = _message_token_counts(messages)
+        total_tokens = sum(counts)
+        if total_tokens <= token_limit:
+            return state
+
+        must_delete = _prefix_to_delete(messages, counts, total_tokens - keep_tokens)
+        if must_delete >= len(messages):
+            # never summarize the last turn away, fall back to truncation
+            must_delete = _prefix_to_delete(
+                messages, counts, total_tokens - token_limit
+            )
+        else:
+            summary = state.get("summary") or ""
+            try:
+                response = await model.ainvoke(
+                    [
+                        SystemMessage(content=SUMMARY_PROMPT),
+                        HumanMessage(
+                            content=f"Existing summary:\n{summary or '(none)'}\n\n"
+                            f"New messages:\n{get_buffer_string(messages[:must_delete])}"
+                        ),
+                    ]
+                )
+                state["summary"] = str(response.content).strip()
+            except Exception as e:
+                logger.warning(f"failed to summarize memory, truncating: {e}")
+                must_delete = _prefix_to_delete(
+                    messages, counts, total_tokens - token_limit
+                )
+
+        for index in range(must_delete):
+            messages[index] = RemoveMessage(id=messages[index].id)
+        return state
+
+    return summary_memory_manager
+
+
+def _with_summary(state: AgentState) -> AgentState:
+    """Give the model the summary of the removed messages before the history."""
+    summary = state.get("summary")
+    if not summary:
+        return state
+    return {
+        **state,
+        "messages": [
+            SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"),
+            *state["messages"],
+        ],
+    }
+
+
+def _model_response(state: AgentState, response: BaseMessage, params: _GraphParams):
+    has_tool_calls = isinstance(response, AIMessage) and response.tool_calls
+    all_tools_return_direct = (
+        all(
+            call["name"] in params.should_return_direct
+            for call in response.tool_calls
+        )
+        if isinstance(response, AIMessage)
+        else False
+    )
+    if (
+        ("remaining_steps" not in state and state["is_last_step"] and has_tool_calls)
+        or (
+            "remaining_steps" in state
+            and state["remaining_steps"] < 1
+            and all_tools_return_direct
+        )
+        or (
+            "remaining_steps" in state
+            and state["remaining_steps"] < 2
+            and has_tool_calls
+        )
+    ):
+        return {
+            "messages": [
+                AIMessage(
+                    id=response.id,
+                    content="Sorry, need more steps to process this request.",
+                )
+            ],
+            "need_clear": False,
+        }
+    # We return a list, because this will get added to the existing list
+    return {"messages": [response], "need_clear": False}
+
+
+# Define the function that calls the model
+def _call_model(state: AgentState, config: RunnableConfig) -> AgentState:
+    params = _graph_params(config)
+    try:
+        _validate_chat_history(state["messages"])
+        response = params.model_runnable.invoke(_with_summary(state), config)
+    except Exception as e:
+        logger.error(f"[{params.aid}] Error in call model: {e}", exc_info=True)
+        # Clean message history on error
+        return {
+            "need_clear": True,
+            "messages": [
+                AIMessage(
+                    content=f"Sorry, something went wrong. {e}",
+                )
+            ],
+        }
+    logger.debug(f"Response: {response}")
+    return _model_response(state, response, params)
+
+
+async def _acall_model(state: AgentState, config: RunnableConfig) -> AgentState:
+    params = _graph_params(config)
+    logger.debug(f"[{params.aid}] Async calling model")
+    try:
+        _validate_chat_history(state["messages"])
+        response = await params.model_runnable.ainvoke(_with_summary(state), config)
+    except Exception as e:
+        logger.error(f"[{params.aid}] Error in async call model: {e}")
+        # Clean message history on error
+        return {
+            "messages": [
+                AIMessage(
+                    content=f"Sorry, something went wrong. {e}",
+                )
+            ],
+            "need_clear": True,
+        }
+    return _model_response(state, response, params)
+
+
+def _call_tools(state: AgentState, config: RunnableConfig) -> AgentState:
+    return _graph_params(config).tool_node.invoke(state, config)
+
+
+async def _acall_tools(state: AgentState, config: RunnableConfig) -> AgentState:
+    return await _graph_params(config).tool_node.ainvoke(state, config)
+
+
+def _manage_memory(state: AgentState, config: RunnableConfig) -> AgentState:
+    result = _graph_params(config).memory_manager(state)
+    if inspect.isawaitable(result):
+        if inspect.iscoroutine(result):
+            result.close()
+        raise RuntimeError("The memory manager is async, use ainvoke or astream")
+    return result
+
+
+async def _amanage_memory(state: AgentState, config: RunnableConfig) -> AgentState:
+    result = _graph_params(config).memory_manager(state)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+# Define the function that determines whether to continue or not
+def _should_continue(state: AgentState) -> Literal["tools", "memory_manager"]:
+    messages = state["messages"]
+    last_message = messages[-1]
+    # If there is no function call, then we finish
+    if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
+        return "memory_manager"
+    # Otherwise if there is, we continue
+    else:
+        return "tools"
+
+
+def _route_tool_responses(
+    state: AgentState, config: RunnableConfig
+) -> Literal["agent", "memory_manager"]:
+    should_return_direct = _graph_params(config).should_return_direct
+    for m in reversed(state["messages"]):
+        if not isinstance(m, ToolMessage):
+            break
+        if m.name in should_return_direct:
+            return "memory_manager"
+    return "agent"
+
+
+def _graph_template(
+    state_schema: Optional[StateSchemaType],
+    tool_calling_enabled: bool,
+    has_return_direct: bool,
+    checkpointer: Optional[Checkpointer],
+    store: Optional[BaseStore],
+    interrupt_before: Optional[list[str]],
+    interrupt_after: Optional[list[str]],
+    debug: bool,
+) -> CompiledGraph:
+    """Get the compiled graph template for a topology, compile it on first use."""
+    key = (
+        state_schema,
+        tool_calling_enabled,
+        has_return_direct,
+        id(checkpointer),
+        id(store),
+        tuple(interrupt_before or ()),
+        tuple(interrupt_after or ()),
+        debug,
+    )
+    template = _graph_templates.get(key)
+    if template is not None:
+        return template
+
+    # Define a new graph
+    workflow = StateGraph(state_schema or AgentState)
+
+    # Define the two nodes we will cycle between
+    workflow.add_node("agent", RunnableCallable(_call_model, _acall_model))
+    workflow.add_node(
+        "memory_manager", RunnableCallable(_manage_memory, _amanage_memory)
+    )
+
+    # Set the entrypoint as `agent`
+    # This means that this node is the first one called
+    workflow.set_entry_point("agent")
+    workflow.add_edge("memory_manager", END)
+
+    if not tool_calling_enabled:
+        workflow.add_edge("agent", "memory_manager")
+    else:
+        workflow.add_node("tools", RunnableCallable(_call_tools, _acall_tools))
+        # We now add a conditional edge
+        workflow.add_conditional_edges(
+            # First, we define the start node. We use `agent`.
+            # This means these are the edges taken after the `agent` node is called.
+            "agent",
+            # Next, we pass in the function that will determine which node is called next.
+            _should_continue,
+        )
+        # If any of the tools are configured to return_directly after running,
+        # our graph needs to check if these were called
+        if has_return_direct:
+            workflow.add_conditional_edges("tools", _route_tool_responses)
+        else:
+            workflow.add_edge("tools", "agent")
+
+    # Finally, we compile it!
+    # This compiles it into a LangChain Runnable,
+    # meaning you can use it as you would any other runnable
+    template = workflow.compile(
+        checkpointer=checkpointer,
+        store=store,
+        interrupt_before=interrupt_before,
+        interrupt_after=interrupt_after,
+        debug=debug,
+    )
+    _graph_templates[key] = template
+    return template
 
 
 def create_agent(
@@ -202,10 +646,17 @@ def create_agent(
     interrupt_after: Optional[list[str]] = None,
     input_token_limit: int = 120000,
     debug: bool = False,
-) -> CompiledGraph:
+) -> Runnable:
     """Creates a graph that works with a chat model that utilizes tool calling.
 
+    The graph topology only depends on whether there are tools and whether some of
+    them return directly, so the compiled graph is a template shared by all agents
+    with the same topology and graph options. The agent specific parts (model,
+    tools, memory manager, token limit) are bound to the template and passed to
+    the nodes through the `RunnableConfig` at run time.
+
     Args:
+        aid: The agent ID, used as the run name.
         model: The `LangChain` chat model that supports tool calling.
         tools: A list of tools, a ToolExecutor, or a ToolNode instance.
             If an empty list is provided, the agent will consist of a single LLM node without tool calling.
@@ -232,10 +683,13 @@ def create_agent(
         interrupt_after: An optional list of node names to interrupt after.
             Should be one of the following: "agent", "tools".
             This is useful if you want to return directly or run additional processing on an output.
+        input_token_limit: The input token limit of the model, the default memory
+            manager keeps the message history under half of it.
         debug: A flag indicating whether to enable debug mode.
 
     Returns:
-        A compiled LangChain runnable that can be used for chat interactions.
+        A LangChain runnable binding the shared compiled graph to this agent,
+        it can be used for chat interactions like the compiled graph itself.
 
     The resulting graph looks like this:
 
@@ -302,224 +756,31 @@ def create_agent(
     preprocessor = _get_state_modifier_runnable(state_modifier, store)
     model_runnable = preprocessor | model
 
-    def default_memory_manager(state: AgentState) -> AgentState:
-        messages = state["messages"]
-
-        # If need_clear is True, mark all messages for removal
-        if "need_clear" in state and state["need_clear"]:
-            for index in range(len(messages)):
-                messages[index] = RemoveMessage(id=messages[index].id)
-            return state
-
-        # Count total tokens
-        total_tokens = _count_tokens(messages)
-        # Half of the input token limit will be reserved
-        token_limit = input_token_limit // 2
-
-        # If over token limit, remove messages from front
-        if total_tokens > token_limit:
-            must_delete = 0
-            current_tokens = total_tokens
-            temp_messages = messages.copy()
-
-            # Calculate how many messages to delete
-            while current_tokens > token_limit and must_delete < len(temp_messages):
-                current_tokens -= _count_tokens([temp_messages[must_delete]])
-                must_delete += 1
-
-            # Ensure first remaining message is HumanMessage
-            while must_delete < len(messages) and not isinstance(
-                messages[must_delete], HumanMessage
-            ):
-                must_delete += 1
-
-            # Mark messages for removal
-            for index in range(must_delete):
-                messages[index] = RemoveMessage(id=messages[index].id)
-
-        return state
-
     if memory_manager is None:
-        memory_manager = default_memory_manager
-
-    # Define the function that calls the model
-    def call_model(state: AgentState, config: RunnableConfig) -> AgentState:
-        try:
-            _validate_chat_history(state["messages"])
-            response = model_runnable.invoke(state, config)
-        except Exception as e:
-            logger.error(f"Error in call model: {e}", exc_info=True)
-            # Clean message history on error
-            return {
-                "need_clear": True,
-                "messages": [
-                    AIMessage(
-                        content=f"Sorry, something went wrong. {e}",
-                    )
-                ],
-            }
-
-        has_tool_calls = isinstance(response, AIMessage) and response.tool_calls
-        all_tools_return_direct = (
-            all(call["name"] in should_return_direct for call in response.tool_calls)
-            if isinstance(response, AIMessage)
-            else False
-        )
-        if (
-            (
-                "remaining_steps" not in state
-                and state["is_last_step"]
-                and has_tool_calls
-            )
-            or (
-                "remaining_steps" in state
-                and state["remaining_steps"] < 1
-                and all_tools_return_direct
-            )
-            or (
-                "remaining_steps" in state
-                and state["remaining_steps"] < 2
-                and has_tool_calls
-            )
-        ):
-            return {
-                "messages": [
-                    AIMessage(
-                        id=response.id,
-                        content="Sorry, need more steps to process this request.",
-                    )
-                ],
-                "need_clear": False,
-            }
-        # We return a list, because this will get added to the existing list
-        logger.debug(f"Response: {response}")
-        return {"messages": [response], "need_clear": False}
-
-    async def acall_model(state: AgentState, config: RunnableConfig) -> AgentState:
-        logger.debug(f"[{aid}] Async calling model")
-        try:
-            _validate_chat_history(state["messages"])
-            response = await model_runnable.ainvoke(state, config)
-        except Exception as e:
-            logger.error(f"[{aid}] Error in async call model: {e}")
-            # Clean message history on error
-            return {
-                "messages": [
-                    AIMessage(
-                        content=f"Sorry, something went wrong. {e}",
-                    )
-                ],
-                "need_clear": True,
-            }
-        has_tool_calls = isinstance(response, AIMessage) and response.tool_calls
-        all_tools_return_direct = (
-            all(call["name"] in should_return_direct for call in response.tool_calls)
-            if isinstance(response, AIMessage)
-            else False
-        )
-        if (
-            (
-                "remaining_steps" not in state
-                and state["is_last_step"]
-                and has_tool_calls
-            )
-            or (
-                "remaining_steps" in state
-                and state["remaining_steps"] < 1
-                and all_tools_return_direct
-            )
-            or (
-                "remaining_steps" in state
-                and state["remaining_steps"] < 2
-                and has_tool_calls
-            )
-        ):
-            return {
-                "messages": [
-                    AIMessage(
-                        id=response.id,
-                        content="Sorry, need more steps to process this request.",
-                    )
-                ],
-                "need_clear": False,
-            }
-        # We return a list, because this will get added to the existing list
-        return {"messages": [response], "need_clear": False}
-
-    if not tool_calling_enabled:
-        # Define a new graph
-        workflow = StateGraph(state_schema or AgentState)
-        workflow.add_node("agent", RunnableCallable(call_model, acall_model))
-        workflow.set_entry_point("agent")
-        workflow.add_node("memory_manager", memory_manager)
-        workflow.add_edge("agent", "memory_manager")
-        workflow.add_edge("memory_manager", END)
-        return workflow.compile(
-            checkpointer=checkpointer,
-            store=store,
-            interrupt_before=interrupt_before,
-            interrupt_after=interrupt_after,
-            debug=debug,
-        )
-
-    # Define the function that determines whether to continue or not
-    def should_continue(state: AgentState) -> Literal["tools", "memory_manager"]:
-        messages = state["messages"]
-        last_message = messages[-1]
-        # If there is no function call, then we finish
-        if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
-            return "memory_manager"
-        # Otherwise if there is, we continue
-        else:
-            return "tools"
-
-    # Define a new graph
-    workflow = StateGraph(state_schema or AgentState)
-
-    # Define the two nodes we will cycle between
-    workflow.add_node("agent", RunnableCallable(call_model, acall_model))
-    workflow.add_node("tools", tool_node)
-    workflow.add_node("memory_manager", memory_manager)
-
-    # Set the entrypoint as `agent`
-    # This means that this node is the first one called
-    workflow.set_entry_point("agent")
-
-    # We now add a conditional edge
-    workflow.add_conditional_edges(
-        # First, we define the start node. We use `agent`.
-        # This means these are the edges taken after the `agent` node is called.
-        "agent",
-        # Next, we pass in the function that will determine which node is called next.
-        should_continue,
+        memory_manager = _default_memory_manager(input_token_limit)
+
+    should_return_direct = frozenset(t.name for t in tool_classes if t.return_direct)
+
+    template = _graph_template(
+        state_schema,
+        tool_calling_enabled,
+        bool(should_return_direct),
+        checkpointer,
+        store,
+        interrupt_before,
+        interrupt_after,
+        debug,
     )
-    workflow.add_edge("memory_manager", END)
-
-    # If any of the tools are configured to return_directly after running,
-    # our graph needs to check if these were called
-    should_return_direct = {t.name for t in tool_classes if t.return_direct}
-
-    def route_tool_responses(state: AgentState) -> Literal["agent", "memory_manager"]:
-        for m in reversed(state["messages"]):
-            if not isinstance(m, ToolMessage):
-                break
-            if m.name in should_return_direct:
-                return "memory_manager"
-        return "agent"
-
-    if should_return_direct:
-        workflow.add_conditional_edges("tools", route_tool_responses)
-    else:
-        workflow.add_edge("tools", "agent")
-
-    # Finally, we compile it!
-    # This compiles it into a LangChain Runnable,
-    # meaning you can use it as you would any other runnable
-    return workflow.compile(
-        checkpointer=checkpointer,
-        store=store,
-        interrupt_before=interrupt_before,
-        interrupt_after=interrupt_after,
-        debug=debug,
-        name=aid,
+    params = _GraphParams(
+        aid=aid,
+        model_runnable=model_runnable,
+        tool_node=tool_node if tool_calling_enabled else None,
+        should_return_direct=should_return_direct,
+        memory_manager=memory_manager,
+    )
+    # RunnableBinding merges the configurable with the one given at run time,
+    # the with_config of the compiled graph would be replaced by it
+    return RunnableBinding(
+        bound=template,
+        config={"run_name": aid, "configurable": {GRAPH_PARAMS_KEY: params}},
     )
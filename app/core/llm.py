@@ -0,0 +1,122 @@
+"""Shared LLM provider HTTP clients.
+
+Every agent gets its own chat model object, because the sampling parameters are
+per agent, but the HTTP clients under them are shared by all agents using the same
+provider endpoint and API key. This keeps one tuned connection pool per provider
+per worker instead of one per agent.
+"""
+
+import hashlib
+import logging
+from typing import Any
+
+import httpx
+
+from app.config.config import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+
+    _http2_available = True
+except ImportError:
+    _http2_available = False
+
+
+class _ProviderClients:
+    """Sync and async HTTP clients of one provider endpoint and API key."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.models = 0
+        self.requests = 0
+        self.connections = 0
+        self.http2 = config.llm_http2 and _http2_available
+        limits = httpx.Limits(
+            max_connections=config.llm_max_connections,
+            max_keepalive_connections=config.llm_max_keepalive_connections,
+            keepalive_expiry=config.llm_keepalive_expiry,
+        )
+        self.http_client = httpx.Client(
+            http2=self.http2,
+            limits=limits,
+            event_hooks={"request": [self._on_request]},
+        )
+        self.http_async_client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=limits,
+            event_hooks={"request": [self._aon_request]},
+        )
+
+    def _on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _aon_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self._atrace
+
+    def _trace(self, event: str, info: dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    async def _atrace(self, event: str, info: dict[str, Any]) -> None:
+        self._trace(event, info)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "models": self.models,
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused": max(self.requests - self.connections, 0),
+        }
+
+
+# Shared clients, keyed by (base_url, api_key)
+_providers: dict[tuple[str, str], _ProviderClients] = {}
+
+
+def llm_http_clients(
+    base_url: str, api_key: str | None
+) -> dict[str, httpx.Client | httpx.AsyncClient]:
+    """Get the shared HTTP clients of a provider, for the chat model arguments.
+
+    Args:
+        base_url: Base URL of the OpenAI compatible API
+        api_key: API key used with this base URL
+
+    Returns:
+        dict[str, httpx.Client | httpx.AsyncClient]: `http_client` and
+            `http_async_client` arguments of ChatOpenAI and ChatXAI
+    """
+    key = (base_url, api_key)
+    provider = _providers.get(key)
+    if provider is None:
+        provider = _ProviderClients(base_url)
+        _providers[key] = provider
+        logger.info(f"created shared http clients for {base_url}")
+    provider.models += 1
+    return {
+        "http_client": provider.http_client,
+        "http_async_client": provider.http_async_client,
+    }
+
+
+def llm_client_stats() -> list[dict[str, Any]]:
+    """Get the connection reuse statistics of the shared LLM clients.
+
+    Returns:
+        list[dict[str, Any]]: For each provider endpoint and API key (shown as a
+            short fingerprint), the number of chat models created with it, requests
+            sent, new connections opened and requests served on a reused connection
+    """
+    return [
+        {
+            **provider.stats(),
+            "key": hashlib.sha256((api_key or "").encode()).hexdigest()[:8],
+        }
+        for (_, api_key), provider in _providers.items()
+    ]
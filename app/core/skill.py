@@ -1,8 +1,11 @@
+from datetime import datetime
 from typing import Any, Dict, Optional
 
+from langchain_core.runnables.config import ensure_config
+
 from abstracts.skill import SkillStoreABC
 from app.config.config import config
-from models.agent import Agent, AgentData, AgentQuota
+from models.agent import Agent, AgentContext, AgentData, AgentQuota
 from models.skill import (
     AgentSkillData,
     AgentSkillDataCreate,
@@ -11,6 +14,18 @@ from models.skill import (
 )
 
 
+def _turn_context(agent_id: str) -> Optional[AgentContext]:
+    """Get the AgentContext of the agent turn calling a skill, if of this agent.
+
+    The RunnableConfig of the running tool is in the context of the task, the
+    engine puts the AgentContext of the turn in its configurable.
+    """
+    context = ensure_config().get("configurable", {}).get("context")
+    if isinstance(context, AgentContext) and context.agent_id == agent_id:
+        return context
+    return None
+
+
 class SkillStore(SkillStoreABC):
     """Implementation of skill data storage operations.
 
@@ -27,19 +42,31 @@ class SkillStore(SkillStoreABC):
 
     @staticmethod
     async def get_agent_config(agent_id: str) -> Optional[Agent]:
-        return await Agent.get(agent_id)
+        context = _turn_context(agent_id)
+        if context:
+            return await context.agent()
+        return await Agent.get_cached(agent_id)
 
     @staticmethod
     async def get_agent_data(agent_id: str) -> Optional[AgentData]:
-        return await AgentData.get(agent_id)
+        context = _turn_context(agent_id)
+        if context:
+            return await context.agent_data()
+        return await AgentData.get_cached(agent_id)
 
     @staticmethod
     async def set_agent_data(agent_id: str, data: Dict) -> None:
-        return await AgentData.patch(agent_id, data)
+        await AgentData.patch(agent_id, data)
+        context = _turn_context(agent_id)
+        if context:
+            context.evict("agent_data")
 
     @staticmethod
     async def get_agent_quota(agent_id: str) -> Optional[AgentQuota]:
-        return await AgentQuota.get(agent_id)
+        context = _turn_context(agent_id)
+        if context:
+            return await context.quota()
+        return await AgentQuota.get_cached(agent_id)
 
     @staticmethod
     async def get_agent_skill_data(
@@ -59,7 +86,11 @@ class SkillStore(SkillStoreABC):
 
     @staticmethod
     async def save_agent_skill_data(
-        agent_id: str, skill: str, key: str, data: Dict[str, Any]
+        agent_id: str,
+        skill: str,
+        key: str,
+        data: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
     ) -> None:
         """Save or update skill data for an agent.
 
@@ -68,15 +99,45 @@ class SkillStore(SkillStoreABC):
             skill: Name of the skill
             key: Data key
             data: JSON data to store
+            expires_at: When the data expires, never if not set
         """
         skill_data = AgentSkillDataCreate(
             agent_id=agent_id,
             skill=skill,
             key=key,
             data=data,
+            expires_at=expires_at,
         )
         await skill_data.save()
 
+    @staticmethod
+    async def save_agent_skill_data_many(
+        agent_id: str,
+        skill: str,
+        data: Dict[str, Dict[str, Any]],
+        expires_at: Optional[datetime] = None,
+    ) -> None:
+        """Save or update several keys of skill data for an agent at once.
+
+        Args:
+            agent_id: ID of the agent
+            skill: Name of the skill
+            data: JSON data to store by data key
+            expires_at: When the data expires, never if not set
+        """
+        await AgentSkillDataCreate.save_many(
+            [
+                AgentSkillDataCreate(
+                    agent_id=agent_id,
+                    skill=skill,
+                    key=k,
+                    data=v,
+                    expires_at=expires_at,
+                )
+                for k, v in data.items()
+            ]
+        )
+
     @staticmethod
     async def get_thread_skill_data(
         thread_id: str, skill: str, key: str
@@ -100,6 +161,7 @@ class SkillStore(SkillStoreABC):
         skill: str,
         key: str,
         data: Dict[str, Any],
+        expires_at: Optional[datetime] = None,
     ) -> None:
         """Save or update skill data for a thread.
 
@@ -109,6 +171,7 @@ class SkillStore(SkillStoreABC):
             skill: Name of the skill
             key: Data key
             data: JSON data to store
+            expires_at: When the data expires, never if not set
         """
         skill_data = ThreadSkillDataCreate(
             thread_id=thread_id,
@@ -116,8 +179,40 @@ class SkillStore(SkillStoreABC):
             skill=skill,
             key=key,
             data=data,
+            expires_at=expires_at,
         )
         await skill_data.save()
 
+    @staticmethod
+    async def save_thread_skill_data_many(
+        thread_id: str,
+        agent_id: str,
+        skill: str,
+        data: Dict[str, Dict[str, Any]],
+        expires_at: Optional[datetime] = None,
+    ) -> None:
+        """Save or update several keys of skill data for a thread at once.
+
+        Args:
+            thread_id: ID of the thread
+            agent_id: ID of the agent that owns this thread
+            skill: Name of the skill
+            data: JSON data to store by data key
+            expires_at: When the data expires, never if not set
+        """
+        await ThreadSkillDataCreate.save_many(
+            [
+                ThreadSkillDataCreate(
+                    thread_id=thread_id,
+                    agent_id=agent_id,
+                    skill=skill,
+                    key=k,
+                    data=v,
+                    expires_at=expires_at,
+                )
+                for k, v in data.items()
+            ]
+        )
+
 
 skill_store = SkillStore()
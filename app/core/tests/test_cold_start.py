@@ -0,0 +1,101 @@
+"""Tests that the cold start of an agent executor doesn't stall the event loop."""
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.core import engine
+from skills import lazy
+from utils.blocking import init_blocking_pool
+from utils.tests.test_blocking import max_loop_lag
+
+# How long each fake wallet call blocks, as the CDP and Crossmint APIs do
+BLOCKING = 0.3
+
+
+def blocking(result=None) -> mock.Mock:
+    def call(*args, **kwargs):
+        time.sleep(BLOCKING)
+        return result
+
+    return mock.Mock(side_effect=call)
+
+
+class TestColdStart(unittest.TestCase):
+    def setUp(self):
+        init_blocking_pool(4)
+        lazy._specs.clear()
+        self.addCleanup(lazy._specs.clear)
+
+    def patch(self, target, name, value):
+        patcher = mock.patch.object(target, name, value, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cdp_wallet_provider_is_off_the_loop(self):
+        provider = blocking()
+        self.patch(engine, "CdpWalletProvider", provider)
+        for name in (
+            "CdpWalletProviderConfig",
+            "AgentKit",
+            "AgentKitConfig",
+            "wallet_action_provider",
+            "cdp_api_action_provider",
+            "cdp_wallet_action_provider",
+            "pyth_action_provider",
+            "basename_action_provider",
+            "erc20_action_provider",
+            "erc721_action_provider",
+            "weth_action_provider",
+            "morpho_action_provider",
+            "superfluid_action_provider",
+            "wow_action_provider",
+        ):
+            self.patch(engine, name, mock.MagicMock())
+        self.patch(engine, "get_langchain_tools", lambda agent_kit: [])
+        agent = SimpleNamespace(
+            cdp_enabled=True,
+            cdp_skills=["transfer"],
+            skills=None,
+            cdp_network_id="base-mainnet",
+        )
+        agent_data = SimpleNamespace(cdp_wallet_data='{"wallet_id": "w"}')
+
+        lag = asyncio.run(
+            max_loop_lag(engine._load_cdp_tools(agent, agent_data, "agent"))
+        )
+        provider.assert_called_once()
+        self.assertLess(lag, 0.1)
+
+    def test_crossmint_wallets_are_off_the_loop(self):
+        smart = {"evm": {"address": "0xabc"}}
+        create = blocking(smart)
+        init = blocking([])
+        self.patch(engine, "create_smart_wallets_if_not_exist", create)
+        self.patch(engine, "init_smart_wallets", init)
+        self.patch(engine.config, "crossmint_api_key", "key")
+        self.patch(engine.config, "crossmint_api_base_url", "https://crossmint")
+        self.patch(engine.config, "chain_provider", mock.MagicMock())
+        agent = SimpleNamespace(
+            goat_enabled=True,
+            crossmint_config={"networks": ["base-mainnet"]},
+            skills=None,
+            goat_skills={"erc20": {}},
+        )
+        agent_data = SimpleNamespace(crossmint_wallet_data={"smart": smart})
+        agent_store = mock.AsyncMock()
+
+        lag = asyncio.run(
+            max_loop_lag(
+                engine._load_goat_tools(agent, agent_data, agent_store, "agent")
+            )
+        )
+        create.assert_called_once()
+        init.assert_called_once()
+        self.assertLess(lag, 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
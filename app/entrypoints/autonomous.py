@@ -23,11 +23,10 @@ async def run_autonomous_task(
     logger.info(f"Running autonomous task {task_id} for agent {agent_id}")
 
     try:
-        # Get agent quota
-        quota = await AgentQuota.get(agent_id)
-
-        # Check if agent has quota
-        if not quota.has_autonomous_quota():
+        # Count the run if the agent has quota, atomically, so parallel
+        # triggers can't exceed the limit
+        if not await AgentQuota.consume(agent_id, "autonomous"):
+            quota = await AgentQuota.get(agent_id)
             logger.warning(
                 f"Agent {agent_id} has no autonomous quota for task {task_id}. "
                 f"Monthly: {quota.autonomous_count_monthly}/{quota.autonomous_limit_monthly}, "
@@ -51,9 +50,6 @@ async def run_autonomous_task(
         # Execute agent and get response
         resp = await execute_agent(message)
 
-        # Update quota after successful run
-        await quota.add_autonomous()
-
         # Log the response
         logger.info(
             f"Task {task_id} completed: " + "\n".join(str(m) for m in resp),
@@ -6,6 +6,7 @@ import sys
 from sqlalchemy import select
 
 from app.config.config import config
+from app.core.engine import watch_agent_updates
 from app.services.tg.bot import pool
 from app.services.tg.bot.pool import BotPool, bot_by_token
 from app.services.tg.utils.cleanup import clean_token_str
@@ -95,6 +96,8 @@ async def run_telegram_server() -> None:
             host=config.redis_host,
             port=config.redis_port,
         )
+        # Keep cached agent executors fresh
+        asyncio.create_task(watch_agent_updates())
 
     # Signal handler for graceful shutdown
     def signal_handler(signum, frame):
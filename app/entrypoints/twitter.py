@@ -29,18 +29,6 @@ async def run_twitter_agents():
         for item in agents:
             agent = Agent.model_validate(item)
             try:
-                # Get agent quota
-                quota = await AgentQuota.get(agent.id)
-
-                # Check if agent has quota
-                if not quota.has_twitter_quota():
-                    logger.warning(
-                        f"Agent {agent.id} has no twitter quota. "
-                        f"Daily: {quota.twitter_count_daily}/{quota.twitter_limit_daily}, "
-                        f"Total: {quota.twitter_count_total}/{quota.twitter_limit_total}"
-                    )
-                    continue
-
                 # Initialize Twitter client
                 if not agent.twitter_config:
                     logger.warning(f"Agent {agent.id} has no valid twitter config")
@@ -85,6 +73,17 @@ async def run_twitter_agents():
                 # Skip if we shouldn't process yet
                 if not should_process:
                     continue
+
+                # Count the run if the agent has quota, atomically, so parallel
+                # runs can't exceed the limit
+                if not await AgentQuota.consume(agent.id, "twitter"):
+                    quota = await AgentQuota.get(agent.id)
+                    logger.warning(
+                        f"Agent {agent.id} has no twitter quota. "
+                        f"Daily: {quota.twitter_count_daily}/{quota.twitter_limit_daily}, "
+                        f"Total: {quota.twitter_count_total}/{quota.twitter_limit_total}"
+                    )
+                    continue
                 # Always get mentions for the last day
                 start_time = (
                     datetime.now(tz=timezone.utc) - timedelta(days=1)
@@ -176,9 +175,6 @@ async def run_twitter_agents():
                         in_reply_to_tweet_id=tweet.id,
                     )
 
-                # Update quota
-                await quota.add_twitter_message()
-
             except Exception as e:
                 logger.error(
                     f"Error processing twitter mentions for agent {agent.id}: {str(e)}"
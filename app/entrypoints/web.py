@@ -4,7 +4,7 @@ import json
 import logging
 import secrets
 import textwrap
-from typing import List, Optional
+from typing import Any, List, Optional
 
 from epyxid import XID
 from fastapi import (
@@ -17,14 +17,15 @@ from fastapi import (
     Response,
     status,
 )
-from fastapi.responses import PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel, Field
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config.config import config
-from app.core.engine import execute_agent, thread_stats
+from app.core.engine import execute_agent, stream_agent, thread_stats
 from app.core.prompt import agent_prompt
 from models.agent import Agent, AgentData
 from models.chat import (
@@ -218,7 +219,7 @@ async def debug_chat(
         raise HTTPException(status_code=400, detail="Query string cannot be empty")
 
     # Get agent and validate quota
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail=f"Agent {aid} not found")
 
@@ -305,7 +306,7 @@ async def get_chat_history(
     * `404` - Agent not found
     """
     # Get agent and check if exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -368,7 +369,7 @@ async def retry_chat_deprecated(
     * `500` - Internal server error
     """
     # Get agent and check if exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -453,7 +454,7 @@ async def retry_chat(
     * `500` - Internal server error
     """
     # Get agent and check if exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -535,7 +536,7 @@ async def create_chat_deprecated(
     * `500` - Internal server error
     """
     # Get agent and validate quota
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail=f"Agent {aid} not found")
 
@@ -611,7 +612,7 @@ async def create_chat(
     * `500` - Internal server error
     """
     # Get agent and validate quota
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail=f"Agent {aid} not found")
 
@@ -648,6 +649,117 @@ async def create_chat(
     return response_messages
 
 
+def format_sse(event: str, data: Any) -> str:
+    """Format an event for a Server-Sent Events stream."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@chat_router.post(
+    "/agents/{aid}/chat/stream",
+    tags=["Chat"],
+    dependencies=[Depends(verify_jwt)],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+    operation_id="chat_stream",
+    summary="Chat Stream",
+)
+async def create_chat_stream(
+    request: ChatMessageRequest,
+    aid: str = Path(..., description="Agent ID"),
+) -> StreamingResponse:
+    """Create a chat message and stream the agent's response as Server-Sent Events.
+
+    Works like the Chat endpoint, but sends the response as it is generated
+    instead of waiting for the whole run.
+
+    **Events:**
+    * `token` - `{"content": str}`, a piece of the agent reply as the LLM writes it
+    * `skill_start` - `{"id": str, "name": str, "parameters": object}`, a skill is called
+    * `skill_end` - `{"id": str, "name": str, "success": bool}`, a skill returned
+    * `message` - `ChatMessage`, a response message, once it is saved
+    * `error` - `{"message": str}`, the run failed
+    * `done` - `List[ChatMessage]`, all response messages, the same as the Chat endpoint returns
+
+    **Path Parameters:**
+    * `aid` - Agent ID
+
+    **Request Body:**
+    * `request` - Chat message request object
+
+    **Raises:**
+    * `404` - Agent not found
+    * `429` - Quota exceeded
+    * `500` - Internal server error
+    """
+    # Get agent and validate quota
+    agent = await Agent.get_cached(aid)
+    if not agent:
+        raise HTTPException(status_code=404, detail=f"Agent {aid} not found")
+
+    # Create user message
+    user_message = ChatMessageCreate(
+        id=str(XID()),
+        agent_id=aid,
+        chat_id=request.chat_id,
+        user_id=request.user_id,
+        author_id=request.user_id,
+        author_type=AuthorType.WEB,
+        thread_type=AuthorType.WEB,
+        message=request.message,
+        attachments=request.attachments,
+    )
+
+    # Run until the first event, so a quota error is still a HTTP error
+    events = stream_agent(user_message)
+    try:
+        first = await anext(events)
+    except StopAsyncIteration:
+        first = None
+
+    async def generate():
+        response_messages = []
+        try:
+            if first:
+                yield format_sse(*first)
+                if first[0] == "message":
+                    response_messages.append(first[1])
+            async for event, data in events:
+                yield format_sse(event, data)
+                if event == "message":
+                    response_messages.append(data)
+        except Exception as e:
+            logger.error(f"failed to stream agent {aid}: {e}")
+            yield format_sse("error", {"message": str(e)})
+            return
+        finally:
+            # saves the buffered messages and settles the credits now, also when
+            # the client disconnected, instead of whenever it is garbage collected
+            await events.aclose()
+
+        # Create or active chat
+        chat = await Chat.get(request.chat_id)
+        if chat:
+            await chat.add_round()
+        else:
+            chat = ChatCreate(
+                id=request.chat_id,
+                agent_id=aid,
+                user_id=request.user_id,
+                summary=textwrap.shorten(request.message, width=20, placeholder="..."),
+                rounds=1,
+            )
+            await chat.save()
+
+        yield format_sse("done", response_messages)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        # keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @chat_router_readonly.get(
     "/agents/{aid}/chats",
     response_model=List[Chat],
@@ -674,7 +786,7 @@ async def get_agent_chats(
     * `404` - Agent not found
     """
     # Verify agent exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -730,7 +842,7 @@ async def update_chat_summary(
     * `404` - Agent or chat not found
     """
     # Verify agent exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -772,7 +884,7 @@ async def delete_chat(
     * `404` - Agent or chat not found
     """
     # Verify agent exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -814,7 +926,7 @@ async def get_skill_history(
     * `404` - Agent not found
     """
     # Get agent and check if exists
-    agent = await Agent.get(aid)
+    agent = await Agent.get_cached(aid)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
@@ -7,6 +7,7 @@ import sentry_sdk
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from app.config.config import config
+from app.core.engine import watch_agent_updates
 from app.entrypoints.twitter import run_twitter_agents
 from models.db import init_db
 from models.redis import init_redis
@@ -36,6 +37,8 @@ if __name__ == "__main__":
                 host=config.redis_host,
                 port=config.redis_port,
             )
+            # Keep cached agent executors fresh
+            asyncio.create_task(watch_agent_updates())
 
         # Create scheduler
         scheduler = AsyncIOScheduler()
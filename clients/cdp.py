@@ -8,6 +8,7 @@ from coinbase_agentkit import (
 
 from abstracts.skill import SkillStoreABC
 from models.agent import Agent, AgentData
+from utils.blocking import run_blocking
 
 _clients: Dict[str, "CdpClient"] = {}
 
@@ -33,7 +34,10 @@ class CdpClient:
             network_id=network_id,
             wallet_data=agent_data.cdp_wallet_data,
         )
-        self._wallet_provider = CdpWalletProvider(self._wallet_provider_config)
+        # fetching the wallet from CDP blocks, keep it off the event loop
+        self._wallet_provider = await run_blocking(
+            CdpWalletProvider, self._wallet_provider_config
+        )
         return self._wallet_provider
 
     async def get_wallet(self) -> Wallet:
@@ -2,9 +2,10 @@ import json
 import logging
 import re
 import textwrap
+import time
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Annotated, Any, Dict, List, Literal, Optional
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Literal, Optional
 
 import yaml
 from cron_validator import CronValidator
@@ -13,6 +14,8 @@ from fastapi import HTTPException
 from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 from pydantic import Field as PydanticField
 from pydantic.json_schema import SkipJsonSchema
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from sqlalchemy import (
     BigInteger,
     Boolean,
@@ -22,16 +25,72 @@ from sqlalchemy import (
     Identity,
     Numeric,
     String,
+    case,
     func,
     select,
+    update,
 )
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
 
 from models.base import Base
 from models.db import get_session
+from models.redis import get_redis, publish_agent_update
+from utils.cache import BoundedCache
 
 logger = logging.getLogger(__name__)
 
+# Hot path cache of the Agent, AgentData and AgentQuota models, by kind, agent id
+# and agent version. Writes of this process evict the entries, changes made by
+# other processes are seen after AGENT_CACHE_TTL seconds at most, agent updates
+# right away when the update events are received.
+AGENT_CACHE_TTL = 5.0
+_agent_cache: BoundedCache[tuple[str, str, Optional[datetime]], tuple[float, Any]] = (
+    BoundedCache(max_size=10000)
+)
+# The latest updated_at of each agent from the update events, part of the cache
+# keys, so an entry of an older version is never read again, even if its load
+# finished after the update
+_agent_versions: BoundedCache[str, datetime] = BoundedCache(max_size=10000)
+
+
+def _cache_key(kind: str, agent_id: str) -> tuple[str, str, Optional[datetime]]:
+    return kind, agent_id, _agent_versions.get(agent_id)
+
+
+def _evict_cached(kind: str, agent_id: str) -> None:
+    _agent_cache.pop(_cache_key(kind, agent_id))
+
+
+async def _get_cached(
+    kind: str, agent_id: str, load: Callable[[str], Awaitable[Any]]
+) -> Any:
+    """Get a model from the hot path cache, loading it if missing or expired."""
+    # the key of the version before the load, a load racing an update is
+    # stored under the old version
+    key = _cache_key(kind, agent_id)
+    cached = _agent_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    value = await load(agent_id)
+    if value is not None:
+        _agent_cache[key] = (time.monotonic() + AGENT_CACHE_TTL, value)
+    return value
+
+
+def evict_cached_agent(agent_id: str, updated_at: Optional[datetime] = None) -> None:
+    """Evict the cached models of an agent.
+
+    Args:
+        agent_id: Agent ID
+        updated_at: Current updated_at of the agent, the models cached for this
+            version are kept. None evicts unconditionally.
+    """
+    if updated_at is None:
+        for kind in ("agent", "agent_data", "agent_quota"):
+            _evict_cached(kind, agent_id)
+    elif _agent_versions.get(agent_id) != updated_at:
+        _agent_versions[agent_id] = updated_at
+
 
 class AgentAutonomous(BaseModel):
     """Autonomous agent configuration."""
@@ -296,6 +355,12 @@ class AgentTable(Base):
         default=0.0,
         comment="Controls topic adherence (-2.0~2.0). Higher values allow more topic deviation, lower values enforce stricter topic adherence.",
     )
+    short_term_memory_strategy = Column(
+        String,
+        nullable=True,
+        default="trim",
+        comment="Strategy for a thread history over the token limit: trim drops the oldest messages, summarize folds them into a rolling summary",
+    )
     # autonomous mode
     autonomous = Column(
         JSONB,
@@ -760,6 +825,16 @@ class AgentUpdate(BaseModel):
             },
         ),
     ]
+    short_term_memory_strategy: Annotated[
+        Optional[Literal["trim", "summarize"]],
+        PydanticField(
+            default="trim",
+            description="Strategy for a thread history over the token limit. trim drops the oldest messages. summarize folds them into a rolling summary, which keeps the prompt of long threads smaller without losing their context, at the cost of an extra LLM call when the summary is updated.",
+            json_schema_extra={
+                "x-group": "ai",
+            },
+        ),
+    ]
     # autonomous mode
     autonomous: Annotated[
         Optional[List[AgentAutonomous]],
@@ -1221,6 +1296,8 @@ class AgentUpdate(BaseModel):
                 setattr(db_agent, key, value)
             await db.commit()
             await db.refresh(db_agent)
+            evict_cached_agent(db_agent.id, db_agent.updated_at)
+            await publish_agent_update(db_agent.id, db_agent.updated_at)
             return Agent.model_validate(db_agent)
 
 
@@ -1300,6 +1377,9 @@ class AgentCreate(AgentUpdate):
                     setattr(db_agent, key, value)
             await db.commit()
             await db.refresh(db_agent)
+            evict_cached_agent(db_agent.id, db_agent.updated_at)
+            if not is_new:
+                await publish_agent_update(db_agent.id, db_agent.updated_at)
             return Agent.model_validate(db_agent), is_new
 
 
@@ -1478,6 +1558,20 @@ class Agent(AgentCreate):
                 return None
             return cls.model_validate(item)
 
+    @classmethod
+    async def get_cached(cls, agent_id: str) -> Optional["Agent"]:
+        """Get an agent from the hot path cache, for read only use.
+
+        The agent is shared with other callers, it must not be changed.
+
+        Args:
+            agent_id: Agent ID
+
+        Returns:
+            Agent if found, None otherwise
+        """
+        return await _get_cached("agent", agent_id, cls.get)
+
 
 class AgentResponse(Agent):
     """Response model for Agent API."""
@@ -1806,6 +1900,20 @@ class AgentData(BaseModel):
                 return cls.model_validate(item)
             return None
 
+    @classmethod
+    async def get_cached(cls, agent_id: str) -> Optional["AgentData"]:
+        """Get agent data from the hot path cache, for read only use.
+
+        The agent data is shared with other callers, it must not be changed.
+
+        Args:
+            agent_id: Agent ID
+
+        Returns:
+            AgentData if found, None otherwise
+        """
+        return await _get_cached("agent_data", agent_id, cls.get)
+
     async def save(self) -> None:
         """Save or update agent data.
 
@@ -1825,6 +1933,7 @@ class AgentData(BaseModel):
                 db.add(db_agent_data)
 
             await db.commit()
+            _evict_cached("agent_data", self.id)
 
     @staticmethod
     async def patch(id: str, data: dict) -> "AgentData":
@@ -1850,6 +1959,7 @@ class AgentData(BaseModel):
                     setattr(agent_data, key, value)
             await db.commit()
             await db.refresh(agent_data)
+            _evict_cached("agent_data", id)
             return AgentData.model_validate(agent_data)
 
 
@@ -1996,6 +2106,205 @@ class AgentPluginData(BaseModel):
             self.model_validate(plugin_data)
 
 
+QuotaKind = Literal["message", "autonomous", "twitter"]
+
+# The counters incremented for each kind of operation, each has a limit field
+# with _limit_ in place of _count_, and the time is saved in last_{kind}_time
+_QUOTA_COUNTERS: Dict[str, tuple[str, ...]] = {
+    "message": ("message_count_total", "message_count_monthly", "message_count_daily"),
+    "autonomous": ("autonomous_count_total", "autonomous_count_monthly"),
+    "twitter": ("twitter_count_total", "twitter_count_daily"),
+}
+
+# Redis keys of the quota counters. The snapshot hash holds the quota of an
+# agent as in the database plus the increments since, the pending hash only the
+# increments not yet flushed to the database, and the dirty set the agents with
+# pending increments.
+_QUOTA_SNAPSHOT_KEY = "intentkit:agent_quota:"
+_QUOTA_PENDING_KEY = "intentkit:agent_quota_pending:"
+_QUOTA_DIRTY_KEY = "intentkit:agent_quota_dirty"
+# Snapshots are reloaded from the database after this, to pick up limit changes
+QUOTA_SNAPSHOT_TTL = 600
+# Agents flushed to the database in one transaction
+QUOTA_FLUSH_BATCH = 100
+
+# KEYS: snapshot, pending, dirty
+# ARGV: agent id, check limits, last time field, now, day, month, counter fields...
+_QUOTA_CONSUME_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return -1
+end
+-- the counts of a past day or month restart from zero
+local periods = {{'daily', ARGV[5]}, {'monthly', ARGV[6]}}
+for _, key in ipairs({KEYS[1], KEYS[2]}) do
+  for _, p in ipairs(periods) do
+    local period = redis.call('HGET', key, p[1] .. '_period')
+    if period ~= p[2] then
+      if period then
+        for _, field in ipairs(redis.call('HKEYS', key)) do
+          if string.find(field, '_count_' .. p[1] .. '$') then
+            if key == KEYS[1] then
+              redis.call('HSET', key, field, 0)
+            else
+              redis.call('HDEL', key, field)
+            end
+          end
+        end
+      end
+      redis.call('HSET', key, p[1] .. '_period', p[2])
+    end
+  end
+end
+if ARGV[2] == '1' then
+  for i = 7, #ARGV do
+    local count = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    local limit_field = string.gsub(ARGV[i], '_count_', '_limit_')
+    local limit = redis.call('HGET', KEYS[1], limit_field)
+    if limit and count >= tonumber(limit) then
+      return 0
+    end
+  end
+end
+for i = 7, #ARGV do
+  redis.call('HINCRBY', KEYS[1], ARGV[i], 1)
+  redis.call('HINCRBY', KEYS[2], ARGV[i], 1)
+end
+redis.call('HSET', KEYS[1], ARGV[3], ARGV[4])
+redis.call('HSET', KEYS[2], ARGV[3], ARGV[4])
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: snapshot, pending
+# ARGV: ttl, then field, value pairs of the quota in the database
+_QUOTA_SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return 0
+end
+for i = 2, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+local pending = redis.call('HGETALL', KEYS[2])
+local periods = {}
+for i = 1, #pending, 2 do
+  if string.find(pending[i], '_period$') then
+    periods[pending[i]] = pending[i + 1]
+  end
+end
+for i = 1, #pending, 2 do
+  local field = pending[i]
+  local name = string.match(field, '_count_(%a+)$')
+  if name then
+    -- pending counts of a past period are dropped by the next consume
+    local period_field = name .. '_period'
+    if name == 'total'
+      or periods[period_field] == redis.call('HGET', KEYS[1], period_field) then
+      redis.call('HINCRBY', KEYS[1], field, pending[i + 1])
+    end
+  elseif string.find(field, '^last_') then
+    redis.call('HSET', KEYS[1], field, pending[i + 1])
+  end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: pending, dirty
+# ARGV: agent id, then field, value pairs of the pending hash flushed to the database
+_QUOTA_ACK_SCRIPT = """
+local flushed = {}
+for i = 2, #ARGV, 2 do
+  flushed[ARGV[i]] = ARGV[i + 1]
+end
+for i = 2, #ARGV, 2 do
+  local field = ARGV[i]
+  local name = string.match(field, '_count_(%a+)$')
+  if name then
+    -- pending counts of a past period were already dropped by a consume
+    if name == 'total' or redis.call('HGET', KEYS[1], name .. '_period')
+      == flushed[name .. '_period'] then
+      if redis.call('HINCRBY', KEYS[1], field, -tonumber(ARGV[i + 1])) <= 0 then
+        redis.call('HDEL', KEYS[1], field)
+      end
+    end
+  elseif string.find(field, '^last_') then
+    if redis.call('HGET', KEYS[1], field) == ARGV[i + 1] then
+      redis.call('HDEL', KEYS[1], field)
+    end
+  end
+end
+-- counts added since the read are left for the next flush
+for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+  if not string.find(field, '_period$') then
+    redis.call('SADD', KEYS[2], ARGV[1])
+    return 1
+  end
+end
+redis.call('DEL', KEYS[1])
+return 0
+"""
+
+
+def _quota_redis() -> Optional[Redis]:
+    """Get the Redis client for the quota counters, None if not configured."""
+    try:
+        return get_redis()
+    except RuntimeError:
+        return None
+
+
+def _quota_periods(now: datetime) -> tuple[str, str]:
+    """Get the day and the month of the daily and monthly counters, in UTC."""
+    return now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+
+
+def _period_count(name: str, period: str, field: str) -> Any:
+    """SQL expression of a counter in the given period, zero if it is a past one.
+
+    A null period is taken as the current one, the counters were reset at its
+    start by the scheduler before the periods were saved.
+    """
+    period_column = getattr(AgentQuotaTable, f"{name}_period")
+    return case(
+        (
+            func.coalesce(period_column, period) == period,
+            getattr(AgentQuotaTable, field),
+        ),
+        else_=0,
+    )
+
+
+def _period_counts(name: str, period: str, increments: Dict[str, int]) -> Dict:
+    """UPDATE values adding to the counters of a period, restarting a past one."""
+    values: Dict[str, Any] = {f"{name}_period": period}
+    for column in AgentQuotaTable.__table__.columns:
+        if column.key.endswith(f"_count_{name}"):
+            values[column.key] = _period_count(name, period, column.key) + (
+                increments.get(column.key, 0)
+            )
+    return values
+
+
+def _pending_values(fields: Dict[str, str]) -> Dict[str, Any]:
+    """UPDATE values adding the pending counts of an agent from Redis."""
+    values: Dict[str, Any] = {}
+    for field, value in fields.items():
+        if field.startswith("last_"):
+            values[field] = datetime.fromisoformat(value)
+        elif field.endswith("_count_total"):
+            values[field] = getattr(AgentQuotaTable, field) + int(value)
+    for name in ("daily", "monthly"):
+        period = fields.get(f"{name}_period")
+        if period:
+            increments = {
+                field: int(value)
+                for field, value in fields.items()
+                if field.endswith(f"_count_{name}")
+            }
+            values.update(_period_counts(name, period, increments))
+    return values
+
+
 class AgentQuotaTable(Base):
     """AgentQuota database table model."""
 
@@ -2022,6 +2331,8 @@ class AgentQuotaTable(Base):
     twitter_count_daily = Column(BigInteger, default=0)
     twitter_limit_daily = Column(BigInteger, default=99999999)
     last_twitter_time = Column(DateTime(timezone=True), default=None, nullable=True)
+    daily_period = Column(String, nullable=True)
+    monthly_period = Column(String, nullable=True)
     created_at = Column(
         DateTime(timezone=True),
         nullable=False,
@@ -2124,6 +2435,18 @@ class AgentQuota(BaseModel):
         Optional[datetime],
         PydanticField(default=None, description="Last Twitter operation timestamp"),
     ]
+    daily_period: Annotated[
+        Optional[str],
+        PydanticField(
+            default=None, description="Day of the daily counts, YYYY-MM-DD in UTC"
+        ),
+    ]
+    monthly_period: Annotated[
+        Optional[str],
+        PydanticField(
+            default=None, description="Month of the monthly counts, YYYY-MM in UTC"
+        ),
+    ]
     created_at: Annotated[
         datetime,
         PydanticField(
@@ -2139,10 +2462,30 @@ class AgentQuota(BaseModel):
         ),
     ]
 
+    @model_validator(mode="after")
+    def reset_past_periods(self) -> "AgentQuota":
+        """Zero the counts of a past day or month.
+
+        The counters are not reset when a period ends, they restart the first
+        time they are counted in the new period.
+        """
+        day, month = _quota_periods(datetime.now(timezone.utc))
+        for name, period in (("daily", day), ("monthly", month)):
+            current = getattr(self, f"{name}_period")
+            if current is not None and current != period:
+                for field in type(self).model_fields:
+                    if field.endswith(f"_count_{name}"):
+                        setattr(self, field, 0)
+            setattr(self, f"{name}_period", period)
+        return self
+
     @classmethod
     async def get(cls, agent_id: str) -> "AgentQuota":
         """Get agent quota by id, if not exists, create a new one.
 
+        Reads the snapshot in Redis if there is one, it includes the counts not
+        yet flushed to the database.
+
         Args:
             agent_id: Agent ID
 
@@ -2152,6 +2495,15 @@ class AgentQuota(BaseModel):
         Raises:
             HTTPException: If there are database errors
         """
+        redis = _quota_redis()
+        if redis:
+            try:
+                snapshot = await redis.hgetall(_QUOTA_SNAPSHOT_KEY + agent_id)
+                if snapshot:
+                    return cls.model_validate(snapshot)
+            except RedisError as e:
+                logger.warning(f"failed to read quota snapshot of {agent_id}: {e}")
+
         async with get_session() as db:
             quota_record = await db.get(AgentQuotaTable, agent_id)
             if not quota_record:
@@ -2163,7 +2515,177 @@ class AgentQuota(BaseModel):
                 await db.commit()
                 await db.refresh(quota_record)
 
-            return cls.model_validate(quota_record)
+            quota = cls.model_validate(quota_record)
+
+        if redis:
+            try:
+                await quota._seed(redis)
+            except RedisError as e:
+                logger.warning(f"failed to seed quota snapshot of {agent_id}: {e}")
+        return quota
+
+    @classmethod
+    async def get_cached(cls, agent_id: str) -> "AgentQuota":
+        """Get agent quota from the hot path cache, for read only use.
+
+        For display, consume checks the limits against the current counts.
+
+        Args:
+            agent_id: Agent ID
+
+        Returns:
+            AgentQuota: The agent's quota object
+        """
+        return await _get_cached("agent_quota", agent_id, cls.get)
+
+    async def _seed(self, redis: Redis) -> None:
+        """Save this quota as the snapshot in Redis, unless there is one."""
+        fields = self.model_dump(mode="json", exclude_none=True)
+        await redis.eval(
+            _QUOTA_SEED_SCRIPT,
+            2,
+            _QUOTA_SNAPSHOT_KEY + self.id,
+            _QUOTA_PENDING_KEY + self.id,
+            QUOTA_SNAPSHOT_TTL,
+            *(item for field in fields.items() for item in field),
+        )
+
+    @classmethod
+    async def consume(cls, agent_id: str, kind: QuotaKind, check: bool = True) -> bool:
+        """Count an operation of an agent, if it has quota left.
+
+        The check and the increments are atomic, so parallel operations can't
+        exceed the limits. The counters are in Redis, flushed to the database by
+        flush_counters, the database is used directly if Redis is unavailable.
+
+        Args:
+            agent_id: Agent ID
+            kind: The kind of operation
+            check: Whether to check the limits, if False the operation is always
+                counted
+
+        Returns:
+            bool: True if the operation was counted, False if over the limit
+        """
+        _evict_cached("agent_quota", agent_id)
+        redis = _quota_redis()
+        if redis:
+            try:
+                consumed = await cls._consume_in_redis(redis, agent_id, kind, check)
+                if consumed is not None:
+                    return consumed
+            except RedisError as e:
+                logger.warning(f"quota counters unavailable, using the database: {e}")
+        return await cls._consume_in_db(agent_id, kind, check)
+
+    @classmethod
+    async def _consume_in_redis(
+        cls, redis: Redis, agent_id: str, kind: QuotaKind, check: bool
+    ) -> Optional[bool]:
+        keys = (
+            _QUOTA_SNAPSHOT_KEY + agent_id,
+            _QUOTA_PENDING_KEY + agent_id,
+            _QUOTA_DIRTY_KEY,
+        )
+        now = datetime.now(timezone.utc)
+        args = (
+            agent_id,
+            int(check),
+            f"last_{kind}_time",
+            now.isoformat(),
+            *_quota_periods(now),
+            *_QUOTA_COUNTERS[kind],
+        )
+        result = await redis.eval(_QUOTA_CONSUME_SCRIPT, len(keys), *keys, *args)
+        if result == -1:
+            # no snapshot yet, or it expired
+            await cls.get(agent_id)
+            result = await redis.eval(_QUOTA_CONSUME_SCRIPT, len(keys), *keys, *args)
+        if result == -1:
+            return None
+        return result == 1
+
+    @classmethod
+    async def _consume_in_db(cls, agent_id: str, kind: QuotaKind, check: bool) -> bool:
+        fields = _QUOTA_COUNTERS[kind]
+        now = datetime.now(timezone.utc)
+        day, month = _quota_periods(now)
+        values: Dict[str, Any] = {f"last_{kind}_time": now}
+        counts = {}
+        for field in fields:
+            if field.endswith("_count_total"):
+                values[field] = getattr(AgentQuotaTable, field) + 1
+                counts[field] = getattr(AgentQuotaTable, field)
+        for name, period in (("daily", day), ("monthly", month)):
+            period_fields = [f for f in fields if f.endswith(f"_count_{name}")]
+            values.update(_period_counts(name, period, dict.fromkeys(period_fields, 1)))
+            for field in period_fields:
+                counts[field] = _period_count(name, period, field)
+        stmt = update(AgentQuotaTable).where(AgentQuotaTable.id == agent_id)
+        if check:
+            stmt = stmt.where(
+                *(
+                    count
+                    < getattr(AgentQuotaTable, field.replace("_count_", "_limit_"))
+                    for field, count in counts.items()
+                )
+            )
+        stmt = stmt.values(values).returning(AgentQuotaTable.id)
+        async with get_session() as db:
+            await db.execute(
+                insert(AgentQuotaTable).values(id=agent_id).on_conflict_do_nothing()
+            )
+            consumed = await db.scalar(stmt) is not None
+            await db.commit()
+        return consumed
+
+    @classmethod
+    async def flush_counters(cls) -> int:
+        """Add the counts in Redis to the database, run periodically.
+
+        The counts are removed from Redis only after the commit, so a failed
+        flush leaves them for the next one.
+
+        Returns:
+            int: The number of agents flushed
+        """
+        redis = _quota_redis()
+        if not redis:
+            return 0
+        flushed = 0
+        while True:
+            agent_ids = await redis.spop(_QUOTA_DIRTY_KEY, QUOTA_FLUSH_BATCH)
+            if not agent_ids:
+                return flushed
+            pending = {}
+            for agent_id in agent_ids:
+                fields = await redis.hgetall(_QUOTA_PENDING_KEY + agent_id)
+                if fields:
+                    pending[agent_id] = fields
+            try:
+                async with get_session() as db:
+                    for agent_id, fields in pending.items():
+                        await db.execute(
+                            update(AgentQuotaTable)
+                            .where(AgentQuotaTable.id == agent_id)
+                            .values(_pending_values(fields))
+                        )
+                    await db.commit()
+            except Exception:
+                # the counts are still pending, for the next flush
+                await redis.sadd(_QUOTA_DIRTY_KEY, *agent_ids)
+                raise
+            # only now remove the flushed counts, keeping the ones added since
+            for agent_id, fields in pending.items():
+                await redis.eval(
+                    _QUOTA_ACK_SCRIPT,
+                    2,
+                    _QUOTA_PENDING_KEY + agent_id,
+                    _QUOTA_DIRTY_KEY,
+                    agent_id,
+                    *(item for field in fields.items() for item in field),
+                )
+            flushed += len(pending)
 
     def has_message_quota(self) -> bool:
         """Check if the agent has message quota.
@@ -2212,41 +2734,11 @@ class AgentQuota(BaseModel):
 
     async def add_message(self) -> None:
         """Add a message to the agent's message count."""
-        async with get_session() as db:
-            quota_record = await db.get(AgentQuotaTable, self.id)
-
-            if quota_record:
-                # Update record
-                quota_record.message_count_total += 1
-                quota_record.message_count_monthly += 1
-                quota_record.message_count_daily += 1
-                quota_record.last_message_time = datetime.now(timezone.utc)
-                db.add(quota_record)
-                await db.commit()
-
-                # Update this instance
-                await db.refresh(quota_record)
-                self.message_count_total = quota_record.message_count_total
-                self.message_count_monthly = quota_record.message_count_monthly
-                self.message_count_daily = quota_record.message_count_daily
-                self.last_message_time = quota_record.last_message_time
-                self.updated_at = quota_record.updated_at
+        await self.consume(self.id, "message", check=False)
 
     async def add_autonomous(self) -> None:
         """Add an autonomous operation to the agent's autonomous count."""
-        async with get_session() as db:
-            quota_record = await db.get(AgentQuotaTable, self.id)
-            if quota_record:
-                # Update record
-                quota_record.autonomous_count_total += 1
-                quota_record.autonomous_count_monthly += 1
-                quota_record.last_autonomous_time = datetime.now(timezone.utc)
-                db.add(quota_record)
-                await db.commit()
-
-                # Update this instance
-                await db.refresh(quota_record)
-                self.model_validate(quota_record)
+        await self.consume(self.id, "autonomous", check=False)
 
     async def add_twitter_message(self) -> None:
         """Add a twitter message to the agent's twitter count.
@@ -2254,17 +2746,41 @@ class AgentQuota(BaseModel):
         Raises:
             HTTPException: If there are database errors
         """
-        async with get_session() as db:
-            quota_record = await db.get(AgentQuotaTable, self.id)
+        await self.consume(self.id, "twitter", check=False)
 
-            if quota_record:
-                # Update record
-                quota_record.twitter_count_total += 1
-                quota_record.twitter_count_daily += 1
-                quota_record.last_twitter_time = datetime.now(timezone.utc)
-                db.add(quota_record)
-                await db.commit()
 
-                # Update this instance
-                await db.refresh(quota_record)
-                self.model_validate(quota_record)
+class AgentContext:
+    """The Agent, AgentData and AgentQuota of one agent for one turn.
+
+    Each is loaded at most once, from the hot path cache, and stays the same for
+    the whole turn, unless written by the turn. The engine passes it to the graph
+    as the "context" configurable, the SkillStore reads from it when called from
+    a skill of the turn.
+    """
+
+    def __init__(self, agent_id: str, agent: Optional[Agent] = None) -> None:
+        self.agent_id = agent_id
+        self._loaded: Dict[str, Any] = {}
+        if agent:
+            self._loaded["agent"] = agent
+
+    async def _get(self, kind: str, load: Callable[[str], Awaitable[Any]]) -> Any:
+        if kind not in self._loaded:
+            self._loaded[kind] = await load(self.agent_id)
+        return self._loaded[kind]
+
+    async def agent(self) -> Optional[Agent]:
+        """Get the agent, None if not found."""
+        return await self._get("agent", Agent.get_cached)
+
+    async def agent_data(self) -> Optional[AgentData]:
+        """Get the agent data, None if not found."""
+        return await self._get("agent_data", AgentData.get_cached)
+
+    async def quota(self) -> AgentQuota:
+        """Get the agent quota."""
+        return await self._get("agent_quota", AgentQuota.get_cached)
+
+    def evict(self, kind: str) -> None:
+        """Drop a model written by the turn, the next read loads it again."""
+        self._loaded.pop(kind, None)
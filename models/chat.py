@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from typing import Annotated, List, NotRequired, Optional, TypedDict
 
@@ -12,6 +12,7 @@ from sqlalchemy import (
     String,
     desc,
     func,
+    insert,
     select,
     update,
 )
@@ -144,7 +145,10 @@ class ChatMessageTable(Base):
     """Chat message database table model."""
 
     __tablename__ = "chat_messages"
-    __table_args__ = (Index("ix_chat_messages_chat_id", "chat_id"),)
+    __table_args__ = (
+        Index("ix_chat_messages_chat_id", "chat_id"),
+        Index("ix_chat_messages_created_at", "created_at"),
+    )
 
     id = Column(
         String,
@@ -286,6 +290,60 @@ class ChatMessageCreate(BaseModel):
             return ChatMessage.model_validate(message_record)
 
 
+class ChatMessageBuffer:
+    """Chat messages of an agent run, saved together when the run ends.
+
+    Saving every message on its own costs a round trip for the INSERT, the
+    COMMIT and the refresh each, on the critical path of the run. The buffer
+    keeps them until flush, which saves them in one multi-row INSERT ... RETURNING.
+
+    created_at is set when a message is added, not when it is saved, and is kept
+    strictly increasing so the messages of a run stay in order.
+    """
+
+    def __init__(self, after: Optional[datetime] = None) -> None:
+        """Create an empty buffer.
+
+        Args:
+            after: The messages are created after this time, e.g. the creation
+                time of the message that started the run
+        """
+        self._messages: list[tuple[ChatMessageCreate, datetime]] = []
+        self._last = after
+
+    def add(self, message: ChatMessageCreate) -> None:
+        """Add a message to be saved on flush."""
+        created_at = datetime.now(timezone.utc)
+        if self._last and created_at <= self._last:
+            created_at = self._last + timedelta(microseconds=1)
+        self._last = created_at
+        self._messages.append((message, created_at))
+
+    async def flush(self) -> list["ChatMessage"]:
+        """Save the buffered messages.
+
+        Returns:
+            list[ChatMessage]: The saved messages, in the order they were added
+        """
+        if not self._messages:
+            return []
+        rows = [
+            {**message.model_dump(), "created_at": created_at}
+            for message, created_at in self._messages
+        ]
+        async with get_session() as db:
+            records = await db.scalars(
+                insert(ChatMessageTable).returning(
+                    ChatMessageTable, sort_by_parameter_order=True
+                ),
+                rows,
+            )
+            saved = [ChatMessage.model_validate(record) for record in records]
+            await db.commit()
+        self._messages = []
+        return saved
+
+
 class ChatMessage(ChatMessageCreate):
     """Chat message model with all fields including server-generated ones."""
 
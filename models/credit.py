@@ -1,7 +1,8 @@
+import zlib
 from datetime import datetime, timezone
 from decimal import ROUND_HALF_UP, Decimal
 from enum import Enum
-from typing import Annotated, Any, Optional, Tuple
+from typing import Annotated, Any, List, Optional, Tuple
 
 from epyxid import XID
 from fastapi import HTTPException
@@ -16,6 +17,7 @@ from sqlalchemy import (
     select,
     update,
 )
+from sqlalchemy.dialects.postgresql import JSONB, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.base import Base
@@ -48,6 +50,42 @@ DEFAULT_PLATFORM_ACCOUNT_REFUND = "platform_refund"
 DEFAULT_PLATFORM_ACCOUNT_FEE = "platform_fee"
 DEFAULT_PLATFORM_ACCOUNT_DEV = "platform_dev"
 
+# The platform accounts receiving on every expense are split into shards, so
+# parallel expenses don't all wait for the lock of one row. The shards are
+# platform virtual accounts too, rolled up into the canonical account regularly.
+SHARDED_PLATFORM_ACCOUNTS = (DEFAULT_PLATFORM_ACCOUNT_FEE, DEFAULT_PLATFORM_ACCOUNT_DEV)
+PLATFORM_ACCOUNT_SHARDS = 16
+
+
+def platform_account_shards(owner_id: str) -> List[str]:
+    """Get the owner ids of all shards of a platform account.
+
+    Args:
+        owner_id: Owner id of the canonical platform account
+
+    Returns:
+        The shard owner ids, empty if the account is not sharded
+    """
+    if owner_id not in SHARDED_PLATFORM_ACCOUNTS:
+        return []
+    return [f"{owner_id}_{i}" for i in range(PLATFORM_ACCOUNT_SHARDS)]
+
+
+def platform_account_shard(owner_id: str, key: str) -> str:
+    """Pick the shard of a platform account for an expense.
+
+    Args:
+        owner_id: Owner id of the canonical platform account
+        key: Spreads the expenses over the shards, e.g. the payer id
+
+    Returns:
+        The shard owner id, or owner_id if the account is not sharded
+    """
+    if owner_id not in SHARDED_PLATFORM_ACCOUNTS:
+        return owner_id
+    # crc32 is stable across processes, unlike hash()
+    return f"{owner_id}_{zlib.crc32(key.encode()) % PLATFORM_ACCOUNT_SHARDS}"
+
 
 class CreditAccountTable(Base):
     """Credit account database table model."""
@@ -92,6 +130,11 @@ class CreditAccountTable(Base):
         default=0,
         nullable=False,
     )
+    held_credits = Column(
+        Numeric(22, 4),
+        default=0,
+        nullable=False,
+    )
     income_at = Column(
         DateTime(timezone=True),
         nullable=True,
@@ -158,6 +201,13 @@ class CreditAccount(BaseModel):
         Decimal,
         Field(default=Decimal("0"), description="Credits added through top-ups"),
     ]
+    held_credits: Annotated[
+        Decimal,
+        Field(
+            default=Decimal("0"),
+            description="Credits reserved by holds of running executions",
+        ),
+    ]
     income_at: Annotated[
         Optional[datetime],
         Field(None, description="Timestamp of the last income transaction"),
@@ -174,7 +224,12 @@ class CreditAccount(BaseModel):
     ]
 
     @field_validator(
-        "free_quota", "refill_amount", "free_credits", "reward_credits", "credits"
+        "free_quota",
+        "refill_amount",
+        "free_credits",
+        "reward_credits",
+        "credits",
+        "held_credits",
     )
     @classmethod
     def round_decimal(cls, v: Any) -> Decimal:
@@ -341,13 +396,22 @@ class CreditAccount(BaseModel):
     def has_sufficient_credits(self, amount: Decimal) -> bool:
         """Check if the account has enough credits to cover the specified amount.
 
+        Credits reserved by holds are not available.
+
         Args:
             amount: The amount of credits to check against
 
         Returns:
             bool: True if there are enough credits, False otherwise
         """
-        return amount <= self.free_credits + self.reward_credits + self.credits
+        return amount <= self.available_credits
+
+    @property
+    def available_credits(self) -> Decimal:
+        """Balance of all credit types, minus the credits reserved by holds."""
+        return (
+            self.free_credits + self.reward_credits + self.credits - self.held_credits
+        )
 
     @classmethod
     async def income_in_session(
@@ -489,11 +553,13 @@ class EventType(str, Enum):
 
     MESSAGE = "message"
     SKILL_CALL = "skill_call"
+    EXECUTION = "execution"
     RECHARGE = "recharge"
     REWARD = "reward"
     REFUND = "refund"
     ADJUSTMENT = "adjustment"
     REFILL = "refill"
+    ROLLUP = "rollup"
 
 
 class UpstreamType(str, Enum):
@@ -634,6 +700,10 @@ class CreditEventTable(Base):
         String,
         nullable=True,
     )
+    items = Column(
+        JSONB,
+        nullable=True,
+    )
     created_at = Column(
         DateTime(timezone=True),
         nullable=False,
@@ -641,6 +711,39 @@ class CreditEventTable(Base):
     )
 
 
+class CreditEventItem(BaseModel):
+    """One charge of an execution event, a message or a skill call."""
+
+    event_type: Annotated[
+        EventType, Field(description="Type of the charge, message or skill_call")
+    ]
+    message_id: Annotated[str, Field(description="ID of the message charged for")]
+    skill_call_id: Annotated[
+        Optional[str], Field(None, description="ID of the skill call if applicable")
+    ]
+    skill_name: Annotated[
+        Optional[str], Field(None, description="Name of the skill if applicable")
+    ]
+    base_llm_amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Base LLM cost amount")
+    ]
+    base_skill_amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Base skill cost amount")
+    ]
+    fee_platform_amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Platform fee amount")
+    ]
+    fee_dev_amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Developer fee amount")
+    ]
+    fee_agent_amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Agent fee amount")
+    ]
+    total_amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Total amount of the charge")
+    ]
+
+
 class CreditEvent(BaseModel):
     """Credit event model with all fields."""
 
@@ -651,30 +754,36 @@ class CreditEvent(BaseModel):
     )
 
     @classmethod
-    async def check_upstream_tx_id_exists(
-        cls, session: AsyncSession, upstream_type: UpstreamType, upstream_tx_id: str
+    async def insert_in_session(
+        cls, session: AsyncSession, event: CreditEventTable
     ) -> None:
         """
-        Check if an event with the given upstream_type and upstream_tx_id already exists.
+        Insert an event, unless one with the same upstream_type and upstream_tx_id
+        already exists, in one statement, so concurrent duplicates are caught too.
         Raises HTTP 400 error if it exists to prevent duplicate transactions.
 
         Args:
             session: Database session
-            upstream_type: Type of the upstream transaction
-            upstream_tx_id: ID of the upstream transaction
+            event: The event to insert
 
         Raises:
             HTTPException: If a transaction with the same upstream_tx_id already exists
         """
-        stmt = select(CreditEventTable).where(
-            CreditEventTable.upstream_type == upstream_type,
-            CreditEventTable.upstream_tx_id == upstream_tx_id,
+        values = {
+            column.key: getattr(event, column.key)
+            for column in CreditEventTable.__table__.columns
+            if getattr(event, column.key) is not None
+        }
+        stmt = (
+            insert(CreditEventTable)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=["upstream_type", "upstream_tx_id"])
+            .returning(CreditEventTable.id)
         )
-        result = await session.scalar(stmt)
-        if result:
+        if await session.scalar(stmt) is None:
             raise HTTPException(
                 status_code=400,
-                detail=f"Transaction with upstream_tx_id '{upstream_tx_id}' already exists. Do not resubmit.",
+                detail=f"Transaction with upstream_tx_id '{event.upstream_tx_id}' already exists. Do not resubmit.",
             )
 
     id: Annotated[
@@ -780,6 +889,10 @@ class CreditEvent(BaseModel):
         return v
 
     note: Annotated[Optional[str], Field(None, description="Additional notes")]
+    items: Annotated[
+        Optional[List[CreditEventItem]],
+        Field(None, description="Breakdown of an execution event by charge"),
+    ]
     created_at: Annotated[
         datetime, Field(description="Timestamp when this event was created")
     ]
@@ -799,6 +912,7 @@ class TransactionType(str, Enum):
     REFUND = "refund"
     ADJUSTMENT = "adjustment"
     REFILL = "refill"
+    ROLLUP = "rollup"
 
 
 class CreditDebit(str, Enum):
@@ -899,6 +1013,121 @@ class CreditTransaction(BaseModel):
     ]
 
 
+class HoldStatus(str, Enum):
+    """Status of a credit hold."""
+
+    HELD = "held"
+    SETTLED = "settled"
+    RELEASED = "released"
+
+
+class CreditHoldTable(Base):
+    """Credit holds database table model.
+
+    Reserves credits of an account for a running agent execution, the amount is
+    also added to held_credits of the account until the hold is settled or released.
+    """
+
+    __tablename__ = "credit_holds"
+    __table_args__ = (
+        Index("ix_credit_holds_account", "account_id"),
+        Index("ix_credit_holds_status_expires", "status", "expires_at"),
+    )
+
+    id = Column(
+        String,
+        primary_key=True,
+    )
+    account_id = Column(
+        String,
+        nullable=False,
+    )
+    agent_id = Column(
+        String,
+        nullable=True,
+    )
+    start_message_id = Column(
+        String,
+        nullable=True,
+    )
+    amount = Column(
+        Numeric(22, 4),
+        default=0,
+        nullable=False,
+    )
+    status = Column(
+        String,
+        nullable=False,
+    )
+    expires_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class CreditHold(BaseModel):
+    """Credit hold model with all fields."""
+
+    model_config = ConfigDict(
+        use_enum_values=True,
+        from_attributes=True,
+        json_encoders={datetime: lambda v: v.isoformat(timespec="milliseconds")},
+    )
+
+    id: Annotated[
+        str,
+        Field(
+            default_factory=lambda: str(XID()),
+            description="Unique identifier for the credit hold",
+        ),
+    ]
+    account_id: Annotated[
+        str, Field(description="ID of the account the credits are held from")
+    ]
+    agent_id: Annotated[
+        Optional[str], Field(None, description="ID of the agent being executed")
+    ]
+    start_message_id: Annotated[
+        Optional[str],
+        Field(None, description="ID of the input message of the execution"),
+    ]
+    amount: Annotated[
+        Decimal, Field(default=Decimal("0"), description="Amount of credits held")
+    ]
+    status: Annotated[HoldStatus, Field(description="Status of the hold")]
+    expires_at: Annotated[
+        datetime,
+        Field(description="Timestamp after which the hold is released if still held"),
+    ]
+    created_at: Annotated[
+        datetime, Field(description="Timestamp when this hold was created")
+    ]
+    updated_at: Annotated[
+        datetime, Field(description="Timestamp when this hold was last updated")
+    ]
+
+    @field_validator("amount")
+    @classmethod
+    def round_decimal(cls, v: Any) -> Decimal:
+        """Round decimal values to 4 decimal places."""
+        if isinstance(v, Decimal):
+            return v.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+        elif isinstance(v, (int, float)):
+            return Decimal(str(v)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+        return v
+
+
 class PriceEntity(str, Enum):
     """Type of credit price."""
 
@@ -9,6 +9,17 @@ from models.base import Base
 
 logger = logging.getLogger(__name__)
 
+# Indexes added to existing tables, which create_all skips. They are built
+# concurrently, so a large table is not locked for writes while it is built.
+_CONCURRENT_INDEXES = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_agent_skill_data_expires_at "
+    "ON agent_skill_data (expires_at) WHERE expires_at IS NOT NULL",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_thread_skill_data_expires_at "
+    "ON thread_skill_data (expires_at) WHERE expires_at IS NOT NULL",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_messages_created_at "
+    "ON chat_messages (created_at)",
+)
+
 
 async def add_column_if_not_exists(
     conn, dialect, table_name: str, column: Column
@@ -68,7 +79,7 @@ async def update_table_schema(conn, dialect, model_cls) -> None:
 
 
 async def safe_migrate(engine) -> None:
-    """Safely migrate all SQLAlchemy models by adding new columns.
+    """Safely migrate all SQLAlchemy models by adding new columns and indexes.
 
     Args:
         engine: SQLAlchemy engine
@@ -100,4 +111,14 @@ async def safe_migrate(engine) -> None:
             logger.error(f"Error updating database schema: {str(e)}")
             raise
 
+    # CONCURRENTLY can't run in a transaction
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in _CONCURRENT_INDEXES:
+            try:
+                await conn.execute(text(statement))
+            except Exception as e:
+                # e.g. another worker is building it, the next start retries
+                logger.warning(f"Failed to create index: {str(e)}")
+
     logger.info("Database schema updated successfully")
@@ -1,15 +1,23 @@
 """Redis client module for IntentKit."""
 
+import json
 import logging
-from typing import Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Optional
 
 from redis.asyncio import Redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
 
 logger = logging.getLogger(__name__)
 
 # Global Redis client instance
 _redis_client: Optional[Redis] = None
 
+# Pub/sub channel for agent configuration changes
+AGENT_UPDATE_CHANNEL = "intentkit:agent:updated"
+
 
 async def init_redis(
     host: str,
@@ -72,3 +80,74 @@ def get_redis() -> Redis:
     if _redis_client is None:
         raise RuntimeError("Redis client not initialized. Call init_redis first.")
     return _redis_client
+
+
+async def publish_agent_update(
+    agent_id: str, updated_at: Optional[datetime] = None
+) -> None:
+    """Notify all processes that an agent configuration has changed.
+
+    This is best effort, it does nothing if Redis is not initialized and only
+    logs Redis errors, the subscribers reconcile with the database periodically.
+
+    Args:
+        agent_id: ID of the changed agent
+        updated_at: New updated_at of the agent, None if unknown,
+            subscribers then drop their cached state unconditionally
+    """
+    if _redis_client is None:
+        return
+    message = {
+        "id": agent_id,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+    }
+    try:
+        await _redis_client.publish(AGENT_UPDATE_CHANNEL, json.dumps(message))
+    except RedisError as e:
+        logger.warning(f"Failed to publish agent update for {agent_id}: {e}")
+
+
+@asynccontextmanager
+async def subscribe_agent_updates() -> AsyncIterator[
+    AsyncIterator[tuple[str, Optional[datetime]]]
+]:
+    """Subscribe to agent configuration changes.
+
+    The subscription is active once the context is entered, the yielded iterator
+    produces the agent ID and its new updated_at (None if unknown) of each change.
+
+    Example:
+        ```python
+        async with subscribe_agent_updates() as updates:
+            async for agent_id, updated_at in updates:
+                ...
+        ```
+
+    Raises:
+        RuntimeError: If the Redis client is not initialized
+        RedisError: If the subscription is lost
+    """
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(AGENT_UPDATE_CHANNEL)
+    try:
+        yield _agent_updates(pubsub)
+    finally:
+        await pubsub.aclose()
+
+
+async def _agent_updates(
+    pubsub: PubSub,
+) -> AsyncIterator[tuple[str, Optional[datetime]]]:
+    async for message in pubsub.listen():
+        if message["type"] != "message":
+            continue
+        try:
+            data = json.loads(message["data"])
+            updated_at = (
+                datetime.fromisoformat(data["updated_at"])
+                if data.get("updated_at")
+                else None
+            )
+            yield data["id"], updated_at
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Invalid agent update message {message}: {e}")
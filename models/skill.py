@@ -1,23 +1,269 @@
+import json
+import logging
+import math
 from datetime import datetime, timezone
-from typing import Annotated, Any, Dict, Optional
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Optional, Sequence
 
+from epyxid import XID
 from pydantic import BaseModel, ConfigDict, Field
-from sqlalchemy import Column, DateTime, String, delete, func, select
-from sqlalchemy.dialects.postgresql import JSONB
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import (
+    Column,
+    ColumnElement,
+    DateTime,
+    Index,
+    String,
+    delete,
+    func,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import JSONB, insert
 
 from models.base import Base
 from models.db import get_session
+from models.redis import get_redis
+from utils.cache import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+# Skill data is cached in two tiers. Redis holds a hash per data key with the
+# JSON data, a version changed on every write, and the updated_at of the row.
+# The process cache holds the version and the JSON data, and a hit is checked
+# against the version in Redis, so writes of other workers are seen right away
+# and only the version travels on a hit.
+_SKILL_DATA_KEY = "intentkit:skill_data:"
+# Cached keys are reloaded from the database after this, or when they expire
+SKILL_DATA_TTL = 3600
+# Expired rows deleted in one transaction
+SKILL_DATA_GC_BATCH = 500
+_skill_data_cache: BoundedCache[str, tuple[str, str]] = BoundedCache(
+    max_size=10000, max_memory=64 * 1024 * 1024
+)
+
+# KEYS: data key
+# ARGV: version, data, updated_at of the row, empty when loaded, ttl
+# A write older than the cached one is ignored, a load never replaces a write.
+_SKILL_DATA_SET_SCRIPT = """
+local current = redis.call('HMGET', KEYS[1], 'v', 'd', 'u')
+if current[1] and current[3] >= ARGV[3] then
+  return {current[1], current[2]}
+end
+redis.call('HSET', KEYS[1], 'v', ARGV[1], 'd', ARGV[2], 'u', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {ARGV[1], ARGV[2]}
+"""
+
+
+def _skill_data_redis() -> Optional[Redis]:
+    """Get the Redis client for the skill data cache, None if not configured."""
+    try:
+        return get_redis()
+    except RuntimeError:
+        return None
+
+
+def _cache_ttl(expires_at: Optional[datetime]) -> int:
+    """Seconds to cache skill data, at most until it expires."""
+    if expires_at is None:
+        return SKILL_DATA_TTL
+    seconds = (expires_at - datetime.now(timezone.utc)).total_seconds()
+    return max(1, min(SKILL_DATA_TTL, math.ceil(seconds)))
+
+
+def _live(table: type[Base]) -> ColumnElement[bool]:
+    """Condition of the skill data rows that have not expired."""
+    return or_(table.expires_at.is_(None), table.expires_at > func.now())
+
+
+def _agent_cache_key(agent_id: str, skill: str, key: str) -> str:
+    return f"{_SKILL_DATA_KEY}agent:{agent_id}:{skill}:{key}"
+
+
+def _thread_cache_key(thread_id: str, skill: str, key: str) -> str:
+    return f"{_SKILL_DATA_KEY}thread:{thread_id}:{skill}:{key}"
+
+
+async def _cached_get(
+    cache_key: str, load: Callable[[], Awaitable[Optional[Base]]]
+) -> Optional[dict]:
+    """Read skill data through the cache, loading it from the database on a miss.
+
+    Args:
+        cache_key: Redis key of the data
+        load: Reads the row from the database, None if missing or expired
+
+    Returns:
+        The skill data, None if there is none
+    """
+    redis = _skill_data_redis()
+    if not redis:
+        record = await load()
+        return record.data if record else None
+    try:
+        local = _skill_data_cache.get(cache_key)
+        if local and await redis.hget(cache_key, "v") == local[0]:
+            return json.loads(local[1])
+        version, data = await redis.hmget(cache_key, "v", "d")
+        if version is not None:
+            _skill_data_cache[cache_key] = (version, data)
+            return json.loads(data)
+    except RedisError as e:
+        logger.warning(f"failed to read skill data cache {cache_key}: {e}")
+        record = await load()
+        return record.data if record else None
+
+    record = await load()
+    value = record.data if record else None
+    try:
+        version, data = await redis.eval(
+            _SKILL_DATA_SET_SCRIPT,
+            1,
+            cache_key,
+            str(XID()),
+            json.dumps(value),
+            "",
+            _cache_ttl(record.expires_at if record else None),
+        )
+    except RedisError as e:
+        logger.warning(f"failed to fill skill data cache {cache_key}: {e}")
+        return value
+    _skill_data_cache[cache_key] = (version, data)
+    # a write may have been cached since the load
+    return json.loads(data)
+
+
+async def _cache_put(entries: List[tuple[str, Any]]) -> None:
+    """Write saved skill data through to the cache.
+
+    Args:
+        entries: Redis key and saved record of the rows
+    """
+    redis = _skill_data_redis()
+    if not redis or not entries:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for cache_key, record in entries:
+                pipe.eval(
+                    _SKILL_DATA_SET_SCRIPT,
+                    1,
+                    cache_key,
+                    str(XID()),
+                    json.dumps(record.data),
+                    record.updated_at.astimezone(timezone.utc).isoformat(),
+                    _cache_ttl(record.expires_at),
+                )
+            results = await pipe.execute()
+        for (cache_key, _), (version, data) in zip(entries, results):
+            _skill_data_cache[cache_key] = (version, data)
+    except RedisError as e:
+        logger.warning(f"failed to write skill data cache: {e}")
+        await _cache_evict([cache_key for cache_key, _ in entries])
+
+
+async def _cache_evict(cache_keys: List[str]) -> None:
+    """Drop skill data from the cache, after it was deleted or a failed write.
+
+    Args:
+        cache_keys: Redis keys of the data
+    """
+    for cache_key in cache_keys:
+        _skill_data_cache.pop(cache_key)
+    redis = _skill_data_redis()
+    if not redis or not cache_keys:
+        return
+    try:
+        await redis.delete(*cache_keys)
+    except RedisError as e:
+        logger.warning(f"failed to evict skill data cache: {e}")
+
+
+def _upsert(table: type[Base], rows: List[Dict[str, Any]], key: Sequence[str]):
+    """Build an INSERT ... ON CONFLICT DO UPDATE ... RETURNING of skill data rows.
+
+    Rows with the same key are collapsed to the last one, PostgreSQL rejects a
+    statement updating the same row twice. They are sorted by key, so concurrent
+    upserts lock the rows in the same order.
+
+    Args:
+        table: AgentSkillDataTable or ThreadSkillDataTable
+        rows: Column values of the rows
+        key: Primary key columns
+
+    Returns:
+        The statement, returning the saved rows
+    """
+    unique = {tuple(row[k] for k in key): row for row in rows}
+    stmt = insert(table).values([unique[k] for k in sorted(unique)])
+    updates = {name: stmt.excluded[name] for name in rows[0] if name not in key}
+    # onupdate is not applied to ON CONFLICT DO UPDATE
+    updates["updated_at"] = datetime.now(timezone.utc)
+    return stmt.on_conflict_do_update(index_elements=key, set_=updates).returning(
+        table
+    )
+
+
+async def _delete_expired(
+    table: type[Base], key: Sequence[str], batch_size: int
+) -> int:
+    """Delete the expired rows of a skill data table, in batches.
+
+    The batches walk the primary key, each in its own short transaction, so
+    the deletion never holds many row locks or blocks the writers for long.
+
+    Args:
+        table: AgentSkillDataTable or ThreadSkillDataTable
+        key: Primary key columns
+        batch_size: Rows deleted in one transaction
+
+    Returns:
+        int: Number of rows deleted
+    """
+    columns = [getattr(table, k) for k in key]
+    after = None
+    deleted = 0
+    while True:
+        async with get_session() as db:
+            page = (
+                select(*columns)
+                .where(table.expires_at <= func.now())
+                .order_by(*columns)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            if after:
+                page = page.where(tuple_(*columns) > tuple_(*after))
+            keys = [tuple(row) for row in await db.execute(page)]
+            if not keys:
+                return deleted
+            await db.execute(delete(table).where(tuple_(*columns).in_(keys)))
+            await db.commit()
+        deleted += len(keys)
+        after = keys[-1]
 
 
 class AgentSkillDataTable(Base):
     """Database table model for storing skill-specific data for agents."""
 
     __tablename__ = "agent_skill_data"
+    __table_args__ = (
+        Index(
+            "ix_agent_skill_data_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+    )
 
     agent_id = Column(String, primary_key=True)
     skill = Column(String, primary_key=True)
     key = Column(String, primary_key=True)
     data = Column(JSONB, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(
         DateTime(timezone=True),
         nullable=False,
@@ -40,6 +286,13 @@ class AgentSkillDataCreate(BaseModel):
     skill: Annotated[str, Field(description="Name of the skill this data is for")]
     key: Annotated[str, Field(description="Key for this specific piece of data")]
     data: Annotated[Dict[str, Any], Field(description="JSON data stored for this key")]
+    expires_at: Annotated[
+        Optional[datetime],
+        Field(
+            default=None,
+            description="When this data expires, it is kept until deleted if not set",
+        ),
+    ]
 
     async def save(self) -> "AgentSkillData":
         """Save or update skill data.
@@ -47,25 +300,36 @@ class AgentSkillDataCreate(BaseModel):
         Returns:
             AgentSkillData: The saved agent skill data instance
         """
+        return (await self.save_many([self]))[0]
+
+    @staticmethod
+    async def save_many(
+        items: List["AgentSkillDataCreate"],
+    ) -> List["AgentSkillData"]:
+        """Save or update several skill data records in one statement.
+
+        Args:
+            items: Records to save, the last one wins for a repeated key
+
+        Returns:
+            List[AgentSkillData]: The saved records
+        """
+        if not items:
+            return []
         async with get_session() as db:
-            record = await db.scalar(
-                select(AgentSkillDataTable).where(
-                    AgentSkillDataTable.agent_id == self.agent_id,
-                    AgentSkillDataTable.skill == self.skill,
-                    AgentSkillDataTable.key == self.key,
+            records = await db.scalars(
+                _upsert(
+                    AgentSkillDataTable,
+                    [item.model_dump() for item in items],
+                    ("agent_id", "skill", "key"),
                 )
             )
-
-            if record:
-                # Update existing record
-                record.data = self.data
-            else:
-                # Create new record
-                record = AgentSkillDataTable(**self.model_dump())
-            db.add(record)
+            result = [AgentSkillData.model_validate(r) for r in records]
             await db.commit()
-            await db.refresh(record)
-            return AgentSkillData.model_validate(record)
+        await _cache_put(
+            [(_agent_cache_key(r.agent_id, r.skill, r.key), r) for r in result]
+        )
+        return result
 
 
 class AgentSkillData(AgentSkillDataCreate):
@@ -99,15 +363,19 @@ class AgentSkillData(AgentSkillDataCreate):
         Returns:
             Dictionary containing the skill data if found, None otherwise
         """
-        async with get_session() as db:
-            result = await db.scalar(
-                select(AgentSkillDataTable).where(
-                    AgentSkillDataTable.agent_id == agent_id,
-                    AgentSkillDataTable.skill == skill,
-                    AgentSkillDataTable.key == key,
+
+        async def load() -> Optional[AgentSkillDataTable]:
+            async with get_session() as db:
+                return await db.scalar(
+                    select(AgentSkillDataTable).where(
+                        AgentSkillDataTable.agent_id == agent_id,
+                        AgentSkillDataTable.skill == skill,
+                        AgentSkillDataTable.key == key,
+                        _live(AgentSkillDataTable),
+                    )
                 )
-            )
-            return result.data if result else None
+
+        return await _cached_get(_agent_cache_key(agent_id, skill, key), load)
 
     @classmethod
     async def clean_data(cls, agent_id: str):
@@ -117,24 +385,72 @@ class AgentSkillData(AgentSkillDataCreate):
             agent_id: ID of the agent
         """
         async with get_session() as db:
-            await db.execute(
-                delete(AgentSkillDataTable).where(
-                    AgentSkillDataTable.agent_id == agent_id
+            deleted = await db.execute(
+                delete(AgentSkillDataTable)
+                .where(AgentSkillDataTable.agent_id == agent_id)
+                .returning(AgentSkillDataTable.skill, AgentSkillDataTable.key)
+            )
+            cache_keys = [_agent_cache_key(agent_id, *row) for row in deleted]
+            await db.commit()
+        await _cache_evict(cache_keys)
+
+    @classmethod
+    async def expire_key(cls, key: str) -> int:
+        """Expire the skill data of a key of all agents, for data no longer read.
+
+        The rows are deleted by delete_expired, in batches.
+
+        Args:
+            key: Data key
+
+        Returns:
+            int: Number of rows expired
+        """
+        async with get_session() as db:
+            result = await db.execute(
+                update(AgentSkillDataTable)
+                .where(
+                    AgentSkillDataTable.key == key,
+                    AgentSkillDataTable.expires_at.is_(None),
                 )
+                .values(expires_at=func.now())
             )
             await db.commit()
+        return result.rowcount
+
+    @classmethod
+    async def delete_expired(cls, batch_size: int = SKILL_DATA_GC_BATCH) -> int:
+        """Delete the expired skill data of all agents.
+
+        Args:
+            batch_size: Rows deleted in one transaction
+
+        Returns:
+            int: Number of rows deleted
+        """
+        return await _delete_expired(
+            AgentSkillDataTable, ("agent_id", "skill", "key"), batch_size
+        )
 
 
 class ThreadSkillDataTable(Base):
     """Database table model for storing skill-specific data for threads."""
 
     __tablename__ = "thread_skill_data"
+    __table_args__ = (
+        Index(
+            "ix_thread_skill_data_expires_at",
+            "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+        ),
+    )
 
     thread_id = Column(String, primary_key=True)
     skill = Column(String, primary_key=True)
     key = Column(String, primary_key=True)
     agent_id = Column(String, nullable=False)
     data = Column(JSONB, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(
         DateTime(timezone=True),
         nullable=False,
@@ -160,6 +476,13 @@ class ThreadSkillDataCreate(BaseModel):
     key: Annotated[str, Field(description="Key for this specific piece of data")]
     agent_id: Annotated[str, Field(description="ID of the agent that owns this thread")]
     data: Annotated[Dict[str, Any], Field(description="JSON data stored for this key")]
+    expires_at: Annotated[
+        Optional[datetime],
+        Field(
+            default=None,
+            description="When this data expires, it is kept until deleted if not set",
+        ),
+    ]
 
     async def save(self) -> "ThreadSkillData":
         """Save or update skill data.
@@ -167,26 +490,36 @@ class ThreadSkillDataCreate(BaseModel):
         Returns:
             ThreadSkillData: The saved thread skill data instance
         """
+        return (await self.save_many([self]))[0]
+
+    @staticmethod
+    async def save_many(
+        items: List["ThreadSkillDataCreate"],
+    ) -> List["ThreadSkillData"]:
+        """Save or update several skill data records in one statement.
+
+        Args:
+            items: Records to save, the last one wins for a repeated key
+
+        Returns:
+            List[ThreadSkillData]: The saved records
+        """
+        if not items:
+            return []
         async with get_session() as db:
-            record = await db.scalar(
-                select(ThreadSkillDataTable).where(
-                    ThreadSkillDataTable.thread_id == self.thread_id,
-                    ThreadSkillDataTable.skill == self.skill,
-                    ThreadSkillDataTable.key == self.key,
+            records = await db.scalars(
+                _upsert(
+                    ThreadSkillDataTable,
+                    [item.model_dump() for item in items],
+                    ("thread_id", "skill", "key"),
                 )
             )
-
-            if record:
-                # Update existing record
-                record.data = self.data
-                record.agent_id = self.agent_id
-            else:
-                # Create new record
-                record = ThreadSkillDataTable(**self.model_dump())
-            db.add(record)
+            result = [ThreadSkillData.model_validate(r) for r in records]
             await db.commit()
-            await db.refresh(record)
-            return ThreadSkillData.model_validate(record)
+        await _cache_put(
+            [(_thread_cache_key(r.thread_id, r.skill, r.key), r) for r in result]
+        )
+        return result
 
 
 class ThreadSkillData(ThreadSkillDataCreate):
@@ -221,15 +554,19 @@ class ThreadSkillData(ThreadSkillDataCreate):
         Returns:
             Dictionary containing the skill data if found, None otherwise
         """
-        async with get_session() as db:
-            record = await db.scalar(
-                select(ThreadSkillDataTable).where(
-                    ThreadSkillDataTable.thread_id == thread_id,
-                    ThreadSkillDataTable.skill == skill,
-                    ThreadSkillDataTable.key == key,
+
+        async def load() -> Optional[ThreadSkillDataTable]:
+            async with get_session() as db:
+                return await db.scalar(
+                    select(ThreadSkillDataTable).where(
+                        ThreadSkillDataTable.thread_id == thread_id,
+                        ThreadSkillDataTable.skill == skill,
+                        ThreadSkillDataTable.key == key,
+                        _live(ThreadSkillDataTable),
+                    )
                 )
-            )
-        return record.data if record else None
+
+        return await _cached_get(_thread_cache_key(thread_id, skill, key), load)
 
     @classmethod
     async def clean_data(
@@ -252,16 +589,35 @@ class ThreadSkillData(ThreadSkillDataCreate):
         """
         async with get_session() as db:
             if thread_id and thread_id != "":
-                await db.execute(
-                    delete(ThreadSkillDataTable).where(
-                        ThreadSkillDataTable.agent_id == agent_id,
-                        ThreadSkillDataTable.thread_id == thread_id,
-                    )
+                stmt = delete(ThreadSkillDataTable).where(
+                    ThreadSkillDataTable.agent_id == agent_id,
+                    ThreadSkillDataTable.thread_id == thread_id,
                 )
             else:
-                await db.execute(
-                    delete(ThreadSkillDataTable).where(
-                        ThreadSkillDataTable.agent_id == agent_id
-                    )
+                stmt = delete(ThreadSkillDataTable).where(
+                    ThreadSkillDataTable.agent_id == agent_id
+                )
+            deleted = await db.execute(
+                stmt.returning(
+                    ThreadSkillDataTable.thread_id,
+                    ThreadSkillDataTable.skill,
+                    ThreadSkillDataTable.key,
                 )
+            )
+            cache_keys = [_thread_cache_key(*row) for row in deleted]
             await db.commit()
+        await _cache_evict(cache_keys)
+
+    @classmethod
+    async def delete_expired(cls, batch_size: int = SKILL_DATA_GC_BATCH) -> int:
+        """Delete the expired skill data of all threads.
+
+        Args:
+            batch_size: Rows deleted in one transaction
+
+        Returns:
+            int: Number of rows deleted
+        """
+        return await _delete_expired(
+            ThreadSkillDataTable, ("thread_id", "skill", "key"), batch_size
+        )
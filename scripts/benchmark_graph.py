@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Benchmark agent graph creation with and without the shared graph template.
+
+Creates synthetic agents, each with its own fake chat model and tools, and reports
+the total init time and the peak RSS. The "compile" mode clears the template cache
+before every agent, which is what creating an agent cost before the templates.
+Every mode runs in its own process so the RSS numbers don't affect each other.
+
+Usage:
+  python scripts/benchmark_graph.py [--agents 1000] [--tools 10]
+"""
+
+import argparse
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Root directory of the project
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+
+def run(mode: str, agents: int, tools: int) -> None:
+    from langchain_core.language_models.fake_chat_models import (
+        FakeMessagesListChatModel,
+    )
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import StructuredTool
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from app.core import graph
+
+    class FakeToolChatModel(FakeMessagesListChatModel):
+        def bind_tools(self, tools, **kwargs):
+            return self.bind(tools=[t.name for t in tools], **kwargs)
+
+    checkpointer = MemorySaver()
+    executors = []
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    elapsed = 0.0
+    for i in range(agents):
+        if mode == "compile":
+            graph._graph_templates.clear()
+        model = FakeToolChatModel(responses=[AIMessage(content=f"agent {i}")])
+        agent_tools = [
+            StructuredTool.from_function(
+                func=lambda query: query,
+                name=f"tool_{j}",
+                description=f"Synthetic tool {j} of agent {i}",
+            )
+            for j in random.sample(range(tools * 3), tools)
+        ]
+        # only the graph creation is timed, the tools are built by the skills
+        start = time.perf_counter()
+        executors.append(
+            graph.create_agent(
+                f"agent-{i}",
+                model,
+                tools=agent_tools,
+                checkpointer=checkpointer,
+                state_modifier=f"You are synthetic agent {i}.",
+            )
+        )
+        elapsed += time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux
+    print(
+        f"{mode:>8}: {agents} agents in {elapsed:.2f}s "
+        f"({elapsed / agents * 1000:.2f} ms/agent), "
+        f"peak RSS +{(rss_after - rss_before) / 1024:.1f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--tools", type=int, default=10)
+    parser.add_argument("--mode", choices=["compile", "template"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.agents, args.tools)
+        return
+
+    for mode in ("compile", "template"):
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--mode",
+                mode,
+                "--agents",
+                str(args.agents),
+                "--tools",
+                str(args.tools),
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmark the token accounting of the default memory manager.
+
+Runs the memory manager on synthetic histories, the way it runs after every agent
+turn, and reports the time per turn:
+  - cold: token counts are not memoized, roughly what every turn cost before
+  - cached: token counts are memoized by message id
+  - reported: the last AI message carries the provider usage metadata
+
+In the cold and cached modes the token limit is just under the history size, so
+every turn trims.
+
+Usage:
+  python scripts/benchmark_memory.py [--turns 20]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Root directory of the project
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+
+def history(size: int, reported: bool) -> list:
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    messages = []
+    for i in range(size):
+        text = f"message {i} " + "lorem ipsum dolor sit amet " * 20
+        if i % 4 == 0:
+            messages.append(HumanMessage(id=f"h{i}", content=text))
+        elif i % 4 == 1:
+            messages.append(
+                AIMessage(
+                    id=f"a{i}",
+                    content="",
+                    tool_calls=[
+                        {"name": "search", "args": {"query": text}, "id": f"c{i}"}
+                    ],
+                )
+            )
+        elif i % 4 == 2:
+            messages.append(ToolMessage(id=f"t{i}", content=text, tool_call_id=f"c{i}"))
+        else:
+            messages.append(AIMessage(id=f"a{i}", content=text))
+    if reported:
+        messages.append(
+            AIMessage(
+                id="last",
+                content="done",
+                usage_metadata={
+                    "input_tokens": 1000,
+                    "output_tokens": 10,
+                    "total_tokens": 1010,
+                },
+            )
+        )
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    from app.core import graph
+
+    try:
+        graph._get_encoder()
+    except Exception as e:
+        # tiktoken downloads its encodings, use a rough stand-in when offline
+        print(f"tiktoken unavailable ({type(e).__name__}), using a word encoder")
+
+        class WordEncoder:
+            def encode(self, text: str) -> list[str]:
+                return text.split()
+
+        graph._TIKTOKEN_CACHE["gpt-4"] = WordEncoder()
+
+    for size in (10, 100, 1000):
+        total = graph._count_tokens(history(size, False))
+        for mode in ("cold", "cached", "reported"):
+            messages = history(size, mode == "reported")
+            if mode == "reported":
+                # the provider says the last prompt was small, no trim needed
+                limit = 2 * (total + 2000)
+            else:
+                limit = 2 * int(total * 0.9)
+            manager = graph._default_memory_manager(limit)
+            graph._token_counts.clear()
+            manager({"messages": list(messages)})
+            elapsed = 0.0
+            for _ in range(args.turns):
+                if mode == "cold":
+                    graph._token_counts.clear()
+                start = time.perf_counter()
+                manager({"messages": list(messages)})
+                elapsed += time.perf_counter() - start
+            print(
+                f"{size:>5} messages {mode:>8}: "
+                f"{elapsed / args.turns * 1000:8.3f} ms/turn"
+            )
+
+
+if __name__ == "__main__":
+    main()
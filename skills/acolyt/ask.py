@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field
 from typing_extensions import Literal
 
 from skills.acolyt.base import AcolytBaseTool
+from utils.http import http_client
 
 from .base import base_url
 
@@ -96,7 +97,7 @@ class AcolytAskGpt(AcolytBaseTool):
             messages=[InputMessage(content=question)],
         ).model_dump(exclude_none=True)
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.post(
                     url, headers=headers, timeout=30, json=body
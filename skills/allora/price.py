@@ -6,6 +6,7 @@ from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.allora.base import AlloraBaseTool
+from utils.http import http_client
 
 from .base import base_url
 
@@ -109,7 +110,7 @@ class AlloraGetPrice(AlloraBaseTool):
             "x-api-key": api_key,
         }
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(url, headers=headers, timeout=30)
                 response.raise_for_status()
@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import Any, Callable, Dict, Literal, NotRequired, Optional, TypedDict, Union
 
 from langchain_core.runnables import RunnableConfig
@@ -15,9 +16,81 @@ from abstracts.exception import RateLimitExceeded
 from abstracts.skill import SkillStoreABC
 from models.agent import Agent
 from models.redis import get_redis
+from utils.cache import BoundedCache
 
 SkillState = Literal["disabled", "public", "private"]
 
+logger = logging.getLogger(__name__)
+
+# Token buckets of the skill rate limits. A bucket holds up to limit tokens and
+# refills at limit tokens per window, each call takes one.
+_RATE_LIMIT_KEY = "intentkit:rate_limit:"
+
+# KEYS: bucket
+# ARGV: capacity, tokens refilled per second
+# The time is the Redis server time, the same for all workers.
+_TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+return allowed
+"""
+
+# Buckets of this process, used when Redis is not available: tokens and time
+_local_buckets: BoundedCache[str, tuple[float, float]] = BoundedCache(max_size=10000)
+
+
+def _take_local_token(key: str, capacity: int, rate: float) -> bool:
+    """Take a token from a bucket of this process."""
+    now = time.monotonic()
+    tokens, ts = _local_buckets.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - ts) * rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    _local_buckets[key] = (tokens, now)
+    return allowed
+
+
+async def take_token(key: str, limit: int, seconds: float) -> bool:
+    """Take a token from a rate limit bucket, in one round trip to Redis.
+
+    Without Redis, or when it fails, the bucket of this process is used, so the
+    limit is per worker then.
+
+    Args:
+        key: The bucket, including the scope, e.g. agent:twitter_post_tweet:<id>
+        limit: Maximum number of calls in the window, also the burst size
+        seconds: The window
+
+    Returns:
+        bool: True if the call is allowed, False if over the limit
+    """
+    rate = limit / seconds
+    try:
+        redis = get_redis()
+        allowed = await redis.eval(
+            _TAKE_TOKEN_SCRIPT, 1, _RATE_LIMIT_KEY + key, limit, rate
+        )
+        return bool(allowed)
+    except RuntimeError:
+        pass
+    except RedisError as e:
+        logger.warning(f"Redis error in rate limiting of {key}, limiting locally: {e}")
+    return _take_local_token(key, limit, rate)
+
 
 class SkillConfig(TypedDict):
     """Abstract base class for skill configuration."""
@@ -60,6 +133,40 @@ class IntentKitSkill(BaseTool):
         """Get the category of the skill."""
         raise NotImplementedError
 
+    async def rate_limit(
+        self, scope: str, scope_id: str, limit: int, minutes: int, key: str
+    ) -> None:
+        """Check if a scope has exceeded the rate limit for a key.
+
+        Args:
+            scope: What is limited, e.g. "agent" or "user"
+            scope_id: The ID of the agent or user
+            limit: Maximum number of requests allowed
+            minutes: Time window in minutes
+            key: The key to use for rate limiting (e.g., skill name or category)
+
+        Raises:
+            RateLimitExceeded: If the rate limit has been exceeded
+        """
+        if not await take_token(f"{scope}:{key}:{scope_id}", limit, minutes * 60):
+            raise RateLimitExceeded(f"Rate limit exceeded for {key}")
+
+    async def agent_rate_limit(
+        self, agent_id: str, limit: int, minutes: int, key: str
+    ) -> None:
+        """Check if an agent has exceeded the rate limit for this skill.
+
+        Args:
+            agent_id: The ID of the agent to check
+            limit: Maximum number of requests allowed
+            minutes: Time window in minutes
+            key: The key to use for rate limiting (e.g., skill name or category)
+
+        Raises:
+            RateLimitExceeded: If the agent has exceeded the rate limit
+        """
+        await self.rate_limit("agent", agent_id, limit, minutes, key)
+
     async def user_rate_limit(
         self, user_id: str, limit: int, minutes: int, key: str
     ) -> None:
@@ -79,37 +186,7 @@ class IntentKitSkill(BaseTool):
         """
         if not user_id:
             return None  # No rate limiting for users without ID
-
-        try:
-            redis = get_redis()
-            # Create a unique key for this rate limit and user
-            rate_limit_key = f"rate_limit:{key}:{user_id}"
-
-            # Get the current count
-            count = await redis.incr(rate_limit_key)
-
-            # Set expiration if this is the first request
-            if count == 1:
-                await redis.expire(
-                    rate_limit_key, minutes * 60
-                )  # Convert minutes to seconds
-
-            # Check if user has exceeded the limit
-            if count > limit:
-                raise RateLimitExceeded(f"Rate limit exceeded for {key}")
-
-            return None
-
-        except RuntimeError:
-            # Redis client not initialized, log and allow the request
-            self.logger.info(f"Redis not initialized, skipping rate limit for {key}")
-            return None
-        except RedisError as e:
-            # Redis error, log and allow the request
-            self.logger.info(
-                f"Redis error in rate limiting: {e}, skipping rate limit for {key}"
-            )
-            return None
+        await self.rate_limit("user", user_id, limit, minutes, key)
 
     async def user_rate_limit_by_skill(
         self, user_id: str, limit: int, minutes: int
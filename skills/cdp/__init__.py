@@ -1,5 +1,6 @@
 """CDP wallet interaction skills."""
 
+from importlib.metadata import version
 from typing import TypedDict
 
 from coinbase_agentkit import (
@@ -19,12 +20,14 @@ from coinbase_agentkit import (
 )
 from coinbase_agentkit.action_providers.erc721 import erc721_action_provider
 from coinbase_agentkit_langchain import get_langchain_tools
+from langchain_core.tools import BaseTool
 
 from abstracts.skill import SkillStoreABC
 from clients import CdpClient, get_cdp_client
 from skills.base import SkillConfig, SkillState
 from skills.cdp.base import CDPBaseTool
 from skills.cdp.get_balance import GetBalance
+from skills.lazy import lazy_tools
 
 # Cache skills at the system level, because they are stateless
 _cache: dict[str, CDPBaseTool] = {}
@@ -95,35 +98,49 @@ async def get_skills(
         elif state == "public" or (state == "private" and is_private):
             available_skills.append(skill_name)
 
-    # Initialize CDP client
+    # The wallet is only fetched from CDP when a tool is called
     cdp_client: CdpClient = await get_cdp_client(agent_id, store)
-    cdp_wallet_provider: CdpWalletProvider = await cdp_client.get_wallet_provider()
-    cdp_provider_config = await cdp_client.get_provider_config()
-    agent_kit = AgentKit(
-        AgentKitConfig(
-            wallet_provider=cdp_wallet_provider,
-            action_providers=[
-                wallet_action_provider(),
-                cdp_api_action_provider(cdp_provider_config),
-                cdp_wallet_action_provider(cdp_provider_config),
-                pyth_action_provider(),
-                basename_action_provider(),
-                erc20_action_provider(),
-                erc721_action_provider(),
-                weth_action_provider(),
-                morpho_action_provider(),
-                superfluid_action_provider(),
-                wow_action_provider(),
-            ],
+    agent = await store.get_agent_config(agent_id)
+    network_id = agent.network_id or agent.cdp_network_id
+
+    async def build() -> list[BaseTool]:
+        cdp_wallet_provider: CdpWalletProvider = (
+            await cdp_client.get_wallet_provider()
+        )
+        cdp_provider_config = await cdp_client.get_provider_config()
+        agent_kit = AgentKit(
+            AgentKitConfig(
+                wallet_provider=cdp_wallet_provider,
+                action_providers=[
+                    wallet_action_provider(),
+                    cdp_api_action_provider(cdp_provider_config),
+                    cdp_wallet_action_provider(cdp_provider_config),
+                    pyth_action_provider(),
+                    basename_action_provider(),
+                    erc20_action_provider(),
+                    erc721_action_provider(),
+                    weth_action_provider(),
+                    morpho_action_provider(),
+                    superfluid_action_provider(),
+                    wow_action_provider(),
+                ],
+            )
         )
+        cdp_tools = get_langchain_tools(agent_kit)
+        for tool in cdp_tools:
+            tool.handle_tool_error = lambda e: f"tool error: {e}"
+            tool.handle_validation_error = lambda e: f"validation error: {e}"
+        return cdp_tools
+
+    # supported actions depend on the network
+    cdp_tools = await lazy_tools(
+        ("cdp", version("coinbase-agentkit"), network_id), build
     )
-    cdp_tools = get_langchain_tools(agent_kit)
     tools = []
     for skill in available_skills:
         if skill == "get_balance":
             tools.append(
                 GetBalance(
-                    wallet=cdp_wallet_provider._wallet,
                     agent_id=agent_id,
                     skill_store=store,
                 )
@@ -131,7 +148,5 @@ async def get_skills(
             continue
         for tool in cdp_tools:
             if tool.name.endswith(skill):
-                tool.handle_tool_error = lambda e: f"tool error: {e}"
-                tool.handle_validation_error = lambda e: f"validation error: {e}"
                 tools.append(tool)
     return tools
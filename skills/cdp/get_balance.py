@@ -4,6 +4,7 @@ from cdp import Wallet
 from pydantic import BaseModel, Field
 
 from abstracts.skill import SkillStoreABC
+from clients import get_cdp_client
 from skills.cdp.base import CDPBaseTool
 
 
@@ -28,6 +29,7 @@ class GetBalance(CDPBaseTool):
 
     agent_id: str
     skill_store: SkillStoreABC
+    # fetched from the agent's CDP client on first use if not given
     wallet: Wallet | None = None
 
     name: str = "cdp_get_balance"
@@ -48,6 +50,9 @@ class GetBalance(CDPBaseTool):
             str: A message containing the balance information or error message.
         """
         try:
+            if not self.wallet:
+                cdp_client = await get_cdp_client(self.agent_id, self.skill_store)
+                self.wallet = await cdp_client.get_wallet()
             if not self.wallet:
                 return "Failed to get wallet."
 
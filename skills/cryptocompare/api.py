@@ -3,9 +3,10 @@
 import time
 from typing import List
 
-import httpx
 from pydantic import BaseModel, Field
 
+from utils.http import http_client
+
 CRYPTO_COMPARE_BASE_URL = "https://min-api.cryptocompare.com"
 
 
@@ -77,7 +78,7 @@ async def fetch_price(api_key: str, from_symbol: str, to_symbols: List[str]) ->
     url = f"{CRYPTO_COMPARE_BASE_URL}/data/price"
     headers = {"Accept": "application/json", "Authorization": f"Bearer {api_key}"}
     params = {"fsym": from_symbol.upper(), "tsyms": ",".join(to_symbols)}
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params, headers=headers)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -91,7 +92,7 @@ async def fetch_trading_signals(api_key: str, from_symbol: str) -> dict:
     url = f"{CRYPTO_COMPARE_BASE_URL}/data/tradingsignals/intotheblock/latest"
     headers = {"Accept": "application/json", "Authorization": f"Bearer {api_key}"}
     params = {"fsym": from_symbol.upper()}
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params, headers=headers)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -107,7 +108,7 @@ async def fetch_top_market_cap(
     url = f"{CRYPTO_COMPARE_BASE_URL}/data/top/mktcapfull"
     headers = {"Accept": "application/json", "Authorization": f"Bearer {api_key}"}
     params = {"limit": limit, "tsym": to_symbol.upper()}
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params, headers=headers)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -123,7 +124,7 @@ async def fetch_top_exchanges(
     url = f"{CRYPTO_COMPARE_BASE_URL}/data/top/exchanges"
     headers = {"Accept": "application/json", "Authorization": f"Bearer {api_key}"}
     params = {"fsym": from_symbol.upper(), "tsym": to_symbol.upper()}
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params, headers=headers)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -137,7 +138,7 @@ async def fetch_top_volume(api_key: str, limit: int, to_symbol: str = "USD") ->
     url = f"{CRYPTO_COMPARE_BASE_URL}/data/top/totalvolfull"
     headers = {"Accept": "application/json", "Authorization": f"Bearer {api_key}"}
     params = {"limit": limit, "tsym": to_symbol.upper()}
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params, headers=headers)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -152,7 +153,7 @@ async def fetch_news(api_key: str, token: str, timestamp: int = None) -> dict:
         timestamp = int(time.time())
     url = f"{CRYPTO_COMPARE_BASE_URL}/data/v2/news/?lang=EN&lTs={timestamp}&categories={token}&sign=true"
     headers = {"Accept": "application/json", "Authorization": f"Bearer {api_key}"}
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, headers=headers)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -1,15 +1,13 @@
 """Base class for all CryptoCompare tools."""
 
 import logging
-from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Type
 
-import httpx
 from pydantic import BaseModel, Field
 
-from abstracts.exception import RateLimitExceeded
 from abstracts.skill import SkillStoreABC
 from skills.base import IntentKitSkill
+from utils.http import http_client
 
 CRYPTO_COMPARE_BASE_URL = "https://min-api.cryptocompare.com"
 
@@ -49,37 +47,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
         Raises:
             RateLimitExceeded: If the rate limit has been exceeded.
         """
-        rate_limit = await self.skill_store.get_agent_skill_data(
-            agent_id, self.name, "rate_limit"
-        )
-
-        current_time = datetime.now(tz=timezone.utc)
-
-        if (
-            rate_limit
-            and rate_limit.get("reset_time")
-            and rate_limit["count"] is not None
-            and datetime.fromisoformat(rate_limit["reset_time"]) > current_time
-        ):
-            if rate_limit["count"] >= max_requests:
-                raise RateLimitExceeded("Rate limit exceeded")
-
-            rate_limit["count"] += 1
-            await self.skill_store.save_agent_skill_data(
-                agent_id, self.name, "rate_limit", rate_limit
-            )
-
-            return
-
-        # If no rate limit exists or it has expired, create a new one
-        new_rate_limit = {
-            "count": 1,
-            "reset_time": (current_time + timedelta(minutes=interval)).isoformat(),
-        }
-        await self.skill_store.save_agent_skill_data(
-            agent_id, self.name, "rate_limit", new_rate_limit
-        )
-        return
+        await self.agent_rate_limit(agent_id, max_requests, interval, self.name)
 
     async def fetch_price(
         self, api_key: str, from_symbol: str, to_symbols: List[str]
@@ -109,7 +77,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
             "fsym": from_symbol.upper(),
             "tsyms": ",".join([s.upper() for s in to_symbols]),
         }
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, headers=headers)
         if response.status_code != 200:
             logger.error(f"API returned status code {response.status_code}")
@@ -134,7 +102,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
             from_symbol = from_symbol[0] if from_symbol else ""
 
         params = {"fsym": from_symbol.upper()}
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, headers=headers)
         if response.status_code != 200:
             logger.error(f"API returned status code {response.status_code}")
@@ -162,7 +130,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
             to_symbol = to_symbol[0] if to_symbol else "USD"
 
         params = {"limit": limit, "tsym": to_symbol.upper()}
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, headers=headers)
         if response.status_code != 200:
             logger.error(f"API returned status code {response.status_code}")
@@ -192,7 +160,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
             to_symbol = to_symbol[0] if to_symbol else "USD"
 
         params = {"fsym": from_symbol.upper(), "tsym": to_symbol.upper()}
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, headers=headers)
         if response.status_code != 200:
             logger.error(f"API returned status code {response.status_code}")
@@ -220,7 +188,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
             to_symbol = to_symbol[0] if to_symbol else "USD"
 
         params = {"limit": limit, "tsym": to_symbol.upper()}
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, headers=headers)
         if response.status_code != 200:
             logger.error(f"API returned status code {response.status_code}")
@@ -249,7 +217,7 @@ class CryptoCompareBaseTool(IntentKitSkill):
         if timestamp:
             params["lTs"] = timestamp
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, headers=headers)
         if response.status_code != 200:
             logger.error(f"API returned status code {response.status_code}")
@@ -1,10 +1,11 @@
 import asyncio
 from typing import List, Literal, Type
 
-import httpx
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+from utils.http import http_client
+
 from .base import CryptopanicBaseTool, base_url
 
 FILTERS = ["rising", "hot", "bullish", "bearish", "important", "saved", "lol"]
@@ -48,7 +49,7 @@ class FetchCryptoNews(CryptopanicBaseTool):
         if currency.lower() != "all":
             params["currencies"] = currency.upper()
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()["results"]
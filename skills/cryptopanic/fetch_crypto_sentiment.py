@@ -1,9 +1,10 @@
 from typing import ClassVar, List, Type
 
-import httpx
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+from utils.http import http_client
+
 from .base import CryptopanicBaseTool, base_url
 
 
@@ -35,7 +36,7 @@ class FetchCryptoSentiment(CryptopanicBaseTool):
             "currencies": currency.upper(),
         }
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()["results"]
@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-import httpx
+from utils.http import http_client
 
 DEFILLAMA_TVL_BASE_URL = "https://api.llama.fi"
 DEFILLAMA_COINS_BASE_URL = "https://coins.llama.fi"
@@ -17,7 +17,7 @@ DEFILLAMA_FEES_BASE_URL = "https://api.llama.fi"
 async def fetch_protocols() -> dict:
     """List all protocols on defillama along with their TVL."""
     url = f"{DEFILLAMA_TVL_BASE_URL}/protocols"
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -27,7 +27,7 @@ async def fetch_protocols() -> dict:
 async def fetch_protocol(protocol: str) -> dict:
     """Get historical TVL of a protocol and breakdowns by token and chain."""
     url = f"{DEFILLAMA_TVL_BASE_URL}/protocol/{protocol}"
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -37,7 +37,7 @@ async def fetch_protocol(protocol: str) -> dict:
 async def fetch_historical_tvl() -> dict:
     """Get historical TVL of DeFi on all chains."""
     url = f"{DEFILLAMA_TVL_BASE_URL}/v2/historicalChainTvl"
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -47,7 +47,7 @@ async def fetch_historical_tvl() -> dict:
 async def fetch_chain_historical_tvl(chain: str) -> dict:
     """Get historical TVL of a specific chain."""
     url = f"{DEFILLAMA_TVL_BASE_URL}/v2/historicalChainTvl/{chain}"
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -57,7 +57,7 @@ async def fetch_chain_historical_tvl(chain: str) -> dict:
 async def fetch_protocol_current_tvl(protocol: str) -> dict:
     """Get current TVL of a protocol."""
     url = f"{DEFILLAMA_TVL_BASE_URL}/tvl/{protocol}"
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -67,7 +67,7 @@ async def fetch_protocol_current_tvl(protocol: str) -> dict:
 async def fetch_chains() -> dict:
     """Get current TVL of all chains."""
     url = f"{DEFILLAMA_TVL_BASE_URL}/v2/chains"
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -80,7 +80,7 @@ async def fetch_current_prices(coins: List[str]) -> dict:
     coins_str = ",".join(coins)
     url = f"{DEFILLAMA_COINS_BASE_URL}/prices/current/{coins_str}?searchWidth=4h"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -92,7 +92,7 @@ async def fetch_historical_prices(timestamp: int, coins: List[str]) -> dict:
     coins_str = ",".join(coins)
     url = f"{DEFILLAMA_COINS_BASE_URL}/prices/historical/{timestamp}/{coins_str}?searchWidth=4h"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -103,7 +103,7 @@ async def fetch_batch_historical_prices(coins_timestamps: dict) -> dict:
     """Get historical prices for multiple tokens at multiple timestamps."""
     url = f"{DEFILLAMA_COINS_BASE_URL}/batchHistorical"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(
             url, params={"coins": coins_timestamps, "searchWidth": "600"}
         )
@@ -120,7 +120,7 @@ async def fetch_price_chart(coins: List[str]) -> dict:
     url = f"{DEFILLAMA_COINS_BASE_URL}/chart/{coins_str}"
     params = {"start": start_time, "span": 10, "period": "2d", "searchWidth": "600"}
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -135,7 +135,7 @@ async def fetch_price_percentage(coins: List[str]) -> dict:
     url = f"{DEFILLAMA_COINS_BASE_URL}/percentage/{coins_str}"
     params = {"timestamp": current_timestamp, "lookForward": "false", "period": "24h"}
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -147,7 +147,7 @@ async def fetch_first_price(coins: List[str]) -> dict:
     coins_str = ",".join(coins)
     url = f"{DEFILLAMA_COINS_BASE_URL}/prices/first/{coins_str}"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -159,7 +159,7 @@ async def fetch_block(chain: str) -> dict:
     current_timestamp = int(datetime.now().timestamp())
     url = f"{DEFILLAMA_COINS_BASE_URL}/block/{chain}/{current_timestamp}"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -172,7 +172,7 @@ async def fetch_stablecoins() -> dict:
     url = f"{DEFILLAMA_STABLECOINS_BASE_URL}/stablecoins"
     params = {"includePrices": "true"}
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -189,7 +189,7 @@ async def fetch_stablecoin_charts(
     endpoint = f"/{chain}" if chain else "/all"
     url = f"{base_url}{endpoint}?stablecoin={stablecoin_id}"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -200,7 +200,7 @@ async def fetch_stablecoin_chains() -> dict:
     """Get stablecoin distribution data across all chains."""
     url = f"{DEFILLAMA_STABLECOINS_BASE_URL}/stablecoinchains"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -215,7 +215,7 @@ async def fetch_stablecoin_prices() -> dict:
     """
     url = f"{DEFILLAMA_STABLECOINS_BASE_URL}/stablecoinprices"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -227,7 +227,7 @@ async def fetch_pools() -> dict:
     """Get comprehensive data for all yield-generating pools."""
     url = f"{DEFILLAMA_YIELDS_BASE_URL}/pools"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -238,7 +238,7 @@ async def fetch_pool_chart(pool_id: str) -> dict:
     """Get historical chart data for a specific pool."""
     url = f"{DEFILLAMA_YIELDS_BASE_URL}/chart/{pool_id}"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -255,7 +255,7 @@ async def fetch_dex_overview() -> dict:
         "dataType": "dailyVolume",
     }
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -271,7 +271,7 @@ async def fetch_dex_summary(protocol: str) -> dict:
         "dataType": "dailyVolume",
     }
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -287,7 +287,7 @@ async def fetch_options_overview() -> dict:
         "dataType": "dailyPremiumVolume",
     }
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -308,7 +308,7 @@ async def fetch_fees_overview() -> dict:
         "dataType": "dailyFees",
     }
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         response = await client.get(url, params=params)
     if response.status_code != 200:
         return {"error": f"API returned status code {response.status_code}"}
@@ -63,13 +63,13 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
         # Stop the patcher after each test
         self.datetime_patcher.stop()
 
-    # Helper method to patch httpx.AsyncClient and set up the dummy client.
+    # Helper method to patch the shared http client and set up the dummy client.
     async def _run_with_dummy(
         self, func, expected_url, dummy_response, *args, expected_kwargs=None
     ):
         if expected_kwargs is None:
             expected_kwargs = {}
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy_response
             # Ensure that __aenter__ returns our dummy client.
@@ -248,7 +248,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
         expected_url = "https://api.llama.fi/batchHistorical"
         # For this endpoint, a params dict is sent.
         expected_params = {"coins": coins_timestamps, "searchWidth": "600"}
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -263,7 +263,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
         dummy = DummyResponse(503, None)
         expected_url = "https://api.llama.fi/batchHistorical"
         expected_params = {"coins": coins_timestamps, "searchWidth": "600"}
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -288,7 +288,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "searchWidth": "600",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -313,7 +313,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "searchWidth": "600",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -339,7 +339,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
                 "period": "24h",
             }
 
-            with patch("httpx.AsyncClient") as MockClient:
+            with patch("skills.defillama.api.http_client") as MockClient:
                 client_instance = AsyncMock()
                 client_instance.get.return_value = dummy
                 MockClient.return_value.__aenter__.return_value = client_instance
@@ -361,7 +361,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "period": "24h",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -385,7 +385,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
                 "period": "24h",
             }
 
-            with patch("httpx.AsyncClient") as MockClient:
+            with patch("skills.defillama.api.http_client") as MockClient:
                 client_instance = AsyncMock()
                 client_instance.get.return_value = dummy
                 MockClient.return_value.__aenter__.return_value = client_instance
@@ -445,7 +445,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
         expected_url = "https://api.llama.fi/stablecoins"
         expected_params = {"includePrices": "true"}
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -509,7 +509,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "dataType": "dailyVolume",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -529,7 +529,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "dataType": "dailyVolume",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -548,7 +548,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "dataType": "dailyPremiumVolume",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
@@ -568,7 +568,7 @@ class TestDefiLlamaAPI(unittest.IsolatedAsyncioTestCase):
             "dataType": "dailyFees",
         }
 
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.defillama.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = dummy
             MockClient.return_value.__aenter__.return_value = client_instance
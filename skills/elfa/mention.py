@@ -7,6 +7,8 @@ from langchain.tools.base import ToolException
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field, HttpUrl
 
+from utils.http import http_client
+
 from .base import ElfaBaseTool, base_url
 
 
@@ -155,7 +157,7 @@ class ElfaGetMentions(ElfaBaseTool):
 
         params = ElfaGetMentionsInput(limit=100, offset=0).model_dump(exclude_none=True)
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(
                     url, headers=headers, timeout=30, params=params
@@ -323,7 +325,7 @@ class ElfaGetTopMentions(ElfaBaseTool):
             includeAccountDetails=includeAccountDetails,
         ).model_dump(exclude_none=True)
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(
                     url, headers=headers, timeout=30, params=params
@@ -481,7 +483,7 @@ class ElfaSearchMentions(ElfaBaseTool):
             to=to,
         ).model_dump(exclude_none=True)
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(
                     url, headers=headers, timeout=30, params=params
@@ -5,6 +5,8 @@ from langchain.tools.base import ToolException
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+from utils.http import http_client
+
 from .base import ElfaBaseTool, base_url
 
 
@@ -95,7 +97,7 @@ class ElfaGetSmartStats(ElfaBaseTool):
 
         params = ElfaGetSmartStatsInput(username=username).model_dump(exclude_none=True)
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(
                     url, headers=headers, timeout=30, params=params
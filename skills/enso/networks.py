@@ -7,6 +7,7 @@ from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.base import SkillContext
+from utils.http import http_client
 
 from .base import EnsoBaseTool, base_url
 
@@ -67,7 +68,7 @@ class EnsoGetNetworks(EnsoBaseTool):
             "Authorization": f"Bearer {api_token}",
         }
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 # Send the GET request
                 response = await client.get(url, headers=headers)
@@ -6,6 +6,7 @@ from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.base import SkillContext
+from utils.http import http_client
 
 from .base import EnsoBaseTool, base_url, default_chain_id
 
@@ -70,7 +71,7 @@ class EnsoGetPrices(EnsoBaseTool):
             "Authorization": f"Bearer {api_token}",
         }
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(url, headers=headers)
                 response.raise_for_status()
@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 from skills.base import SkillContext
 from skills.enso.abi.route import ABI_ROUTE
 from skills.enso.networks import EnsoGetNetworks
+from utils.http import http_client
 from utils.tx import EvmContractWrapper
 
 from .base import EnsoBaseTool, base_url, default_chain_id
@@ -191,7 +192,7 @@ class EnsoRouteShortcut(EnsoBaseTool):
         chain_provider = self.get_chain_provider(context)
         wallet = await self.get_wallet(context)
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 network_name = None
                 networks = await self.skill_store.get_agent_skill_data(
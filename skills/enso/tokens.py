@@ -11,6 +11,7 @@ from skills.enso.base import (
     base_url,
     default_chain_id,
 )
+from utils.http import http_client
 
 # Actual Enso output types
 # class UnderlyingToken(BaseModel):
@@ -174,7 +175,7 @@ class EnsoGetTokens(EnsoBaseTool):
         params["page"] = 1
         params["includeMetadata"] = "true"
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 response = await client.get(url, headers=headers, params=params)
                 response.raise_for_status()
@@ -6,6 +6,7 @@ from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.base import SkillContext
+from utils.http import http_client
 from utils.tx import EvmContractWrapper
 
 from .abi.erc20 import ABI_ERC20
@@ -91,7 +92,7 @@ class EnsoGetWalletBalances(EnsoBaseTool):
         params["eoaAddress"] = wallet.addresses[0].address_id
         params["useEoa"] = True
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 # Send the GET request
                 response = await client.get(url, headers=headers, params=params)
@@ -193,7 +194,7 @@ class EnsoGetWalletApprovals(EnsoBaseTool):
         if kwargs.get("routingStrategy"):
             params.routingStrategy = kwargs["routingStrategy"]
 
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             try:
                 # Send the GET request
                 response = await client.get(
@@ -7,6 +7,7 @@ from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.github.base import GitHubBaseTool
+from utils.http import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -92,7 +93,7 @@ class GitHubSearch(GitHubBaseTool):
         logger.debug(f"github_search.py: Searching GitHub at {search_url}")
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_client(timeout=30.0) as client:
                 response = await client.get(
                     search_url,
                     headers=headers,
@@ -7,6 +7,7 @@ from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.heurist.base import HeuristBaseTool
+from utils.http import http_client
 from utils.s3 import store_image
 
 logger = logging.getLogger(__name__)
@@ -124,7 +125,7 @@ class ImageGenerationArthemyReal(HeuristBaseTool):
 
         try:
             # Make the API request
-            async with httpx.AsyncClient() as client:
+            async with http_client() as client:
                 response = await client.post(
                     "http://sequencer.heurist.xyz/submit_job",
                     json=payload,
@@ -0,0 +1,133 @@
+"""Lazily built tools of skill providers with an expensive setup.
+
+Providers like CDP AgentKit and GOAT need a wallet to build their tools, and
+getting the wallet means calls to the provider API. The name, description and
+args schema of the tools don't depend on the wallet, so once a provider is built
+in this process, the next agents get cheap stand-ins with the same specs, and the
+real tools are only built when the agent calls one of them.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional, Union
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langchain_core.tools.base import ToolException
+from pydantic import ValidationError
+from pydantic.v1 import ValidationError as ValidationErrorV1
+
+logger = logging.getLogger(__name__)
+
+
+class ToolSpec(NamedTuple):
+    """What the LLM sees of a tool."""
+
+    name: str
+    description: str
+    args_schema: Any
+
+
+# Tool specs by provider key, the key must change when the tools can change,
+# e.g. include the provider package version and the network
+_specs: dict[Hashable, list[ToolSpec]] = {}
+
+
+class LazyToolkit:
+    """The real tools of one agent, built on first use and then memoized."""
+
+    def __init__(self, build: Callable[[], Awaitable[list[BaseTool]]]) -> None:
+        self._build = build
+        self._tools: Optional[dict[str, BaseTool]] = None
+        self._lock = asyncio.Lock()
+
+    async def get_tool(self, name: str) -> BaseTool:
+        """Get a real tool by name, building all tools on the first call.
+
+        Args:
+            name: The name of the tool
+
+        Returns:
+            BaseTool: The real tool
+
+        Raises:
+            ToolException: If the tools can't be built or the tool is missing
+        """
+        if self._tools is None:
+            async with self._lock:
+                if self._tools is None:
+                    try:
+                        tools = await self._build()
+                    except Exception as e:
+                        # not memoized, the next call tries again
+                        raise ToolException(f"failed to initialize tool: {e}") from e
+                    self._tools = {t.name: t for t in tools}
+        tool = self._tools.get(name)
+        if tool is None:
+            raise ToolException(f"tool {name} is not available")
+        return tool
+
+
+class LazyTool(BaseTool):
+    """Stand-in for a tool of a LazyToolkit, forwarding calls to the real tool."""
+
+    toolkit: LazyToolkit
+
+    # same as IntentKitSkill
+    handle_tool_error: Optional[Union[bool, str, Callable[[ToolException], str]]] = (
+        lambda e: f"tool error: {e}"
+    )
+    handle_validation_error: Optional[
+        Union[bool, str, Callable[[Union[ValidationError, ValidationErrorV1]], str]]
+    ] = lambda e: f"validation error: {e}"
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        raise NotImplementedError("Use _arun instead, lazy tools are async only")
+
+    async def _arun(
+        self,
+        config: RunnableConfig,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+        **kwargs: Any,
+    ) -> Any:
+        tool = await self.toolkit.get_tool(self.name)
+        return await tool.arun(
+            kwargs,
+            callbacks=run_manager.get_child() if run_manager else None,
+            config=config,
+        )
+
+
+async def lazy_tools(
+    key: Hashable, build: Callable[[], Awaitable[list[BaseTool]]]
+) -> list[BaseTool]:
+    """Get the tools of a provider, deferring the build when the specs are known.
+
+    The first agent using a provider key in this process builds the real tools,
+    which records their specs. Later agents get LazyTool stand-ins, sharing one
+    LazyToolkit so the build runs at most once per agent.
+
+    Args:
+        key: Identifies the provider and everything its tool specs depend on
+        build: Builds the real tools
+
+    Returns:
+        list[BaseTool]: The real tools, or the stand-ins
+    """
+    specs = _specs.get(key)
+    if specs is None:
+        tools = await build()
+        _specs[key] = [ToolSpec(t.name, t.description, t.args_schema) for t in tools]
+        logger.info(f"recorded {len(tools)} tool specs of {key}")
+        return tools
+    toolkit = LazyToolkit(build)
+    return [
+        LazyTool(
+            name=spec.name,
+            description=spec.description,
+            args_schema=spec.args_schema,
+            toolkit=toolkit,
+        )
+        for spec in specs
+    ]
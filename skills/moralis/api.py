@@ -6,6 +6,7 @@ from typing import Dict
 import httpx
 
 from skills.moralis.base import CHAIN_MAPPING
+from utils.http import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +44,7 @@ async def fetch_moralis_data(
         params = params or {}
         params["chain"] = CHAIN_MAPPING.get(chain_id, "eth")
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         try:
             response = await client.get(url, headers=headers, params=params)
             response.raise_for_status()
@@ -183,7 +184,7 @@ async def fetch_solana_api(api_key: str, endpoint: str, params: Dict = None) ->
     headers = {"X-API-Key": api_key}
     url = f"{base_url}{endpoint}"
 
-    async with httpx.AsyncClient() as client:
+    async with http_client() as client:
         try:
             response = await client.get(url, headers=headers, params=params)
             response.raise_for_status()
@@ -97,7 +97,7 @@ class TestAPIFunctions(unittest.IsolatedAsyncioTestCase):
 
     async def test_fetch_moralis_data(self):
         """Test the base Moralis API function."""
-        with patch("httpx.AsyncClient") as MockClient:
+        with patch("skills.moralis.api.http_client") as MockClient:
             client_instance = AsyncMock()
             client_instance.get.return_value = DummyResponse(
                 200, {"success": True, "data": "test_data"}
@@ -6,6 +6,8 @@ from eth_utils import is_address, to_normalized_address
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
+from utils.http import http_client
+
 from .base import NationBaseTool
 
 logger = logging.getLogger(__name__)
@@ -70,7 +72,7 @@ class NftCheck(NationBaseTool):
         headers = {"Accept": "application/json", "x-api-key": api_key}
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_client(timeout=30.0) as client:
                 response = await client.get(url, headers=headers)
 
                 if response.status_code != 200:
@@ -1,11 +1,11 @@
 import logging
 from typing import Type
 
-import httpx
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
 
 from skills.tavily.base import TavilyBaseTool
+from utils.http import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -86,7 +86,7 @@ class TavilySearch(TavilyBaseTool):
 
         # Call Tavily search API
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            async with http_client(timeout=30.0) as client:
                 response = await client.post(
                     "https://api.tavily.com/search",
                     json={
@@ -0,0 +1,70 @@
+"""Tests for lazily built skill provider tools."""
+
+import asyncio
+import unittest
+
+from langchain_core.tools import StructuredTool
+
+from skills import lazy
+from skills.lazy import LazyTool, lazy_tools
+
+
+def add(a: int, b: int = 1) -> int:
+    """Add two numbers."""
+    return a + b
+
+
+class TestLazyTools(unittest.TestCase):
+    def setUp(self):
+        lazy._specs.clear()
+        self.builds = 0
+
+    async def build(self):
+        self.builds += 1
+        return [StructuredTool.from_function(func=add, name="add")]
+
+    def test_first_build_is_eager(self):
+        tools = asyncio.run(lazy_tools("provider", self.build))
+        self.assertEqual(self.builds, 1)
+        self.assertNotIsInstance(tools[0], LazyTool)
+
+    def test_known_specs_defer_build(self):
+        async def run():
+            real = await lazy_tools("provider", self.build)
+            tools = await lazy_tools("provider", self.build)
+            self.assertEqual(self.builds, 1)
+            self.assertIsInstance(tools[0], LazyTool)
+            self.assertEqual(tools[0].name, "add")
+            self.assertEqual(
+                tools[0].tool_call_schema.model_json_schema()["properties"],
+                real[0].tool_call_schema.model_json_schema()["properties"],
+            )
+
+            self.assertEqual(await tools[0].ainvoke({"a": 2}), 3)
+            self.assertEqual(await tools[0].ainvoke({"a": 2, "b": 5}), 7)
+            # built on first call, then memoized
+            self.assertEqual(self.builds, 2)
+
+        asyncio.run(run())
+
+    def test_failed_build_is_retried(self):
+        async def run():
+            await lazy_tools("provider", self.build)
+            fail = True
+
+            async def flaky():
+                if fail:
+                    raise RuntimeError("wallet unavailable")
+                return await self.build()
+
+            tools = await lazy_tools("provider", flaky)
+            result = await tools[0].ainvoke({"a": 1})
+            self.assertIn("wallet unavailable", result)
+            fail = False
+            self.assertEqual(await tools[0].ainvoke({"a": 1}), 2)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Tests for the token bucket rate limits of skills."""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from redis.exceptions import RedisError
+
+from skills import base
+from skills.base import take_token
+
+
+class TestTakeToken(unittest.TestCase):
+    def setUp(self):
+        base._local_buckets.clear()
+        self.now = 1000.0
+        patcher = mock.patch.object(base.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def take(self, key="agent:skill:a", limit=2, seconds=10):
+        return asyncio.run(take_token(key, limit, seconds))
+
+    def without_redis(self):
+        return mock.patch.object(
+            base, "get_redis", side_effect=RuntimeError("Redis not initialized")
+        )
+
+    def test_local_allows_up_to_limit(self):
+        with self.without_redis():
+            self.assertTrue(self.take())
+            self.assertTrue(self.take())
+            self.assertFalse(self.take())
+
+    def test_local_refills_over_window(self):
+        with self.without_redis():
+            self.assertTrue(self.take())
+            self.assertTrue(self.take())
+            self.assertFalse(self.take())
+            # 2 tokens per 10 seconds
+            self.now += 5
+            self.assertTrue(self.take())
+            self.assertFalse(self.take())
+            self.now += 100
+            self.assertTrue(self.take())
+            self.assertTrue(self.take())
+            self.assertFalse(self.take())
+
+    def test_local_buckets_are_separate(self):
+        with self.without_redis():
+            self.assertTrue(self.take("agent:skill:a", limit=1))
+            self.assertFalse(self.take("agent:skill:a", limit=1))
+            self.assertTrue(self.take("agent:skill:b", limit=1))
+
+    def test_redis_decides(self):
+        redis = mock.Mock()
+        redis.eval = mock.AsyncMock(side_effect=[1, 0])
+        with mock.patch.object(base, "get_redis", return_value=redis):
+            self.assertTrue(self.take())
+            self.assertFalse(self.take())
+        args = redis.eval.await_args.args
+        self.assertEqual(args[2], base._RATE_LIMIT_KEY + "agent:skill:a")
+        self.assertEqual(args[3:], (2, 0.2))
+        self.assertEqual(len(base._local_buckets), 0)
+
+    def test_redis_error_limits_locally(self):
+        redis = mock.Mock()
+        redis.eval = mock.AsyncMock(side_effect=RedisError("down"))
+        with mock.patch.object(base, "get_redis", return_value=redis):
+            self.assertTrue(self.take(limit=1))
+            self.assertFalse(self.take(limit=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,7 @@
-from datetime import datetime, timedelta, timezone
 from typing import Type
 
 from pydantic import BaseModel, Field
 
-from abstracts.exception import RateLimitExceeded
 from abstracts.skill import SkillStoreABC
 from skills.base import IntentKitSkill
 
@@ -35,34 +33,4 @@ class TwitterBaseTool(IntentKitSkill):
         Raises:
             RateLimitExceeded: If the rate limit has been exceeded.
         """
-        rate_limit = await self.skill_store.get_agent_skill_data(
-            agent_id, self.name, "rate_limit"
-        )
-
-        current_time = datetime.now(tz=timezone.utc)
-
-        if (
-            rate_limit
-            and rate_limit.get("reset_time")
-            and rate_limit["count"] is not None
-            and datetime.fromisoformat(rate_limit["reset_time"]) > current_time
-        ):
-            if rate_limit["count"] >= max_requests:
-                raise RateLimitExceeded("Rate limit exceeded")
-
-            rate_limit["count"] += 1
-            await self.skill_store.save_agent_skill_data(
-                agent_id, self.name, "rate_limit", rate_limit
-            )
-
-            return
-
-        # If no rate limit exists or it has expired, create a new one
-        new_rate_limit = {
-            "count": 1,
-            "reset_time": (current_time + timedelta(minutes=interval)).isoformat(),
-        }
-        await self.skill_store.save_agent_skill_data(
-            agent_id, self.name, "rate_limit", new_rate_limit
-        )
-        return
+        await self.agent_rate_limit(agent_id, max_requests, interval, self.name)
@@ -13,6 +13,10 @@ logger = logging.getLogger(__name__)
 
 PROMPT = "Search for recent tweets on Twitter using a query keyword"
 
+# The saved since_id of a query is reset after 6 days anyway, so it is kept no
+# longer, the cursors of queries never searched again are deleted
+CURSOR_TTL = datetime.timedelta(days=7)
+
 
 class TwitterSearchTweetsInput(BaseModel):
     """Input for TwitterSearchTweets tool."""
@@ -116,7 +120,12 @@ class TwitterSearchTweets(TwitterBaseTool):
                 last["since_id"] = tweets["meta"]["newest_id"]
                 last["timestamp"] = datetime.datetime.now().isoformat()
                 await self.skill_store.save_agent_skill_data(
-                    context.agent.id, self.name, query, last
+                    context.agent.id,
+                    self.name,
+                    query,
+                    last,
+                    expires_at=datetime.datetime.now(datetime.timezone.utc)
+                    + CURSOR_TTL,
                 )
 
             return result
@@ -0,0 +1,114 @@
+"""
+Run blocking SDK calls off the event loop.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+import requests
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Global thread pool for blocking calls, bounded so a burst of cold starts
+# can't spawn an unbounded number of threads
+_pool: Optional[ThreadPoolExecutor] = None
+_max_workers = 8
+
+
+def init_blocking_pool(max_workers: int) -> None:
+    """
+    Set the size of the thread pool used by run_blocking.
+
+    Args:
+        max_workers: Maximum number of threads
+
+    Raises:
+        ValueError: If max_workers is not positive
+    """
+    global _pool, _max_workers
+    if max_workers < 1:
+        raise ValueError("blocking pool needs at least one thread")
+    _max_workers = max_workers
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking function in the bounded thread pool.
+
+    Args:
+        func: The blocking function
+        *args: Positional arguments for the function
+        **kwargs: Keyword arguments for the function
+
+    Returns:
+        The return value of the function
+    """
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=_max_workers, thread_name_prefix="blocking"
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, functools.partial(func, *args, **kwargs))
+
+
+def is_rate_limited(e: BaseException) -> bool:
+    """
+    Check whether an exception, or any exception it was raised from, is a HTTP 429.
+
+    Only HTTP errors with a response are considered, the httpx errors of the API
+    clients and the requests errors of the web3 HTTP provider. The message is not
+    looked at, it may hold amounts or hashes containing 429.
+
+    Args:
+        e: The exception to check
+
+    Returns:
+        bool: True if the error was caused by a rate limit
+    """
+    while e is not None:
+        if isinstance(e, (httpx.HTTPStatusError, requests.HTTPError)):
+            response = e.response
+            if response is not None and response.status_code == 429:
+                return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+async def with_backoff(
+    func: Callable[[], Awaitable[T]],
+    retries: int = 3,
+    delay: float = 1.0,
+) -> T:
+    """
+    Call an async function, retrying with exponential backoff when rate limited.
+
+    Args:
+        func: The async function to call, without arguments
+        retries: Maximum number of retries after the first attempt
+        delay: Delay before the first retry in seconds, doubled on every retry
+
+    Returns:
+        The return value of the function
+
+    Raises:
+        Exception: The last error, if it was not a rate limit or retries ran out
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= retries or not is_rate_limited(e):
+                raise
+            wait = delay * 2**attempt
+            logger.info(f"rate limited, retrying in {wait:.1f}s: {e}")
+            await asyncio.sleep(wait)
@@ -0,0 +1,254 @@
+"""
+Bounded in-process cache with idle eviction.
+"""
+
+import sys
+import time
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Literal, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+EvictionPolicy = Literal["lru", "lfu"]
+
+_SKIPPED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def approximate_size(obj: Any, max_depth: int = 6) -> int:
+    """
+    Approximate the memory footprint of an object graph in bytes.
+
+    Follows containers and instance attributes up to max_depth levels and counts
+    every object only once. Modules, classes and functions are skipped, so shared
+    code objects don't inflate the result.
+
+    Args:
+        obj: The object to measure
+        max_depth: Maximum depth to follow references
+
+    Returns:
+        Approximate size in bytes
+    """
+    seen: set[int] = set()
+    total = 0
+    stack = [(obj, 0)]
+    while stack:
+        current, depth = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+        try:
+            total += sys.getsizeof(current)
+        except TypeError:
+            continue
+        if depth >= max_depth:
+            continue
+        if isinstance(current, dict):
+            stack.extend((v, depth + 1) for v in current.keys())
+            stack.extend((v, depth + 1) for v in current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend((v, depth + 1) for v in current)
+        elif hasattr(current, "__dict__"):
+            stack.append((vars(current), depth + 1))
+    return total
+
+
+class _Entry(Generic[V]):
+    __slots__ = ("value", "size", "hits", "last_access")
+
+    def __init__(self, value: V, size: int) -> None:
+        self.value = value
+        self.size = size
+        self.hits = 0
+        self.last_access = time.monotonic()
+
+
+class BoundedCache(Generic[K, V]):
+    """
+    In-process cache bounded by entry count, idle time and an optional memory budget.
+
+    Entries idle for longer than ttl seconds are dropped. When the cache is over
+    max_size entries or over max_memory bytes, entries are evicted by the policy,
+    least recently used ("lru") or least frequently used ("lfu").
+    The cache is meant to be used from a single event loop and is not thread safe.
+
+    Args:
+        max_size: Maximum number of entries
+        ttl: Idle seconds after which an entry expires, 0 to disable
+        max_memory: Approximate memory budget in bytes, 0 to disable
+        policy: Eviction policy, "lru" or "lfu"
+        sizeof: Function to approximate the size of a value in bytes,
+            only used when max_memory is set
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float = 0,
+        max_memory: int = 0,
+        policy: EvictionPolicy = "lru",
+        sizeof: Callable[[V], int] = approximate_size,
+    ) -> None:
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"unknown eviction policy: {policy}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_memory = max_memory
+        self.policy = policy
+        self._sizeof = sizeof
+        # ordered by last access, least recent first
+        self._data: OrderedDict[K, _Entry[V]] = OrderedDict()
+        self._resident = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __contains__(self, key: K) -> bool:
+        self._expire()
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> list[K]:
+        """Get the keys currently in the cache."""
+        self._expire()
+        return list(self._data.keys())
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Get a value and mark it as recently used.
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            The cached value, or default
+        """
+        self._expire()
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        entry.hits += 1
+        entry.last_access = time.monotonic()
+        self._data.move_to_end(key)
+        return entry.value
+
+    def peek(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Get a value without marking it as used or counting a hit or miss.
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+
+        Returns:
+            The cached value, or default
+        """
+        self._expire()
+        entry = self._data.get(key)
+        return default if entry is None else entry.value
+
+    def __getitem__(self, key: K) -> V:
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+
+    def set(self, key: K, value: V, size: Optional[int] = None) -> None:
+        """Insert or replace a value, evicting other entries if over budget.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            size: Approximate size of the value in bytes, measured with the
+                sizeof function if not provided
+        """
+        self.pop(key)
+        if size is None:
+            size = self._sizeof(value) if self.max_memory else 0
+        self._data[key] = _Entry(value, size)
+        self._resident += size
+        self._expire()
+        while len(self._data) > 1 and (
+            len(self._data) > self.max_size
+            or (self.max_memory and self._resident > self.max_memory)
+        ):
+            self._evict_one(exclude=key)
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self.set(key, value)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """Remove a value from the cache.
+
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing
+
+        Returns:
+            The removed value, or default
+        """
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self._resident -= entry.size
+        return entry.value
+
+    def clear(self) -> None:
+        """Remove all entries, statistics are kept."""
+        self._data.clear()
+        self._resident = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Hits, misses, evictions, expirations, entry count and resident bytes,
+            together with the configured limits
+        """
+        self._expire()
+        return {
+            "policy": self.policy,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "resident_bytes": self._resident,
+            "max_memory": self.max_memory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _expire(self) -> None:
+        if not self.ttl:
+            return
+        deadline = time.monotonic() - self.ttl
+        # entries are ordered by last access, so the expired ones are at the front
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if entry.last_access > deadline:
+                break
+            self.pop(key)
+            self.expirations += 1
+
+    def _evict_one(self, exclude: K) -> None:
+        if self.policy == "lfu":
+            victim = min(
+                (k for k in self._data if k != exclude),
+                key=lambda k: self._data[k].hits,
+            )
+        else:
+            victim = next(k for k in self._data if k != exclude)
+        self.pop(victim)
+        self.evictions += 1
@@ -0,0 +1,270 @@
+"""
+Shared HTTP clients of the upstream APIs called by skills.
+
+Skills used to open a client per call, paying DNS, TCP and TLS setup on every
+tool call. Here each upstream host gets one long-lived client, shared by all
+agents of the worker, so the calls reuse the pooled connections.
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+
+    _http2_available = True
+except ImportError:
+    _http2_available = False
+
+# Settings of the clients, set by init_http_clients
+_http2 = True
+_limits = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=60
+)
+_timeout = 5.0
+_host_timeouts: dict[str, float] = {}
+
+# Retries of a failed request, with exponential backoff and full jitter
+RETRIES = 2
+RETRY_DELAY = 0.2
+# Responses worth retrying, the upstream may answer the next request
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+# Seconds a request may wait in total for the Retry-After of 429 responses, a
+# longer wait returns the 429 to the skill
+RETRY_AFTER_BUDGET = 2.0
+# Methods that can be sent twice, others are only retried if never sent
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def init_http_clients(
+    http2: bool,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    timeout: float,
+    host_timeouts: Optional[dict[str, float]] = None,
+) -> None:
+    """
+    Set the settings of the shared clients, used by the clients created after.
+
+    Args:
+        http2: Use HTTP/2 when the h2 package is installed and the host supports it
+        max_connections: Maximum connections per host
+        max_keepalive_connections: Maximum idle connections kept per host
+        keepalive_expiry: Idle seconds before a kept connection is closed
+        timeout: Default timeout in seconds
+        host_timeouts: Timeout in seconds by host, for slow upstreams
+    """
+    global _http2, _limits, _timeout, _host_timeouts
+    _http2 = http2
+    _limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    _timeout = timeout
+    _host_timeouts = dict(host_timeouts or {})
+
+
+class _HostClient:
+    """The long-lived client of one upstream host, with its reuse counters."""
+
+    def __init__(self, origin: str, host: str) -> None:
+        self.origin = origin
+        self.requests = 0
+        self.connections = 0
+        self.retries = 0
+        self.http2 = _http2 and _http2_available
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=_limits,
+            timeout=_host_timeouts.get(host, _timeout),
+            event_hooks={"request": [self._on_request]},
+        )
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event: str, info: dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "origin": self.origin,
+            "http2": self.http2,
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused": max(self.requests - self.connections, 0),
+            "retries": self.retries,
+        }
+
+
+# Shared clients, keyed by origin (scheme, host and port)
+_hosts: dict[str, _HostClient] = {}
+
+
+def _host_client(url: str) -> _HostClient:
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    host = _hosts.get(origin)
+    if host is None:
+        host = _HostClient(origin, parts.hostname or "")
+        _hosts[origin] = host
+        logger.info(f"created shared http client for {origin}")
+    return host
+
+
+def _retry_delay(attempt: int) -> float:
+    return random.uniform(0, RETRY_DELAY * 2**attempt)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait from the Retry-After header, None if missing or invalid."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class SharedClient:
+    """
+    Sends requests with the shared client of the URL host, retrying failures.
+
+    It has the request methods of httpx.AsyncClient used by skills and can be
+    used as an async context manager, which does not close the shared clients.
+
+    Args:
+        timeout: Timeout in seconds of the requests, instead of the host timeout
+    """
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self.timeout = timeout
+
+    async def __aenter__(self) -> "SharedClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request with the shared client of the URL host.
+
+        Connection failures are retried for every method, as the request was
+        not sent. Other transport errors and 429 or 5xx gateway responses are
+        retried for idempotent methods only. A 429 is retried after its
+        Retry-After, unless the waits would exceed RETRY_AFTER_BUDGET.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            **kwargs: Arguments of httpx.AsyncClient.request
+
+        Returns:
+            httpx.Response: The response, the last one if all attempts failed
+
+        Raises:
+            httpx.TransportError: If the last attempt failed to get a response
+        """
+        host = _host_client(url)
+        if self.timeout is not None and "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        rate_limited = 0.0
+        for attempt in range(RETRIES + 1):
+            last = attempt == RETRIES
+            delay = _retry_delay(attempt)
+            try:
+                response = await host.client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if last:
+                    raise
+            except httpx.TransportError:
+                if last or not idempotent:
+                    raise
+            else:
+                if last or not idempotent:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if response.status_code == 429:
+                    delay = _retry_after(response) or delay
+                    rate_limited += delay
+                    if rate_limited > RETRY_AFTER_BUDGET:
+                        return response
+                await response.aclose()
+            host.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+
+def http_client(timeout: Optional[float] = None) -> SharedClient:
+    """
+    Get a client sending requests with the shared clients of their hosts.
+
+    Replaces a throwaway httpx.AsyncClient:
+        async with http_client() as client:
+            response = await client.get(url)
+
+    Args:
+        timeout: Timeout in seconds of the requests, instead of the host timeout
+
+    Returns:
+        SharedClient: The client
+    """
+    return SharedClient(timeout)
+
+
+async def close_http_clients() -> None:
+    """Close the shared clients and their connections, on shutdown."""
+    hosts = list(_hosts.values())
+    _hosts.clear()
+    for host in hosts:
+        try:
+            await host.client.aclose()
+        except Exception as e:
+            logger.warning(f"failed to close http client of {host.origin}: {e}")
+
+
+def http_client_stats() -> list[dict[str, Any]]:
+    """
+    Get the connection reuse statistics of the shared clients.
+
+    Returns:
+        list[dict[str, Any]]: For each upstream origin, the requests sent, new
+            connections opened, requests served on a reused connection and
+            retries
+    """
+    return [host.stats() for host in _hosts.values()]
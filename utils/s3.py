@@ -12,6 +12,8 @@ import httpx
 from botocore.exceptions import ClientError
 from mypy_boto3_s3.client import S3Client
 
+from utils.http import http_client
+
 logger = logging.getLogger(__name__)
 
 # Global variables for S3 configuration
@@ -70,7 +72,7 @@ async def store_image(url: str, key: str) -> str:
 
     try:
         # Download the image from the URL asynchronously
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(url, follow_redirects=True)
             response.raise_for_status()
 
@@ -0,0 +1,127 @@
+"""Tests for running blocking calls off the event loop."""
+
+import asyncio
+import time
+import unittest
+
+import httpx
+import requests
+
+from utils.blocking import init_blocking_pool, run_blocking, with_backoff
+
+
+async def max_loop_lag(coro, interval: float = 0.01) -> float:
+    """Run a coroutine and return the longest the event loop was unresponsive."""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(lag, time.perf_counter() - start - interval)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    try:
+        await coro
+    finally:
+        done = True
+        await task
+    return lag
+
+
+def rate_limited_error() -> Exception:
+    request = httpx.Request("POST", "https://example.com")
+    response = httpx.Response(429, request=request)
+    try:
+        raise httpx.HTTPStatusError("429", request=request, response=response)
+    except httpx.HTTPStatusError as e:
+        # wrapped like the Crossmint client does
+        try:
+            raise Exception(f"http error from Crossmint API: {e}") from e
+        except Exception as wrapped:
+            return wrapped
+
+
+class TestRunBlocking(unittest.TestCase):
+    def setUp(self):
+        init_blocking_pool(4)
+
+    def test_blocking_on_loop_is_detected(self):
+        """The lag measurement catches a blocking call on the loop itself."""
+
+        async def cold_start():
+            time.sleep(0.3)
+
+        lag = asyncio.run(max_loop_lag(cold_start()))
+        self.assertGreaterEqual(lag, 0.25)
+
+    def test_returns_result(self):
+        result = asyncio.run(run_blocking(lambda a, b=0: a + b, 1, b=2))
+        self.assertEqual(result, 3)
+
+
+class TestWithBackoff(unittest.TestCase):
+    def test_retries_rate_limit(self):
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise rate_limited_error()
+            return "ok"
+
+        result = asyncio.run(with_backoff(flaky, retries=3, delay=0.01))
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_does_not_retry_other_errors(self):
+        calls = []
+
+        async def broken():
+            calls.append(1)
+            raise ValueError("bad wallet data")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(with_backoff(broken, retries=3, delay=0.01))
+        self.assertEqual(len(calls), 1)
+
+    def test_retries_requests_rate_limit(self):
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 2:
+                response = requests.Response()
+                response.status_code = 429
+                raise requests.HTTPError("429 Too Many Requests", response=response)
+            return "ok"
+
+        result = asyncio.run(with_backoff(flaky, retries=3, delay=0.01))
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(calls), 2)
+
+    def test_does_not_retry_429_in_message(self):
+        """Amounts, addresses and hashes may contain 429."""
+        calls = []
+
+        async def transfer():
+            calls.append(1)
+            raise Exception("transfer of 429 USDC to 0xabc429 failed")
+
+        with self.assertRaises(Exception):
+            asyncio.run(with_backoff(transfer, retries=3, delay=0.01))
+        self.assertEqual(len(calls), 1)
+
+    def test_gives_up_after_retries(self):
+        async def limited():
+            raise rate_limited_error()
+
+        with self.assertRaises(Exception):
+            asyncio.run(with_backoff(limited, retries=2, delay=0.01))
+
+
+if __name__ == "__main__":
+    unittest.main()
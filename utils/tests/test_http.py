@@ -0,0 +1,156 @@
+"""Tests for the shared HTTP clients of skill upstreams."""
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+
+from utils import http
+from utils.http import close_http_clients, http_client, http_client_stats
+
+
+class TestSharedClient(unittest.TestCase):
+    def setUp(self):
+        http._hosts.clear()
+        self.calls = []
+        self.responses = []
+        self.delay = http.RETRY_DELAY
+        http.RETRY_DELAY = 0.001
+
+    def tearDown(self):
+        http.RETRY_DELAY = self.delay
+        http._hosts.clear()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        if isinstance(response, tuple):
+            status, headers = response
+            return httpx.Response(status, headers=headers, request=request)
+        return httpx.Response(response, request=request)
+
+    def run_with_mock(self, coro_factory):
+        async def run():
+            host = http._host_client("https://api.example.com/")
+            host.client = httpx.AsyncClient(
+                transport=httpx.MockTransport(self.handler),
+                event_hooks={"request": [host._on_request]},
+            )
+            try:
+                return await coro_factory()
+            finally:
+                await close_http_clients()
+
+        return asyncio.run(run())
+
+    def test_one_client_per_host(self):
+        async def run():
+            a = http._host_client("https://api.example.com/a")
+            b = http._host_client("https://api.example.com/b?q=1")
+            c = http._host_client("https://other.example.com/a")
+            self.assertIs(a, b)
+            self.assertIsNot(a, c)
+            await close_http_clients()
+
+        asyncio.run(run())
+
+    def test_get_retries_gateway_errors(self):
+        self.responses = [503, 429, 200]
+
+        async def call():
+            async with http_client() as client:
+                return await client.get("https://api.example.com/prices")
+
+        response = self.run_with_mock(call)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_get_returns_last_response(self):
+        self.responses = [503, 503, 503]
+
+        async def call():
+            async with http_client() as client:
+                return await client.get("https://api.example.com/prices")
+
+        response = self.run_with_mock(call)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.calls), http.RETRIES + 1)
+
+    def test_get_retries_after_retry_after(self):
+        self.responses = [(429, {"Retry-After": "0.01"}), 200]
+
+        async def call():
+            async with http_client() as client:
+                return await client.get("https://api.example.com/prices")
+
+        response = self.run_with_mock(call)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_get_returns_429_with_long_retry_after(self):
+        self.responses = [(429, {"Retry-After": "120"}), 200]
+
+        async def call():
+            async with http_client() as client:
+                return await client.get("https://api.example.com/prices")
+
+        response = self.run_with_mock(call)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_retry_after(self):
+        def retry_after(value):
+            return http._retry_after(
+                httpx.Response(429, headers={"Retry-After": value})
+            )
+
+        self.assertEqual(retry_after("3"), 3.0)
+        self.assertIsNone(retry_after("soon"))
+        date = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(retry_after(format_datetime(date)), 30, delta=2)
+        self.assertEqual(retry_after(format_datetime(date - timedelta(hours=1))), 0)
+        self.assertIsNone(http._retry_after(httpx.Response(429)))
+
+    def test_post_is_not_sent_twice(self):
+        self.responses = [503, 200]
+
+        async def call():
+            async with http_client() as client:
+                return await client.post("https://api.example.com/generate")
+
+        response = self.run_with_mock(call)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_post_retries_connect_errors(self):
+        self.responses = [httpx.ConnectError("refused"), 200]
+
+        async def call():
+            async with http_client() as client:
+                return await client.post("https://api.example.com/generate")
+
+        response = self.run_with_mock(call)
+        self.assertEqual(response.status_code, 200)
+
+    def test_stats(self):
+        self.responses = [503, 200, 200]
+
+        async def call():
+            async with http_client() as client:
+                await client.get("https://api.example.com/a")
+                await client.get("https://api.example.com/b")
+            return http_client_stats()
+
+        stats = self.run_with_mock(call)
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]["origin"], "https://api.example.com")
+        self.assertEqual(stats[0]["requests"], 3)
+        self.assertEqual(stats[0]["retries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()